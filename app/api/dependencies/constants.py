@@ -26,3 +26,34 @@ SUPPORTED_FILE_TYPES = {
     "audio/wav": "wav",
     "audio/x-ms-wma": "wma",
 }
+
+# smallest part (except the last one) accepted by S3 multipart uploads
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+# largest part accepted by S3 multipart uploads
+S3_MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+# largest number of parts of one S3 multipart upload
+S3_MAX_PARTS = 10000
+# largest number of objects of one S3 DeleteObjects request
+S3_DELETE_MAX_KEYS = 1000
+# byte ranges of one Range header served, requests asking for more get the whole file
+MAX_BYTE_RANGES = 16
+# renditions of documents, by name, and the size of their longer side in pixels
+RENDITION_SIZES = {"thumb": 200}
+# content types worth deflating in zip downloads, the others are compressed already
+ZIP_DEFLATE_TYPES = {
+    "text/plain",
+    "application/json",
+    "application/xml",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.ms-powerpoint",
+    "image/bmp",
+    "image/tiff",
+    "audio/wav",
+}
+# chunks of a document read ahead of the zip download writing it
+ZIP_PREFETCH_CHUNKS = 4
+# content types compressed at rest, when `settings.storage_compression` names a codec
+STORAGE_COMPRESS_TYPES = {"text/plain", "application/json", "application/xml"}
+# largest object copied by a single S3 CopyObject request
+S3_MAX_COPY_SIZE = 5 * 1024 * 1024 * 1024
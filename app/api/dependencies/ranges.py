@@ -0,0 +1,63 @@
+from typing import List, Optional, Tuple
+
+from app.api.dependencies.constants import MAX_BYTE_RANGES
+from app.core.exceptions import http_416
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parses the value of a `Range` header into the byte ranges to send.
+
+    Args:
+        header (str): The value of the header, e.g. "bytes=0-499,-500".
+        size (int): The size of the file in bytes.
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: The first and last byte (inclusive) of every
+            range, sorted and with overlapping ranges merged. None if the header is
+            malformed, uses another unit or asks for too many ranges, in which case it
+            has to be ignored and the whole file sent.
+
+    Raises:
+        HTTP_416: If none of the ranges overlaps the file.
+    """
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    specs = spec.split(",")
+    if len(specs) > MAX_BYTE_RANGES:
+        return None
+
+    ranges = []
+    for part in specs:
+        first, sep, last = part.strip().partition("-")
+        if not sep or not (first or last):
+            return None
+        if not all(value.isdigit() for value in (first, last) if value):
+            return None
+
+        if not first:
+            # suffix range, the last n bytes
+            if int(last) > 0 and size > 0:
+                ranges.append((max(size - int(last), 0), size - 1))
+            continue
+
+        start, end = int(first), int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise http_416(headers={"Content-Range": f"bytes */{size}"})
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
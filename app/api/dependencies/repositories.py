@@ -1,11 +1,10 @@
-import os.path
 import re
 from typing import Optional
+from urllib.parse import quote
 
 import ulid
 
 from fastapi import Depends
-from fastapi.responses import FileResponse
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -13,16 +12,6 @@ from app.core.config import settings
 from app.db.models import async_session
 
 
-class TempFileResponse(FileResponse):
-    def __init__(self, path, *args, **kwargs):
-        super().__init__(path, *args, **kwargs)
-        self.file_path = path
-
-    def __del__(self):
-        if os.path.exists(self.file_path):
-            os.remove(self.file_path)
-
-
 async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
@@ -63,5 +52,47 @@ async def get_key(s3_url: str) -> Optional[str]:
         return None
 
 
+def get_content_disposition(filename: str, disposition: str = "attachment") -> str:
+    # non-ascii names are sent percent-encoded, as RFC 6266 describes
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def get_etag(file_hash: Optional[str], encoding: Optional[str] = None) -> Optional[str]:
+    # the content hash changes with every version, so it is a strong validator, the
+    # compressed representation of the same content gets its own
+    if not file_hash:
+        return None
+    return f'"{file_hash}-{encoding}"' if encoding else f'"{file_hash}"'
+
+
+def etag_matches(if_none_match: str, etag: Optional[str]) -> bool:
+    # If-None-Match uses the weak comparison, W/ prefixes are ignored
+    if etag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    # a coding is acceptable when listed, or covered by *, without q=0
+    if not accept_encoding:
+        return False
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().lower().partition(";")
+        quality = params.strip().removeprefix("q=") if params else "1"
+        try:
+            weights[coding.strip()] = float(quality)
+        except ValueError:
+            continue
+    return weights.get(encoding, weights.get("*", 0)) > 0
+
+
 def get_ulid():
     return str(ulid.ULID())
@@ -9,7 +9,11 @@ from app.api.routes.documents.document_organization import (
     router as document_organization_router,
 )
 from app.api.routes.documents.document_sharing import router as document_sharing_router
+from app.api.routes.documents.document_versions import (
+    router as document_versions_router,
+)
 from app.api.routes.documents.notify import router as notify_router
+from app.api.routes.documents.upload_sessions import router as upload_sessions_router
 
 router = APIRouter()
 
@@ -19,3 +23,5 @@ router.include_router(notify_router, prefix="/notifications")
 router.include_router(documents_metadata_router, prefix="/metadata")
 router.include_router(document_organization_router, prefix="/filter")
 router.include_router(document_sharing_router)
+router.include_router(upload_sessions_router, prefix="/uploads")
+router.include_router(document_versions_router, prefix="/versions")
@@ -1,12 +1,22 @@
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 
-from fastapi import APIRouter, status, File, UploadFile, Depends
-from fastapi.responses import FileResponse
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    status,
+    File,
+    UploadFile,
+    Depends,
+    Header,
+    HTTPException,
+)
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.engine import Row
 
 from app.api.dependencies.auth_utils import get_current_user
 from app.api.dependencies.repositories import get_repository
+from app.core.config import settings
 from app.core.exceptions import http_400, http_404
 from app.db.repositories.auth.auth import AuthRepository
 from app.db.repositories.documents.documents import (
@@ -15,6 +25,7 @@ from app.db.repositories.documents.documents import (
 )
 from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
 from app.schemas.auth.bands import TokenData
+from app.schemas.documents.bands import DocumentArchiveRequest
 from app.schemas.documents.documents_metadata import DocumentMetadataRead
 
 
@@ -28,6 +39,7 @@ router = APIRouter(tags=["Document"])
     name="upload_document",
 )
 async def upload(
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     folder: Optional[str] = None,
     repository: DocumentRepository = Depends(DocumentRepository),
@@ -36,11 +48,15 @@ async def upload(
     ),
     user_repository: AuthRepository = Depends(get_repository(AuthRepository)),
     user: TokenData = Depends(get_current_user),
-) -> Union[List[DocumentMetadataRead], List[Dict[str, str]]]:
+) -> List[Union[DocumentMetadataRead, Dict[str, str]]]:
     """
-    Uploads a document to the specified folder.
+    Uploads documents to the specified folder.
+
+    The files are stored concurrently, up to `UPLOAD_CONCURRENCY` at a time, and their
+    metadata is written in a single transaction.
 
     Args:
+        background_tasks (BackgroundTasks): Renders the thumbnails of the uploaded files.
         files (List[UploadFile]): The files to be uploaded.
         folder (Optional[str]): The folder where the document will be stored. Defaults to None.
         repository (DocumentRepository): The repository for managing documents.
@@ -50,10 +66,10 @@ async def upload(
         user (TokenData): The token data of the authenticated user.
 
     Returns:
-        Union[DocumentMetadataRead, Dict[str, str]]: If the file is added, returns the
-            uploaded document metadata.
-            If the file is updated, returns the patched document metadata.
-            Otherwise, returns a response dictionary.
+        List[Union[DocumentMetadataRead, Dict[str, str]]]: One entry per file, in upload
+            order. If the file is added, the uploaded document metadata.
+            If the file is updated, the patched document metadata.
+            Otherwise, a response dictionary, with an "error" key if the file failed.
 
     Raises:
         HTTP_400: If no input file is provided.
@@ -62,32 +78,64 @@ async def upload(
     if not files:
         raise http_400(msg="No input files provided...")
 
-    responses = []
-    for file in files:
-        response = await repository.upload(
-            metadata_repo=metadata_repository,
-            user_repo=user_repository,
-            file=file,
-            folder=folder,
-            user=user,
-        )
-        if response["response"] == "file_added":
-            responses.append(
-                await metadata_repository.upload(document_upload=response["upload"])
-            )
-        elif response["response"] == "file_updated":
-            responses.append(
-                await metadata_repository.patch(
-                    document=response["upload"]["name"],
-                    document_patch=response["upload"],
-                    owner=user,
-                    user_repo=user_repository,
-                    is_owner=response["is_owner"],
-                )
-            )
+    responses = await repository.upload(
+        metadata_repo=metadata_repository,
+        user_repo=user_repository,
+        files=files,
+        folder=folder,
+        user=user,
+    )
+    # thumbnails are rendered once the response is sent
+    background_tasks.add_task(
+        repository.generate_renditions,
+        documents=[
+            dict(doc) for doc in responses if isinstance(doc, DocumentMetadataRead)
+        ],
+    )
+
     return responses
 
 
+@router.post(
+    "/import",
+    response_model=None,
+    status_code=status.HTTP_201_CREATED,
+    name="import_archive",
+)
+async def import_archive(
+    archive: UploadFile = File(...),
+    folder: Optional[str] = None,
+    repository: DocumentRepository = Depends(DocumentRepository),
+    metadata_repository: DocumentMetadataRepository = Depends(
+        get_repository(DocumentMetadataRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """
+    Imports every file of a zip or tar (optionally gzip/bzip2 compressed) archive as its
+    own document.
+
+    Args:
+        archive (UploadFile): The archive to be imported.
+        folder (Optional[str]): The folder the archive is imported into. Directories inside
+            the archive become sub-folders of it. Defaults to None.
+        repository (DocumentRepository): The repository for managing documents.
+        metadata_repository (DocumentMetadataRepository): The repository for managing document
+            metadata.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        Dict[str, Any]: The number of imported documents and the members that failed.
+
+    Raises:
+        HTTP_400: If the archive type is not supported.
+    """
+
+    return await repository.import_archive(
+        metadata_repo=metadata_repository, archive=archive, folder=folder, user=user
+    )
+
+
 @router.get(
     "/file/{file_name}/download",
     status_code=status.HTTP_200_OK,
@@ -95,27 +143,40 @@ async def upload(
 )
 async def download(
     file_name: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
     repository: DocumentRepository = Depends(DocumentRepository),
     metadata_repository: DocumentMetadataRepository = Depends(
         get_repository(DocumentMetadataRepository)
     ),
     user: TokenData = Depends(get_current_user),
-) -> object:
+) -> Response:
     """
     Downloads a document with the specified file name.
 
+    The document is streamed from storage in chunks of `S3_DOWNLOAD_CHUNK_SIZE` bytes,
+    a `Range` header asks for parts of it only. A client that already has the current
+    version, going by its ETag, gets 304 Not Modified without storage being contacted.
+
     Args:
         file_name (str): The name of the file to be downloaded.
+        range_header (Optional[str]): The byte ranges to send, if not the whole file.
+        if_range (Optional[str]): The ETag the ranges are valid for.
+        if_none_match (Optional[str]): The ETags of the versions the client already has.
+        accept_encoding (Optional[str]): The codecs the client can decompress.
         repository (DocumentRepository): The repository for managing documents.
         metadata_repository (DocumentMetadataRepository): The repository for managing document metadata.
         user (TokenData): The token data of the authenticated user.
 
     Returns:
-        object: The downloaded document.
+        Response: The content of the document as an attachment, or 304 Not Modified.
 
     Raises:
         HTTP_400: If no file name is provided.
         HTTP_404: If no file with the specified name is found.
+        HTTP_416: If none of the requested ranges overlaps the file.
     """
 
     if not file_name:
@@ -126,12 +187,73 @@ async def download(
         )
 
         return await repository.download(
-            s3_url=get_document_metadata["s3_url"], name=get_document_metadata["name"]
+            document=get_document_metadata,
+            range_header=range_header,
+            if_range=if_range,
+            if_none_match=if_none_match,
+            accept_encoding=accept_encoding,
         )
+    except HTTPException as e:
+        if e.status_code != status.HTTP_404_NOT_FOUND:
+            raise
+        raise http_404(msg=f"No file with {file_name}") from e
     except Exception as e:
         raise http_404(msg=f"No file with {file_name}") from e
 
 
+@router.post(
+    "/download",
+    status_code=status.HTTP_200_OK,
+    name="download_documents",
+)
+async def download_documents(
+    archive_request: DocumentArchiveRequest,
+    repository: DocumentRepository = Depends(DocumentRepository),
+    metadata_repository: DocumentMetadataRepository = Depends(
+        get_repository(DocumentMetadataRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> StreamingResponse:
+    """
+    Downloads many documents as one zip archive, streamed while it is written.
+
+    Args:
+        archive_request (DocumentArchiveRequest): The ids or names of the documents, and/or
+            the folder whose documents, subfolders included, go into the archive.
+        repository (DocumentRepository): The repository for managing documents.
+        metadata_repository (DocumentMetadataRepository): The repository for managing document
+            metadata.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        StreamingResponse: The zip archive, as an attachment.
+
+    Raises:
+        HTTP_400: If no documents are asked for, or more than `ZIP_DOWNLOAD_MAX_DOCUMENTS`.
+        HTTP_404: If none of the documents exists.
+    """
+
+    if not archive_request.documents and not archive_request.folder:
+        raise http_400(msg="No documents or folder provided...")
+
+    documents = await metadata_repository.get_many(
+        documents=archive_request.documents,
+        folder=archive_request.folder,
+        owner=user,
+        limit=settings.zip_download_max_documents + 1,
+    )
+    if not documents:
+        raise http_404(msg="No documents found.")
+    if len(documents) > settings.zip_download_max_documents:
+        raise http_400(
+            msg=f"At most {settings.zip_download_max_documents} documents per download."
+        )
+
+    return await repository.download_archive(
+        documents=documents, name=archive_request.name
+    )
+
+
 @router.get(
     "/trash",
     status_code=status.HTTP_200_OK,
@@ -181,7 +303,8 @@ async def empty_trash(
         None
     """
 
-    return await metadata_repo.empty_bin(owner=user)
+    await metadata_repo.empty_bin(owner=user)
+    await metadata_repo.blob_repo.collect()
 
 
 @router.delete(
@@ -288,27 +411,42 @@ async def add_to_bin(
 )
 async def get_document_preview(
     document: Union[str, UUID],
+    size: Optional[str] = None,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
     repository: DocumentRepository = Depends(DocumentRepository),
     metadata_repository: DocumentMetadataRepository = Depends(
         get_repository(DocumentMetadataRepository)
     ),
     user: TokenData = Depends(get_current_user),
-) -> FileResponse:
+) -> Response:
     """
-    Get the preview of a document.
+    Get the preview of a document, streamed straight from storage.
+
+    Videos and audio can be played and seeked through range requests. A client that
+    already has the current version, going by its ETag, gets 304 Not Modified without
+    storage being contacted.
 
     Args:
         document (Union[str, UUID]): The ID or name of the document.
+        size (Optional[str]): The rendition to send instead of the original, e.g. "thumb".
+        range_header (Optional[str]): The byte ranges to send, if not the whole file.
+        if_range (Optional[str]): The ETag the ranges are valid for.
+        if_none_match (Optional[str]): The ETags of the versions the client already has.
+        accept_encoding (Optional[str]): The codecs the client can decompress.
         repository (DocumentRepository): The repository for accessing document data.
         metadata_repository (DocumentMetadataRepository): The repository for accessing document metadata.
         user (TokenData): The user token data.
 
     Returns:
-        FileResponse: The file response containing the document preview.
+        Response: The response streaming the document preview, or 304 Not Modified.
 
     Raises:
         HTTP_404: If the document ID or name is not provided or if the document does not exist.
         HTTP_400: If the file type is not supported for preview.
+        HTTP_416: If none of the requested ranges overlaps the file.
     """
 
     if not document:
@@ -317,7 +455,14 @@ async def get_document_preview(
         get_document_metadata = dict(
             await metadata_repository.get(document=document, owner=user)
         )
-        return await repository.preview(document=get_document_metadata)
+        return await repository.preview(
+            document=get_document_metadata,
+            range_header=range_header,
+            if_range=if_range,
+            if_none_match=if_none_match,
+            size=size,
+            accept_encoding=accept_encoding,
+        )
     except TypeError as e:
         raise http_404(msg="Document does not exists.") from e
     except ValueError as e:
@@ -61,13 +61,16 @@ async def share_link_document(
 
         visits = share_request.visits
         share_to = share_request.share_to
-        pre_signed_url = await repository.get_presigned_url(doc=doc.__dict__)
+        presigned = await repository.get_presigned_url(doc=doc.__dict__)
+        pre_signed_url = presigned.url
+        # the link must not outlive the URL it redirects to
         shareable_link = await repository.get_shareable_link(
             owner_id=user.id,
             url=pre_signed_url,
             visits=visits,
             filename=doc.__dict__["name"],
             share_to=share_to,
+            expires_at=presigned.expires_at,
         )
 
         if len(share_to) > 0:
@@ -161,7 +164,12 @@ async def share_document(
         )
         key = await get_key(s3_url=get_document_metadata["s3_url"])
 
-        file = await document_repo.get_s3_file_object_body(key=key)
+        file = await document_repo.get_s3_file_object_body(
+            key=key,
+            file_hash=get_document_metadata["file_hash"],
+            size=get_document_metadata["size"],
+            encoding=get_document_metadata["encoding"],
+        )
 
         return await repository.share_document(
             filename=get_document_metadata["name"],
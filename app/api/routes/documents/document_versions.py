@@ -0,0 +1,165 @@
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Header, Query, status
+from fastapi.responses import Response
+
+from app.api.dependencies.auth_utils import get_current_user
+from app.api.dependencies.repositories import get_repository
+from app.core.exceptions import http_404
+from app.db.repositories.documents.documents import DocumentRepository
+from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
+from app.schemas.auth.bands import TokenData
+from app.schemas.documents.document_versions import (
+    DocumentVersionList,
+    DocumentVersionRead,
+)
+from app.schemas.documents.documents_metadata import DocumentMetadataRead
+
+router = APIRouter(tags=["Document Versions"])
+
+
+async def _get_document(
+    metadata_repository: DocumentMetadataRepository, document: str, user: TokenData
+) -> Dict[str, Any]:
+
+    try:
+        return dict(await metadata_repository.get(document=document, owner=user))
+    except TypeError as e:
+        raise http_404(msg=f"No file with {document}") from e
+
+
+@router.get(
+    "/{document}",
+    response_model=DocumentVersionList,
+    status_code=status.HTTP_200_OK,
+    name="list_document_versions",
+)
+async def list_versions(
+    document: str,
+    limit: int = Query(default=20, gt=0, le=100),
+    before: Optional[int] = Query(default=None),
+    metadata_repository: DocumentMetadataRepository = Depends(
+        get_repository(DocumentMetadataRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> DocumentVersionList:
+    """
+    Lists the versions of a document, newest first, from the version history alone.
+
+    Args:
+        document (str): The id or name of the document.
+        limit (int): The number of versions per page. Defaults to 20.
+        before (Optional[int]): The `next_before` of the previous page.
+        metadata_repository (DocumentMetadataRepository): The repository for managing document metadata.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        DocumentVersionList: The versions of the page, and where the next page starts.
+    """
+
+    doc = await _get_document(metadata_repository, document=document, user=user)
+    versions = await metadata_repository.version_repo.list(
+        document_id=doc["id"], limit=limit, before=before
+    )
+
+    return DocumentVersionList(
+        response=[DocumentVersionRead.model_validate(v) for v in versions],
+        next_before=versions[-1].number if len(versions) == limit else None,
+    )
+
+
+@router.get(
+    "/{document}/{version}/download",
+    status_code=status.HTTP_200_OK,
+    name="download_document_version",
+)
+async def download_version(
+    document: str,
+    version: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    repository: DocumentRepository = Depends(DocumentRepository),
+    metadata_repository: DocumentMetadataRepository = Depends(
+        get_repository(DocumentMetadataRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> Response:
+    """
+    Downloads a version of a document.
+
+    Args:
+        document (str): The id or name of the document.
+        version (int): The number of the version.
+        range_header (Optional[str]): The byte ranges to send, if not the whole version.
+        if_range (Optional[str]): The ETag the ranges are valid for.
+        if_none_match (Optional[str]): The ETags of the versions the client already has.
+        accept_encoding (Optional[str]): The codecs the client can decompress.
+        repository (DocumentRepository): The repository for managing documents.
+        metadata_repository (DocumentMetadataRepository): The repository for managing document metadata.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        Response: The content of the version as an attachment, or 304 Not Modified.
+
+    Raises:
+        HTTP_404: If the document, the version or its content does not exist.
+    """
+
+    doc = await _get_document(metadata_repository, document=document, user=user)
+    doc_version = await metadata_repository.version_repo.get(
+        document_id=doc["id"], number=version
+    )
+
+    return await repository.download_version(
+        document=doc,
+        version=doc_version,
+        range_header=range_header,
+        if_range=if_range,
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding,
+    )
+
+
+@router.post(
+    "/{document}/{version}/restore",
+    response_model=DocumentMetadataRead,
+    status_code=status.HTTP_200_OK,
+    name="restore_document_version",
+)
+async def restore_version(
+    document: str,
+    version: int,
+    repository: DocumentRepository = Depends(DocumentRepository),
+    metadata_repository: DocumentMetadataRepository = Depends(
+        get_repository(DocumentMetadataRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> DocumentMetadataRead:
+    """
+    Makes a previous version the current content of a document, as its newest version.
+
+    Args:
+        document (str): The id or name of the document.
+        version (int): The number of the version to restore.
+        repository (DocumentRepository): The repository for managing documents.
+        metadata_repository (DocumentMetadataRepository): The repository for managing document metadata.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        DocumentMetadataRead: The metadata of the document with the restored content.
+
+    Raises:
+        HTTP_404: If the document, the version or its content does not exist.
+        HTTP_409: If the version is the current content of the document.
+    """
+
+    doc = await _get_document(metadata_repository, document=document, user=user)
+    doc_version = await metadata_repository.version_repo.get(
+        document_id=doc["id"], number=version
+    )
+
+    return await repository.restore_version(
+        metadata_repo=metadata_repository, document=doc, version=doc_version, user=user
+    )
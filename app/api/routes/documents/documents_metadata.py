@@ -8,6 +8,7 @@ from app.api.dependencies.auth_utils import get_current_user
 from app.core.exceptions import http_404
 from app.db.repositories.auth.auth import AuthRepository
 from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
+from app.db.repositories.documents.document_sharing import DocumentSharingRepository
 from app.schemas.auth.bands import TokenData
 from app.schemas.documents.bands import DocumentMetadataPatch
 from app.schemas.documents.documents_metadata import (
@@ -57,9 +58,13 @@ async def upload_document_metadata(
 async def get_documents_metadata(
     limit: int = Query(default=10, lt=100),
     offset: int = Query(default=0),
+    links: bool = Query(default=False),
     repository: DocumentMetadataRepository = Depends(
         get_repository(DocumentMetadataRepository)
     ),
+    sharing_repository: DocumentSharingRepository = Depends(
+        get_repository(DocumentSharingRepository)
+    ),
     user: TokenData = Depends(get_current_user),
 ) -> Dict[str, Union[List[DocumentMetadataRead], Any]]:
     """
@@ -68,14 +73,23 @@ async def get_documents_metadata(
     Args:
         limit (int): The maximum number of documents to retrieve. Defaults to 10.
         offset (int): The number of documents to skip. Defaults to 0.
+        links (bool): Whether to add a presigned download URL per document. Defaults to False.
         repository (DocumentMetadataRepository): The repository for managing document metadata.
+        sharing_repository (DocumentSharingRepository): The repository for managing document
+            sharing.
         user (TokenData): The token data of the authenticated user.
 
     Returns:
         Dict[str, Union[List[DocumentMetadataRead], Any]]: A dictionary containing the list of document metadata.
     """
 
-    return await repository.doc_list(limit=limit, offset=offset, owner=user)
+    documents = await repository.doc_list(limit=limit, offset=offset, owner=user)
+    if links:
+        documents["links"] = await sharing_repository.get_presigned_urls(
+            docs=documents["response"]
+        )
+
+    return documents
 
 
 @router.get(
@@ -0,0 +1,268 @@
+from typing import Dict
+from uuid import UUID
+
+from fastapi import APIRouter, Body, Depends, Request, status
+
+from app.api.dependencies.auth_utils import get_current_user
+from app.api.dependencies.repositories import get_repository
+from app.db.repositories.documents.documents import DocumentRepository
+from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
+from app.db.repositories.documents.upload_sessions import UploadSessionRepository
+from app.schemas.auth.bands import TokenData
+from app.schemas.documents.documents_metadata import DocumentMetadataRead
+from app.schemas.documents.upload_sessions import (
+    DirectUploadComplete,
+    DirectUploadCreate,
+    DirectUploadRead,
+    UploadSessionCreate,
+    UploadSessionRead,
+)
+
+router = APIRouter(tags=["Resumable Upload"])
+
+
+@router.post(
+    "",
+    response_model=UploadSessionRead,
+    status_code=status.HTTP_201_CREATED,
+    name="open_upload_session",
+)
+async def open_upload_session(
+    upload: UploadSessionCreate = Body(...),
+    repository: DocumentRepository = Depends(DocumentRepository),
+    session_repository: UploadSessionRepository = Depends(
+        get_repository(UploadSessionRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> UploadSessionRead:
+    """
+    Opens a resumable upload session.
+
+    Args:
+        upload (UploadSessionCreate): The name, type and optionally the size of the file.
+        repository (DocumentRepository): The repository for managing documents.
+        session_repository (UploadSessionRepository): The repository for upload sessions.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        UploadSessionRead: The session, with the chunk size to use for the chunks.
+    """
+
+    return await repository.open_upload_session(
+        session_repo=session_repository, upload=upload, user=user
+    )
+
+
+@router.post(
+    "/direct",
+    response_model=DirectUploadRead,
+    status_code=status.HTTP_201_CREATED,
+    name="open_direct_upload",
+)
+async def open_direct_upload(
+    upload: DirectUploadCreate = Body(...),
+    repository: DocumentRepository = Depends(DocumentRepository),
+    session_repository: UploadSessionRepository = Depends(
+        get_repository(UploadSessionRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> DirectUploadRead:
+    """
+    Hands out presigned URLs to upload a file straight to storage.
+
+    Args:
+        upload (DirectUploadCreate): The name, type, size and SHA-256 of the file.
+        repository (DocumentRepository): The repository for managing documents.
+        session_repository (UploadSessionRepository): The repository for upload sessions.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        DirectUploadRead: A presigned PUT url, or one presigned url per part for large files.
+    """
+
+    return await repository.open_direct_upload(
+        session_repo=session_repository, upload=upload, user=user
+    )
+
+
+@router.post(
+    "/direct/{upload_id}/complete",
+    response_model=DocumentMetadataRead,
+    status_code=status.HTTP_201_CREATED,
+    name="complete_direct_upload",
+)
+async def complete_direct_upload(
+    upload_id: UUID,
+    completion: DirectUploadComplete = Body(DirectUploadComplete()),
+    repository: DocumentRepository = Depends(DocumentRepository),
+    session_repository: UploadSessionRepository = Depends(
+        get_repository(UploadSessionRepository)
+    ),
+    metadata_repository: DocumentMetadataRepository = Depends(
+        get_repository(DocumentMetadataRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> DocumentMetadataRead:
+    """
+    Verifies a file uploaded with presigned URLs and creates the document.
+
+    Args:
+        upload_id (UUID): The id of the upload session.
+        completion (DirectUploadComplete): The ETags returned by storage for each part, for
+            multipart uploads.
+        repository (DocumentRepository): The repository for managing documents.
+        session_repository (UploadSessionRepository): The repository for upload sessions.
+        metadata_repository (DocumentMetadataRepository): The repository for managing document
+            metadata.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        DocumentMetadataRead: The metadata of the uploaded document.
+    """
+
+    return await repository.complete_direct_upload(
+        session_repo=session_repository,
+        metadata_repo=metadata_repository,
+        upload_id=upload_id,
+        completion=completion,
+        user=user,
+    )
+
+
+@router.put(
+    "/{upload_id}/chunks/{part_number}",
+    status_code=status.HTTP_200_OK,
+    name="upload_chunk",
+)
+async def upload_chunk(
+    upload_id: UUID,
+    part_number: int,
+    request: Request,
+    repository: DocumentRepository = Depends(DocumentRepository),
+    session_repository: UploadSessionRepository = Depends(
+        get_repository(UploadSessionRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> Dict[str, int]:
+    """
+    Uploads one chunk of the file, sent as the raw request body.
+
+    Args:
+        upload_id (UUID): The id of the upload session.
+        part_number (int): The 1-based position of the chunk in the file.
+        request (Request): The request carrying the chunk.
+        repository (DocumentRepository): The repository for managing documents.
+        session_repository (UploadSessionRepository): The repository for upload sessions.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        Dict[str, int]: The part number and the number of bytes stored.
+    """
+
+    return await repository.upload_chunk(
+        session_repo=session_repository,
+        upload_id=upload_id,
+        part_number=part_number,
+        chunk=request.stream(),
+        user=user,
+    )
+
+
+@router.get(
+    "/{upload_id}",
+    response_model=UploadSessionRead,
+    status_code=status.HTTP_200_OK,
+    name="upload_session_status",
+)
+async def upload_session_status(
+    upload_id: UUID,
+    session_repository: UploadSessionRepository = Depends(
+        get_repository(UploadSessionRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> UploadSessionRead:
+    """
+    Lists the chunks the server already has, so an interrupted upload can resume.
+
+    Args:
+        upload_id (UUID): The id of the upload session.
+        session_repository (UploadSessionRepository): The repository for upload sessions.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        UploadSessionRead: The session with its received chunks.
+    """
+
+    upload = await session_repository.get(upload_id=upload_id, owner=user)
+    return await session_repository.status(upload=upload)
+
+
+@router.post(
+    "/{upload_id}/complete",
+    response_model=DocumentMetadataRead,
+    status_code=status.HTTP_201_CREATED,
+    name="complete_upload_session",
+)
+async def complete_upload_session(
+    upload_id: UUID,
+    repository: DocumentRepository = Depends(DocumentRepository),
+    session_repository: UploadSessionRepository = Depends(
+        get_repository(UploadSessionRepository)
+    ),
+    metadata_repository: DocumentMetadataRepository = Depends(
+        get_repository(DocumentMetadataRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> DocumentMetadataRead:
+    """
+    Assembles the uploaded chunks and creates the document.
+
+    Args:
+        upload_id (UUID): The id of the upload session.
+        repository (DocumentRepository): The repository for managing documents.
+        session_repository (UploadSessionRepository): The repository for upload sessions.
+        metadata_repository (DocumentMetadataRepository): The repository for managing document
+            metadata.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        DocumentMetadataRead: The metadata of the uploaded document.
+    """
+
+    return await repository.complete_upload_session(
+        session_repo=session_repository,
+        metadata_repo=metadata_repository,
+        upload_id=upload_id,
+        user=user,
+    )
+
+
+@router.delete(
+    "/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    name="cancel_upload_session",
+)
+async def cancel_upload_session(
+    upload_id: UUID,
+    repository: DocumentRepository = Depends(DocumentRepository),
+    session_repository: UploadSessionRepository = Depends(
+        get_repository(UploadSessionRepository)
+    ),
+    user: TokenData = Depends(get_current_user),
+) -> None:
+    """
+    Cancels a resumable upload and discards its chunks.
+
+    Args:
+        upload_id (UUID): The id of the upload session.
+        repository (DocumentRepository): The repository for managing documents.
+        session_repository (UploadSessionRepository): The repository for upload sessions.
+        user (TokenData): The token data of the authenticated user.
+
+    Returns:
+        None
+    """
+
+    return await repository.cancel_upload_session(
+        session_repo=session_repository, upload_id=upload_id, user=user
+    )
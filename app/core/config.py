@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import Optional
 
 from dotenv import load_dotenv
@@ -33,6 +34,79 @@ class GlobalConfig(BaseSettings):
     s3_endpoint_url: Optional[str] = os.environ.get("S3_ENDPOINT_URL") or None
     s3_bucket: str = os.environ.get("S3_BUCKET", "")
     s3_test_bucket: Optional[str] = os.environ.get("S3_TEST_BUCKET") or None
+    # storage client shared by the process: pooled connections, timeouts in seconds, keep-alive
+    s3_max_pool_connections: int = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", "50"))
+    s3_connect_timeout: int = int(os.environ.get("S3_CONNECT_TIMEOUT", "5"))
+    s3_read_timeout: int = int(os.environ.get("S3_READ_TIMEOUT", "60"))
+    s3_tcp_keepalive: bool = str(os.environ.get("S3_TCP_KEEPALIVE", "True")).lower() == "true"
+    # uploads are streamed to storage in parts of this many bytes (S3 minimum is 5 MiB)
+    s3_multipart_chunk_size: int = int(os.environ.get("S3_MULTIPART_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    # codec text-like documents are compressed with at rest ("gzip", off by default with ""),
+    # its level, and the smallest document worth compressing
+    storage_compression: str = os.environ.get("STORAGE_COMPRESSION", "")
+    storage_compression_level: int = int(os.environ.get("STORAGE_COMPRESSION_LEVEL", "1"))
+    storage_compression_min_size: int = int(os.environ.get("STORAGE_COMPRESSION_MIN_SIZE", "1024"))
+    # threads for blocking work by kind: storage and disk I/O, CPU bound work, outbound mail
+    storage_io_workers: int = int(os.environ.get("STORAGE_IO_WORKERS", "32"))
+    cpu_workers: int = int(os.environ.get("CPU_WORKERS", str(os.cpu_count() or 4)))
+    mail_workers: int = int(os.environ.get("MAIL_WORKERS", "4"))
+    # objects of permanently deleted documents are removed from storage in the background,
+    # in batches of queued keys, polling the queue at the interval (seconds) when it is empty
+    storage_gc_enabled: bool = str(os.environ.get("STORAGE_GC_ENABLED", "True")).lower() == "true"
+    storage_gc_batch_size: int = int(os.environ.get("STORAGE_GC_BATCH_SIZE", "1000"))
+    storage_gc_interval_sec: int = int(os.environ.get("STORAGE_GC_INTERVAL_SEC", "30"))
+    storage_gc_workers: int = int(os.environ.get("STORAGE_GC_WORKERS", "4"))
+    # claimed deletions are retried after the lease when a worker dies, failed ones after
+    # an exponential backoff (seconds)
+    storage_gc_lease_sec: int = int(os.environ.get("STORAGE_GC_LEASE_SEC", "600"))
+    storage_gc_retry_sec: int = int(os.environ.get("STORAGE_GC_RETRY_SEC", "60"))
+    storage_gc_retry_max_sec: int = int(os.environ.get("STORAGE_GC_RETRY_MAX_SEC", "3600"))
+    # retention of the version history: the latest versions kept per document, and the
+    # age in days past which older versions are pruned, 0 for no limit
+    document_versions_keep: int = int(os.environ.get("DOCUMENT_VERSIONS_KEEP", "20"))
+    document_version_max_age_days: int = int(os.environ.get("DOCUMENT_VERSION_MAX_AGE_DAYS", "0"))
+    # startup checks of the schema and the bucket run in the background: the time one
+    # attempt may take, and the pause before a failed one is retried (seconds)
+    startup_check_timeout_sec: int = int(os.environ.get("STARTUP_CHECK_TIMEOUT_SEC", "10"))
+    startup_check_retry_sec: int = int(os.environ.get("STARTUP_CHECK_RETRY_SEC", "5"))
+    # number of files of one multi-file upload request processed at the same time
+    upload_concurrency: int = int(os.environ.get("UPLOAD_CONCURRENCY", "4"))
+    # metadata rows written per INSERT by the bulk archive importer
+    import_batch_size: int = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+    # largest archive member, and total of all members, the importer unpacks (bytes)
+    import_member_max_size: int = int(os.environ.get("IMPORT_MEMBER_MAX_SIZE", str(1024 * 1024 * 1024)))
+    import_max_total_size: int = int(os.environ.get("IMPORT_MAX_TOTAL_SIZE", str(10 * 1024 * 1024 * 1024)))
+    # resumable uploads not completed within this time are aborted
+    upload_session_expire_min: int = int(os.environ.get("UPLOAD_SESSION_EXPIRE_MIN", "1440"))
+    # how often abandoned upload sessions are looked for (seconds)
+    upload_session_gc_interval_sec: int = int(os.environ.get("UPLOAD_SESSION_GC_INTERVAL_SEC", "300"))
+    # largest chunk of a resumable upload, each chunk is held in memory while it is stored
+    # (S3 parts are at most 5 GiB)
+    upload_chunk_max_size: int = int(os.environ.get("UPLOAD_CHUNK_MAX_SIZE", str(64 * 1024 * 1024)))
+    # direct uploads up to this size get a single presigned PUT, larger ones presigned parts
+    presigned_put_max_size: int = int(os.environ.get("PRESIGNED_PUT_MAX_SIZE", str(256 * 1024 * 1024)))
+    presigned_upload_expire_sec: int = int(os.environ.get("PRESIGNED_UPLOAD_EXPIRE_SEC", "3600"))
+    # presigned download links, reused from a cache while still valid for the minimum time
+    presigned_url_expire_sec: int = int(os.environ.get("PRESIGNED_URL_EXPIRE_SEC", "3600"))
+    presigned_url_min_validity_sec: int = int(os.environ.get("PRESIGNED_URL_MIN_VALIDITY_SEC", "900"))
+    presigned_url_cache_max_entries: int = int(os.environ.get("PRESIGNED_URL_CACHE_MAX_ENTRIES", "10000"))
+    # downloads are streamed from storage to the client in chunks of this many bytes
+    s3_download_chunk_size: int = int(os.environ.get("S3_DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    # objects larger than this are read with concurrent ranged GETs of the given part size
+    s3_parallel_read_threshold: int = int(os.environ.get("S3_PARALLEL_READ_THRESHOLD", str(64 * 1024 * 1024)))
+    s3_parallel_read_part_size: int = int(os.environ.get("S3_PARALLEL_READ_PART_SIZE", str(8 * 1024 * 1024)))
+    s3_parallel_read_concurrency: int = int(os.environ.get("S3_PARALLEL_READ_CONCURRENCY", "4"))
+    # seconds browsers may reuse a preview or download before revalidating it with its ETag
+    document_cache_max_age: int = int(os.environ.get("DOCUMENT_CACHE_MAX_AGE", "0"))
+    # local disk cache of frequently read objects, a budget of 0 bytes disables it
+    object_cache_dir: str = os.environ.get("OBJECT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "docflow-cache"))
+    object_cache_max_bytes: int = int(os.environ.get("OBJECT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    # processes rendering thumbnails, and the largest document they are rendered for
+    rendition_workers: int = int(os.environ.get("RENDITION_WORKERS", "2"))
+    rendition_max_source_bytes: int = int(os.environ.get("RENDITION_MAX_SOURCE_BYTES", str(64 * 1024 * 1024)))
+    # documents of one zip download, and how many of them are fetched at the same time
+    zip_download_max_documents: int = int(os.environ.get("ZIP_DOWNLOAD_MAX_DOCUMENTS", "1000"))
+    zip_download_concurrency: int = int(os.environ.get("ZIP_DOWNLOAD_CONCURRENCY", "4"))
     # user config
     access_token_expire_min: int = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MIN", "30"))
     refresh_token_expire_min: int = int(os.environ.get("REFRESH_TOKEN_EXPIRE_MIN", "1440"))
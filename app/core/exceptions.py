@@ -33,6 +33,14 @@ def http_409(msg: str = "Entity already exists...") -> HTTPException:
     return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=msg)
 
 
+def http_416(
+    msg: str = "Range Not Satisfiable", headers: Dict[str, str] = None
+) -> HTTPException:
+    """Raised when none of the requested byte ranges overlaps the file."""
+    # the name of this status constant differs between starlette versions
+    return HTTPException(status_code=416, detail=msg, headers=headers)
+
+
 def http_500(msg: str = "Internal Server Error") -> HTTPException:
     """Raised when error caused due to internal server"""
     return HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=msg)
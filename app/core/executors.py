@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """
+    Thread pool for one kind of blocking work.
+
+    Every kind gets its own bounded pool, so a burst of one kind, e.g. large uploads,
+    queues up behind itself instead of taking the threads the others need. The pool is
+    created on first use, and counts the jobs waiting for a thread and how long they
+    waited.
+    """
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max(max_workers, 1)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"docflow-{self.name}",
+                )
+            return self._pool
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Runs `func` in the pool, like `asyncio.to_thread` does in the default one.
+        """
+
+        submitted = time.monotonic()
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+        def _job() -> T:
+            waited = time.monotonic() - submitted
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            try:
+                return call()
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        with self._lock:
+            self.queued += 1
+        future = self._get_pool().submit(_job)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # a job cancelled before it started never leaves the queue by itself
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.running
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "wait_avg_ms": (
+                    round(self.wait_total / started * 1000, 3) if started else 0.0
+                ),
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# storage requests and local disk I/O
+storage_executor = BoundedExecutor("storage", settings.storage_io_workers)
+# hashing, password hashing, compression and signing
+cpu_executor = BoundedExecutor("cpu", settings.cpu_workers)
+# outbound mail, a slow SMTP server only holds up other mails
+mail_executor = BoundedExecutor("mail", settings.mail_workers)
+# deletions of the storage collector, kept off the threads serving requests
+gc_executor = BoundedExecutor("gc", settings.storage_gc_workers)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        executor.name: executor.stats()
+        for executor in (storage_executor, cpu_executor, mail_executor, gc_executor)
+    }
+
+
+def shutdown_executors() -> None:
+    for executor in (storage_executor, cpu_executor, mail_executor, gc_executor):
+        executor.shutdown()
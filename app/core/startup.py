@@ -0,0 +1,106 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.logs.logger import docflow_logger
+
+
+class StartupChecks:
+    """
+    Initialisation checks, e.g. of the schema and of the bucket, run in the background
+    once the app started.
+
+    The app serves requests and answers liveness probes without waiting for the
+    database or storage. The checks run concurrently, each attempt bounded by a timeout,
+    and a failed check is retried until it passes; an attempt that timed out is given
+    more time rather than replaced while it still runs. Readiness reports whether all of
+    them passed.
+    """
+
+    def __init__(
+        self,
+        checks: Dict[str, Callable[[], Awaitable[Any]]],
+        timeout: float,
+        retry_interval: float,
+    ) -> None:
+        self.checks = checks
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._status = {name: {"status": "pending", "attempts": 0} for name in checks}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(name, check))
+                for name, check in self.checks.items()
+            ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every check passed, at most `timeout` seconds.
+
+        Returns:
+            bool: Whether the app is ready.
+        """
+
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+        return self.ready
+
+    async def _run(self, name: str, check: Callable[[], Awaitable[Any]]) -> None:
+        status = self._status[name]
+        # a timed out attempt may be stuck in a worker thread that cannot be cancelled,
+        # it is waited for again instead of starting another one next to it
+        attempt: Optional[asyncio.Future] = None
+        try:
+            while True:
+                if attempt is None:
+                    status["attempts"] += 1
+                    started = time.monotonic()
+                    attempt = asyncio.ensure_future(check())
+                done, _ = await asyncio.wait({attempt}, timeout=self.timeout)
+                if done:
+                    error, attempt = attempt.exception(), None
+                else:
+                    error = asyncio.TimeoutError()
+                if error is None:
+                    status.update(
+                        status="ok",
+                        error=None,
+                        duration_ms=round((time.monotonic() - started) * 1000, 3),
+                    )
+                    docflow_logger.info(f"Startup check {name} passed.")
+                    return
+                status.update(
+                    status="failed",
+                    error=(
+                        f"timed out after {self.timeout}s"
+                        if isinstance(error, asyncio.TimeoutError)
+                        else str(error) or type(error).__name__
+                    ),
+                )
+                docflow_logger.error(
+                    f"Startup check {name} failed, retrying in "
+                    f"{self.retry_interval}s: {status['error']}"
+                )
+                await asyncio.sleep(self.retry_interval)
+        finally:
+            if attempt is not None:
+                attempt.cancel()
+
+    @property
+    def ready(self) -> bool:
+        return all(status["status"] == "ok" for status in self._status.values())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "checks": {name: dict(status) for name, status in self._status.items()},
+        }
@@ -1,29 +1,21 @@
 import logging
 
-from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 from app.core.exceptions import http_500
 
 logger = logging.getLogger("sqlalchemy")
 
-engine = create_engine(
-    url=settings.sync_database_url,
-    echo=settings.db_echo_log,
-)
-
 async_engine = create_async_engine(
     url=settings.async_database_url,
     echo=settings.db_echo_log,
     query_cache_size=0,
 )
 
-session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-
 async_session = sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
@@ -38,11 +30,10 @@ metadata = Base.metadata
 
 async def check_tables():
     try:
-        with Session(engine) as _session:
-            # Create tables
-            metadata.create_all(engine)
-            _session.commit()
+        async with async_engine.begin() as conn:
+            # create_all is synchronous, run_sync drives it over the async connection
+            await conn.run_sync(metadata.create_all)
             logger.info("Tables created if they didn't already exist.")
-    except OperationalError as e:
+    except (OperationalError, OSError) as e:
         logger.error("Error Creating table: %s", e)
         raise http_500(msg="An error occurred while creating tables.") from e
@@ -10,6 +10,7 @@ from app.api.dependencies.auth_utils import (
     create_refresh_token,
 )
 from app.core.exceptions import http_400, http_403
+from app.core.executors import cpu_executor
 from app.db.tables.auth.auth import User
 from app.schemas.auth.bands import UserOut, UserAuth
 
@@ -41,8 +42,10 @@ class AuthRepository:
         if await self._check_user_or_none(userdata) is not None:
             raise http_400(msg="User with details already exists")
 
-        # hashing the password
-        hashed_password = get_hashed_password(password=userdata.password)
+        # hashing the password, bcrypt is slow on purpose so it runs off the event loop
+        hashed_password = await cpu_executor.run(
+            get_hashed_password, password=userdata.password
+        )
         userdata.password = hashed_password
 
         new_user = User(**userdata.model_dump())
@@ -59,8 +62,8 @@ class AuthRepository:
             raise http_403(msg="Recheck the credentials")
         user = user.__dict__
         hashed_password = user.get("password")
-        if not verify_password(
-            password=ipdata.password, hashed_password=hashed_password
+        if not await cpu_executor.run(
+            verify_password, password=ipdata.password, hashed_password=hashed_password
         ):
             raise http_403("Incorrect Password")
 
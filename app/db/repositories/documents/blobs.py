@@ -0,0 +1,229 @@
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, literal_column, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies.constants import RENDITION_SIZES
+from app.db.repositories.documents.renditions import rendition_key
+from app.db.repositories.documents.storage_deletions import StorageDeletionRepository
+from app.db.repositories.documents.storage_gc import storage_gc
+from app.db.tables.documents.blobs import Blob
+
+
+class AcquiredBlob(NamedTuple):
+    """Object key and codec of a blob, and whether the acquiring call created it."""
+
+    key: str
+    created: bool
+    encoding: Optional[str]
+
+
+class BlobRepository:
+    """
+    Repository for the reference counted, content-addressed blobs backing documents.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def acquire(self, file_hash: str, key: str, size: int) -> AcquiredBlob:
+        """
+        Takes a reference on the blob with the given hash, creating it if needed.
+
+        The row stays locked until the surrounding transaction ends, so a concurrent
+        upload of the same content waits for this one instead of storing it twice.
+
+        Args:
+            file_hash (str): The SHA-256 of the content.
+            key (str): The object key to use if the blob does not exist yet.
+            size (int): The size of the content in bytes.
+
+        Returns:
+            AcquiredBlob: The object key and codec of the blob, and whether it was created
+                by this call, in which case the caller has to write the object.
+        """
+
+        acquired = await self.acquire_many({file_hash: (key, size, 1)})
+
+        return acquired[file_hash]
+
+    async def acquire_many(
+        self, blobs: Dict[str, Tuple[str, int, int]]
+    ) -> Dict[str, AcquiredBlob]:
+        """
+        Takes references on many blobs with a single upsert, see `acquire`.
+
+        Args:
+            blobs (Dict[str, Tuple[str, int, int]]): The key to use if the blob does not
+                exist yet, the size and the number of references to take, by hash.
+
+        Returns:
+            Dict[str, AcquiredBlob]: The object key and codec of each blob, and whether it
+                was created by this call, by hash.
+        """
+
+        if not blobs:
+            return {}
+
+        # rows are locked in the order of the values and held until the commit, sorting
+        # them keeps concurrent uploads of the same contents from deadlocking
+        stmt = insert(Blob).values(
+            [
+                {"file_hash": file_hash, "key": key, "size": size, "ref_count": count}
+                for file_hash, (key, size, count) in sorted(blobs.items())
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Blob.file_hash],
+            set_={"ref_count": Blob.ref_count + stmt.excluded.ref_count},
+        ).returning(
+            Blob.file_hash,
+            Blob.key,
+            literal_column("xmax = 0").label("created"),
+            Blob.encoding,
+        )
+        rows = (await self.session.execute(stmt)).all()
+
+        return {
+            row.file_hash: AcquiredBlob(
+                key=row.key, created=row.created, encoding=row.encoding
+            )
+            for row in rows
+        }
+
+    async def page(self, after: Optional[str] = None, limit: int = 1000) -> List[Row]:
+        """
+        Pages through all blobs ordered by hash, which is also the order of their keys.
+
+        Args:
+            after (Optional[str]): The hash of the last blob of the previous page.
+            limit (int): The size of a page.
+
+        Returns:
+            List[Row]: The hash and object key of the blobs of the page.
+        """
+
+        stmt = select(Blob.file_hash, Blob.key).order_by(Blob.file_hash).limit(limit)
+        if after is not None:
+            stmt = stmt.where(Blob.file_hash > after)
+
+        return list((await self.session.execute(stmt)).all())
+
+    async def keys(
+        self,
+        prefix: str = "",
+        exclude: Tuple[str, ...] = (),
+        after: Optional[str] = None,
+        limit: int = 1000,
+    ) -> List[Row]:
+        """
+        Pages through the blobs whose object key is under a prefix, in the order storage
+        lists the keys. Blobs of finished uploads keep their key under `uploads/`, so the
+        order of the keys is not the order of the hashes.
+
+        Args:
+            prefix (str): The prefix of the keys.
+            exclude (Tuple[str, ...]): Prefixes of keys to leave out.
+            after (Optional[str]): The key of the last blob of the previous page.
+            limit (int): The size of a page.
+
+        Returns:
+            List[Row]: The hash and object key of the blobs of the page.
+        """
+
+        key = Blob.key.collate("C")
+        stmt = select(Blob.file_hash, Blob.key).order_by(key).limit(limit)
+        if prefix:
+            stmt = stmt.where(key.startswith(prefix, autoescape=True))
+        for excluded in exclude:
+            stmt = stmt.where(~key.startswith(excluded, autoescape=True))
+        if after is not None:
+            stmt = stmt.where(key > after)
+
+        return list((await self.session.execute(stmt)).all())
+
+    async def record_storage(
+        self, file_hash: str, encoding: Optional[str], stored_size: int
+    ) -> None:
+        """
+        Records how the object of a blob created in the current transaction was written.
+
+        Args:
+            file_hash (str): The SHA-256 of the content.
+            encoding (Optional[str]): The codec the object is compressed with, if any.
+            stored_size (int): The size of the object in storage.
+        """
+
+        await self.session.execute(
+            update(Blob)
+            .where(Blob.file_hash == file_hash)
+            .values(encoding=encoding, stored_size=stored_size)
+        )
+
+    async def discard(self, file_hashes: Iterable[str]) -> None:
+        """
+        Removes blobs created in the current transaction whose object could not be
+        written, so that no document ends up pointing at missing content.
+        """
+
+        if file_hashes := list(file_hashes):
+            await self.session.execute(
+                delete(Blob).where(Blob.file_hash.in_(file_hashes))
+            )
+
+    async def retain(self, file_hashes: Iterable[str]) -> None:
+        """
+        Takes one more reference per given hash on existing blobs, `None` entries are
+        ignored.
+        """
+
+        for file_hash, count in sorted(Counter(h for h in file_hashes if h).items()):
+            await self.session.execute(
+                update(Blob)
+                .where(Blob.file_hash == file_hash)
+                .values(ref_count=Blob.ref_count + count)
+            )
+
+    async def release(self, file_hashes: Iterable[str]) -> None:
+        """
+        Drops one reference per given hash, `None` entries are ignored.
+
+        Blobs that reach zero references are left for `collect` to remove.
+        """
+
+        for file_hash, count in sorted(Counter(h for h in file_hashes if h).items()):
+            await self.session.execute(
+                update(Blob)
+                .where(Blob.file_hash == file_hash)
+                .values(ref_count=Blob.ref_count - count)
+            )
+
+    async def collect(self) -> List[str]:
+        """
+        Removes the blobs nobody references any more and commits. Their objects and
+        renditions are queued for deletion from storage in the same transaction.
+
+        Returns:
+            List[str]: The object keys of the removed blobs.
+        """
+
+        stmt = (
+            delete(Blob).where(Blob.ref_count <= 0).returning(Blob.file_hash, Blob.key)
+        )
+        removed = (await self.session.execute(stmt)).all()
+        deletions = {row.key: None for row in removed}
+        for row in removed:
+            deletions.update(
+                {
+                    rendition_key(row.file_hash, size): row.file_hash
+                    for size in RENDITION_SIZES
+                }
+            )
+        await StorageDeletionRepository(self.session).enqueue(deletions)
+        await self.session.commit()
+        storage_gc.wake()
+
+        return [row.key for row in removed]
@@ -0,0 +1,110 @@
+import bz2
+import gzip
+import posixpath
+import tarfile
+import tempfile
+import zipfile
+from pathlib import PurePosixPath
+from typing import IO, Iterator, Optional, Tuple
+
+from starlette.datastructures import Headers, UploadFile
+
+from app.core.config import settings
+
+TAR_STREAM_MODES = {
+    "application/x-tar": "r|",
+    "application/x-gzip": "r|gz",
+    "application/x-bzip2": "r|bz2",
+}
+SINGLE_FILE_OPENERS = {
+    "application/x-gzip": (gzip.open, ".gz"),
+    "application/x-bzip2": (bz2.open, ".bz2"),
+}
+
+
+class MemberTooLarge(Exception):
+    """Raised when an archive member unpacks to more than it may."""
+
+
+def archive_members(
+    archive: IO[bytes], file_type: str, name: str
+) -> Iterator[Tuple[str, IO[bytes]]]:
+    """
+    Yields (path, stream) for every regular file of the archive, in archive order.
+
+    Tar archives are read in stream mode and their member list is dropped as we go,
+    so memory does not grow with the number of entries. A gzip or bzip2 file that
+    is not a tarball is yielded as a single member.
+    """
+
+    if file_type == "application/zip":
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if not info.is_dir():
+                    with zip_file.open(info) as member:
+                        yield info.filename, member
+        return
+
+    yielded = False
+    try:
+        with tarfile.open(fileobj=archive, mode=TAR_STREAM_MODES[file_type]) as tar:
+            for info in tar:
+                if info.isfile():
+                    yielded = True
+                    yield info.name, tar.extractfile(info)
+                tar.members = []
+    except tarfile.ReadError:
+        if yielded or file_type not in SINGLE_FILE_OPENERS:
+            raise
+        opener, suffix = SINGLE_FILE_OPENERS[file_type]
+        archive.seek(0)
+        with opener(archive) as member:
+            yield name.removesuffix(suffix), member
+
+
+def member_path(path: str, folder: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    Splits an archive path into the document name and its folder, below `folder`.
+    """
+
+    path = posixpath.normpath(path.replace("\\", "/")).lstrip("/")
+    if ".." in PurePosixPath(path).parts:
+        raise ValueError(f"Path outside of the archive: {path}")
+
+    directory, filename = posixpath.split(path)
+    parts = [part for part in (folder, directory) if part]
+
+    return filename, "/".join(parts) or None
+
+
+def spool_member(
+    member: IO[bytes], filename: str, file_type: str, max_size: int
+) -> UploadFile:
+    """
+    Copies one archive member into a spooled file that can be hashed and re-read.
+
+    Reading stops as soon as the member turns out larger than `max_size`, so an
+    archive bomb never gets unpacked further than that.
+
+    Raises:
+        MemberTooLarge: If the member is larger than `max_size`.
+    """
+
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.s3_multipart_chunk_size)
+    size = 0
+    while chunk := member.read(
+        min(settings.s3_multipart_chunk_size, max_size - size + 1)
+    ):
+        size += len(chunk)
+        if size > max_size:
+            spool.close()
+            raise MemberTooLarge(f"Larger than {max_size} bytes unpacked")
+        spool.write(chunk)
+    spool.seek(0)
+
+    return UploadFile(
+        file=spool,
+        size=size,
+        filename=filename,
+        headers=Headers({"content-type": file_type}),
+    )
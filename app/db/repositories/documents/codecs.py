@@ -0,0 +1,147 @@
+import tempfile
+import threading
+import zlib
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional
+
+from app.api.dependencies.constants import STORAGE_COMPRESS_TYPES
+from app.core.config import settings
+from app.core.executors import cpu_executor
+
+# codecs objects can be stored with, by their Content-Encoding name, as zlib window bits
+_WBITS = {"gzip": 31}
+
+
+def storage_encoding(file_type: Optional[str], size: int) -> Optional[str]:
+    """
+    Returns the codec a new blob of the given type and size is stored with, None to
+    store it as is.
+    """
+
+    if (
+        settings.storage_compression in _WBITS
+        and file_type in STORAGE_COMPRESS_TYPES
+        and size >= settings.storage_compression_min_size
+    ):
+        return settings.storage_compression
+    return None
+
+
+def encode_file(source: BinaryIO, encoding: str, size: int) -> Optional[BinaryIO]:
+    """
+    Compresses a file into a temporary file, kept in memory up to the size of a part.
+
+    Runs in a worker thread.
+
+    Args:
+        source (BinaryIO): The file to compress, rewound afterwards.
+        encoding (str): The codec to compress with.
+        size (int): The size of the file.
+
+    Returns:
+        Optional[BinaryIO]: The compressed file, rewound, None if compressing does not
+            make the file smaller, in which case it is stored as is.
+    """
+
+    compressor = zlib.compressobj(
+        settings.storage_compression_level, zlib.DEFLATED, _WBITS[encoding]
+    )
+    target = tempfile.SpooledTemporaryFile(max_size=settings.s3_multipart_chunk_size)
+    try:
+        source.seek(0)
+        while target.tell() < size and (
+            chunk := source.read(settings.s3_multipart_chunk_size)
+        ):
+            target.write(compressor.compress(chunk))
+        target.write(compressor.flush())
+    finally:
+        source.seek(0)
+
+    if target.tell() >= size:
+        target.close()
+        return None
+    target.seek(0)
+    return target
+
+
+def decode_bytes(data: bytes, encoding: Optional[str]) -> bytes:
+    return zlib.decompress(data, _WBITS[encoding]) if encoding else data
+
+
+def _inflate(decompressor, data: bytes) -> List[bytes]:
+    # bounded output per call, a small chunk of a log may expand a hundredfold
+    pieces = []
+    while data:
+        if piece := decompressor.decompress(data, settings.s3_download_chunk_size):
+            pieces.append(piece)
+        data = decompressor.unconsumed_tail
+    return pieces
+
+
+async def decode(
+    body: AsyncIterator[bytes],
+    encoding: str,
+    start: int = 0,
+    length: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Decompresses an object while it is read, in worker threads.
+
+    Yields `length` bytes of the content from `start`, all of it by default. Compressed
+    streams cannot be entered in the middle, so what precedes `start` is decompressed
+    and dropped, and reading stops as soon as the range was sent.
+    """
+
+    decompressor = zlib.decompressobj(_WBITS[encoding])
+    remaining = length
+
+    def _take(piece: bytes) -> bytes:
+        nonlocal start, remaining
+        if start:
+            skipped = min(start, len(piece))
+            piece, start = piece[skipped:], start - skipped
+        if remaining is not None:
+            piece = piece[:remaining]
+            remaining -= len(piece)
+        return piece
+
+    try:
+        async for chunk in body:
+            for piece in await cpu_executor.run(_inflate, decompressor, chunk):
+                if piece := _take(piece):
+                    yield piece
+                if remaining == 0:
+                    return
+        if piece := _take(decompressor.flush()):
+            yield piece
+    finally:
+        await body.aclose()
+
+
+class CompressionStats:
+    """
+    Counters of the blobs this process compressed, and of the storage they saved.
+    """
+
+    def __init__(self) -> None:
+        self.objects = 0
+        self.size = 0
+        self.stored_size = 0
+        self._lock = threading.Lock()
+
+    def record(self, size: int, stored_size: int) -> None:
+        with self._lock:
+            self.objects += 1
+            self.size += size
+            self.stored_size += stored_size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "objects": self.objects,
+                "bytes": self.size,
+                "stored_bytes": self.stored_size,
+                "saved_bytes": self.size - self.stored_size,
+            }
+
+
+compression_stats = CompressionStats()
@@ -1,11 +1,9 @@
-import asyncio
 import os
 import secrets
 import tempfile
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, Union, List
+from typing import Dict, Any, Optional, Union, List
 
-import boto3
 from botocore.exceptions import NoCredentialsError
 from sqlalchemy import select, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -14,13 +12,17 @@ from app.api.dependencies.mail_service import mail_service
 from app.api.dependencies.repositories import get_key
 from app.core.config import settings
 from app.core.exceptions import http_404, http_500
+from app.core.executors import cpu_executor, mail_executor
 from app.db.tables.auth.auth import User
 from app.db.tables.documents.document_sharing import DocumentSharing
 from app.db.repositories.auth.auth import AuthRepository
 from app.db.repositories.documents.notify import NotifyRepo
+from app.db.repositories.documents.presigned_urls import PresignedUrl, presigned_urls
+from app.db.storage import get_storage_client
 from app.logs.logger import docflow_logger
 from app.schemas.auth.bands import TokenData
 from app.schemas.documents.document_sharing import SharingRequest
+from app.schemas.documents.documents_metadata import DocumentMetadataRead
 
 
 class DocumentSharingRepository:
@@ -29,15 +31,7 @@ class DocumentSharingRepository:
     """
 
     def __init__(self, session: AsyncSession) -> None:
-        boto3_config = {
-            "aws_access_key_id": settings.aws_access_key_id,
-            "aws_secret_access_key": settings.aws_secret_key,
-            "region_name": settings.aws_region,
-        }
-        if settings.s3_endpoint_url:
-            boto3_config["endpoint_url"] = settings.s3_endpoint_url
-
-        self.client = boto3.client("s3", **boto3_config)
+        self.client = get_storage_client()
         self.session = session
 
     async def get_user_mail(self, user: TokenData):
@@ -82,27 +76,64 @@ class DocumentSharingRepository:
         except Exception as e:
             raise http_500() from e
 
-    async def get_presigned_url(
-        self, doc: Dict[str, Any]
-    ) -> Union[str, Dict[str, str]]:
+    async def get_presigned_url(self, doc: Dict[str, Any]) -> PresignedUrl:
+        """
+        Returns a freshly signed download URL of a document, valid for the whole
+        `settings.presigned_url_expire_sec`. Share links live as long as their URL, so a
+        cached one, possibly close to expiring, is never handed out here; the new URL
+        replaces it in the cache of the listings.
+
+        Raises:
+            HTTP_500: If the storage credentials cannot sign URLs.
+        """
+
+        key = await get_key(s3_url=doc["s3_url"])
         try:
-            params = {
-                "Bucket": settings.s3_bucket,
-                "Key": await get_key(s3_url=doc["s3_url"]),
-            }
-            response = await asyncio.to_thread(
-                self.client.generate_presigned_url,
+            urls = await cpu_executor.run(
+                presigned_urls.sign,
+                self.client,
+                settings.s3_bucket,
+                [key],
                 "get_object",
-                Params=params,
-                ExpiresIn=3600,
+            )
+            return urls[key]
+        except NoCredentialsError as e:
+            raise http_500(msg=f"Invalid AWS Credentials: {e}") from e
+
+    async def get_presigned_urls(
+        self, docs: List[DocumentMetadataRead]
+    ) -> Dict[str, str]:
+        """
+        Returns presigned download URLs of many documents, signing the ones not cached in
+        a single batch.
+
+        Args:
+            docs (List[DocumentMetadataRead]): The documents.
+
+        Returns:
+            Dict[str, str]: The URLs by document id.
+        """
+
+        keys = {str(doc.id): await get_key(s3_url=doc.s3_url) for doc in docs}
+        try:
+            urls = await presigned_urls.get_many(
+                client=self.client,
+                bucket=settings.s3_bucket,
+                keys=[key for key in keys.values() if key],
             )
         except NoCredentialsError as e:
-            return {"error": f"Invalid AWS Credentials: {e}"}
+            raise http_500(msg=f"Invalid AWS Credentials: {e}") from e
 
-        return response
+        return {doc_id: urls[key].url for doc_id, key in keys.items() if key in urls}
 
     async def get_shareable_link(
-        self, owner_id: str, url: str, visits: int, filename: str, share_to: List[str]
+        self,
+        owner_id: str,
+        url: str,
+        visits: int,
+        filename: str,
+        share_to: List[str],
+        expires_at: Optional[datetime] = None,
     ):
 
         # task to clean uo the database for expired links
@@ -124,7 +155,8 @@ class DocumentSharingRepository:
             owner_id=owner_id,
             filename=filename,
             url=url,
-            expires_at=datetime.now(timezone.utc) + timedelta(seconds=3599),
+            expires_at=expires_at
+            or datetime.now(timezone.utc) + timedelta(seconds=3599),
             visits=visits,
             share_to=share_to,
         )
@@ -173,8 +205,12 @@ class DocumentSharingRepository:
                     """
 
             for mails in mail_to:
-                mail_service(
-                    mail_to=mails, subject=subj, content=content, file_path=None
+                await mail_executor.run(
+                    mail_service,
+                    mail_to=mails,
+                    subject=subj,
+                    content=content,
+                    file_path=None,
                 )
 
     async def confirm_access(self, user: TokenData, url_id: str | None) -> bool:
@@ -232,8 +268,12 @@ class DocumentSharingRepository:
                 Regards,
                 DocFlow
                 """
-                mail_service(
-                    mail_to=mails, subject=subject, content=content, file_path=temp_path
+                await mail_executor.run(
+                    mail_service,
+                    mail_to=mails,
+                    subject=subject,
+                    content=content,
+                    file_path=temp_path,
                 )
         finally:
             os.unlink(temp_path)
@@ -0,0 +1,251 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies.repositories import get_key
+from app.core.exceptions import http_404
+from app.db.repositories.documents.blobs import BlobRepository
+from app.db.repositories.documents.storage_deletions import StorageDeletionRepository
+from app.db.tables.documents.document_versions import DocumentVersion
+from app.db.tables.documents.documents_metadata import DocumentMetadata
+
+# columns of a document that make up a version of it
+VERSION_COLUMNS = ("blob_hash", "s3_url", "file_hash", "size", "file_type", "encoding")
+
+
+class DocumentVersionRepository:
+    """
+    Repository for the version history of documents.
+
+    Listing and fetching versions only reads this table, storage is never asked to list
+    the versions of an object.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.blob_repo = BlobRepository(session)
+        self.deletion_repo = StorageDeletionRepository(session)
+
+    async def record(self, versions: List[Dict[str, Any]]) -> None:
+        """
+        Adds a new latest version to each given document, in the current transaction,
+        taking a reference on the blob of every version stored as one.
+
+        The documents are locked first, in id order, so concurrent uploads or restores of
+        the same document number their versions one after the other.
+
+        Args:
+            versions (List[Dict[str, Any]]): The `document_id`, `uploaded_by`, the version
+                columns of the document and, for a document owning its key, the
+                `s3_version_id` storage reported for the write.
+        """
+
+        if not versions:
+            return
+
+        document_ids = {version["document_id"] for version in versions}
+        await self.session.execute(
+            select(DocumentMetadata.id)
+            .where(DocumentMetadata.id.in_(document_ids))
+            .order_by(DocumentMetadata.id)
+            .with_for_update()
+        )
+        stmt = (
+            select(DocumentVersion.document_id, func.max(DocumentVersion.number))
+            .where(DocumentVersion.document_id.in_(document_ids))
+            .group_by(DocumentVersion.document_id)
+        )
+        numbers = dict((await self.session.execute(stmt)).all())
+
+        rows = []
+        for version in versions:
+            document_id = version["document_id"]
+            numbers[document_id] = numbers.get(document_id, 0) + 1
+            rows.append(
+                {
+                    "document_id": document_id,
+                    "number": numbers[document_id],
+                    "uploaded_by": version.get("uploaded_by"),
+                    "s3_version_id": version.get("s3_version_id"),
+                    **{column: version.get(column) for column in VERSION_COLUMNS},
+                }
+            )
+        await self.session.execute(insert(DocumentVersion).values(rows))
+        await self.blob_repo.retain(row["blob_hash"] for row in rows)
+
+    async def unversioned(self, document_ids: Iterable[UUID]) -> Dict[UUID, UUID]:
+        """
+        Finds the documents owning their key whose latest version has no object version
+        recorded, e.g. versions from before the history was kept.
+
+        Returns:
+            Dict[UUID, UUID]: The id of the latest version, by document id.
+        """
+
+        if not (document_ids := list(document_ids)):
+            return {}
+
+        stmt = (
+            select(DocumentVersion.document_id, DocumentVersion.id)
+            .where(DocumentVersion.document_id.in_(document_ids))
+            .where(DocumentVersion.blob_hash.is_(None))
+            .where(DocumentVersion.s3_version_id.is_(None))
+            .distinct(DocumentVersion.document_id)
+            .order_by(DocumentVersion.document_id, DocumentVersion.number.desc())
+        )
+
+        return dict((await self.session.execute(stmt)).all())
+
+    async def set_object_versions(self, object_versions: Dict[UUID, str]) -> None:
+        """
+        Records the object version of versions of documents owning their key.
+
+        Args:
+            object_versions (Dict[UUID, str]): The object version, by version id.
+        """
+
+        for version_id, s3_version_id in object_versions.items():
+            await self.session.execute(
+                update(DocumentVersion)
+                .where(DocumentVersion.id == version_id)
+                .values(s3_version_id=s3_version_id)
+            )
+
+    async def list(
+        self, document_id: UUID, limit: int = 20, before: Optional[int] = None
+    ) -> List[DocumentVersion]:
+        """
+        Pages through the versions of a document, newest first.
+
+        Args:
+            document_id (UUID): The id of the document.
+            limit (int): The size of a page.
+            before (Optional[int]): The number of the last version of the previous page.
+
+        Returns:
+            @return: The versions of the page.
+        """
+
+        stmt = (
+            select(DocumentVersion)
+            .where(DocumentVersion.document_id == document_id)
+            .order_by(DocumentVersion.number.desc())
+            .limit(limit)
+        )
+        if before is not None:
+            stmt = stmt.where(DocumentVersion.number < before)
+
+        return list((await self.session.scalars(stmt)).all())
+
+    async def get(self, document_id: UUID, number: int) -> DocumentVersion:
+
+        stmt = (
+            select(DocumentVersion)
+            .where(DocumentVersion.document_id == document_id)
+            .where(DocumentVersion.number == number)
+        )
+        if version := (await self.session.execute(stmt)).scalar_one_or_none():
+            return version
+        raise http_404(msg=f"No version {number} of document {document_id}")
+
+    async def latest(self, document_id: UUID) -> Optional[DocumentVersion]:
+
+        stmt = (
+            select(DocumentVersion)
+            .where(DocumentVersion.document_id == document_id)
+            .order_by(DocumentVersion.number.desc())
+            .limit(1)
+        )
+
+        return (await self.session.execute(stmt)).scalar_one_or_none()
+
+    async def purge(self, document_ids) -> None:
+        """
+        Removes every version of the given documents and drops their blob references, in
+        the current transaction. Objects of documents owning their key are deleted with
+        all of their versions by the caller.
+
+        Args:
+            document_ids: The ids of the documents, or a SELECT of them.
+        """
+
+        stmt = (
+            delete(DocumentVersion)
+            .where(DocumentVersion.document_id.in_(document_ids))
+            .returning(DocumentVersion.blob_hash)
+        )
+        removed = (await self.session.execute(stmt)).scalars().all()
+        await self.blob_repo.release(removed)
+
+    async def prune(self, keep: int, max_age_days: int, limit: int = 1000) -> int:
+        """
+        Removes one batch of versions past the retention policy and commits. The latest
+        version of a document is never removed.
+
+        Content stored as a blob loses the reference of the version, the blob is
+        collected once no document or version references it. A version of a document
+        owning its key is queued for deletion from storage on its own.
+
+        Args:
+            keep (int): The number of latest versions kept per document, 0 for no limit.
+            max_age_days (int): Older versions are removed, 0 for no limit.
+            limit (int): The largest number of versions removed.
+
+        Returns:
+            @return: The number of versions removed, less than `limit` once the policy is
+                met.
+        """
+
+        rank = (
+            func.row_number()
+            .over(
+                partition_by=DocumentVersion.document_id,
+                order_by=DocumentVersion.number.desc(),
+            )
+            .label("rank")
+        )
+        ranked = select(DocumentVersion.id, DocumentVersion.created_at, rank).subquery()
+
+        expired = []
+        if keep > 0:
+            expired.append(ranked.c.rank > keep)
+        if max_age_days > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+            expired.append(ranked.c.created_at < cutoff)
+        if not expired:
+            return 0
+
+        batch = (
+            select(ranked.c.id)
+            .where(ranked.c.rank > 1)
+            .where(or_(*expired))
+            .limit(limit)
+        )
+        stmt = (
+            delete(DocumentVersion)
+            .where(DocumentVersion.id.in_(batch))
+            .returning(
+                DocumentVersion.blob_hash,
+                DocumentVersion.s3_url,
+                DocumentVersion.s3_version_id,
+            )
+        )
+        removed = (await self.session.execute(stmt)).all()
+
+        await self.blob_repo.release(row.blob_hash for row in removed)
+        # without a recorded object version the content was overwritten in storage
+        await self.deletion_repo.enqueue_versions(
+            [
+                (await get_key(s3_url=row.s3_url), row.s3_version_id)
+                for row in removed
+                if row.blob_hash is None and row.s3_version_id is not None
+            ]
+        )
+        # commits, and wakes the collector for the queued versions
+        await self.blob_repo.collect()
+
+        return len(removed)
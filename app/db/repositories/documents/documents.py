@@ -1,50 +1,105 @@
 import asyncio
+import base64
 import hashlib
+import mimetypes
 import os
-import tempfile
-from typing import Dict, Any
+import tarfile
+import zipfile
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from uuid import UUID, uuid4
 
-import boto3
 from botocore.exceptions import ClientError
-from fastapi import File
-from starlette.responses import FileResponse
+from fastapi import File, HTTPException, UploadFile
+from starlette.responses import Response, StreamingResponse
 
-from app.api.dependencies.constants import SUPPORTED_FILE_TYPES
-from app.api.dependencies.repositories import TempFileResponse, get_key, get_s3_url
+from app.api.dependencies.constants import (
+    S3_MAX_COPY_SIZE,
+    S3_MAX_PART_SIZE,
+    S3_MAX_PARTS,
+    S3_MIN_PART_SIZE,
+    RENDITION_SIZES,
+    SUPPORTED_FILE_TYPES,
+    ZIP_PREFETCH_CHUNKS,
+)
+from app.api.dependencies.repositories import (
+    accepts_encoding,
+    get_content_disposition,
+    etag_matches,
+    get_etag,
+    get_key,
+    get_s3_url,
+)
+from app.api.dependencies.ranges import parse_range
 from app.core.config import settings
-from app.core.exceptions import http_400, http_404
+from app.core.executors import cpu_executor, storage_executor
+from app.core.exceptions import http_400, http_404, http_409
+from app.db.repositories.documents.blobs import BlobRepository
+from app.db.repositories.documents.bulk_import import (
+    TAR_STREAM_MODES,
+    MemberTooLarge,
+    archive_members,
+    member_path,
+    spool_member,
+)
+from app.db.repositories.documents.codecs import (
+    compression_stats,
+    decode,
+    decode_bytes,
+    encode_file,
+    storage_encoding,
+)
+from app.db.repositories.documents.document_versions import VERSION_COLUMNS
 from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
+from app.db.repositories.documents.object_cache import object_cache, read_chunks
+from app.db.repositories.documents.renditions import (
+    RENDITION_SOURCE_TYPES,
+    render_in_pool,
+    rendition_key,
+)
+from app.db.repositories.documents.zip_stream import ZipSink, entry_info
+from app.db.storage import get_storage_client
+from app.db.tables.documents.document_versions import DocumentVersion
+from app.db.repositories.documents.upload_sessions import UploadSessionRepository
+from app.db.tables.documents.upload_sessions import UploadSession
 from app.logs.logger import docflow_logger
 from app.schemas.auth.bands import TokenData
+from app.schemas.documents.documents_metadata import DocumentMetadataRead
+from app.schemas.documents.upload_sessions import (
+    DirectUploadComplete,
+    DirectUploadCreate,
+    DirectUploadRead,
+    PresignedPart,
+    UploadSessionCreate,
+    UploadSessionRead,
+)
 
 
-def _build_boto3_config() -> dict:
-    config = {
-        "aws_access_key_id": settings.aws_access_key_id,
-        "aws_secret_access_key": settings.aws_secret_key,
-        "region_name": settings.aws_region,
-    }
-    if settings.s3_endpoint_url:
-        config["endpoint_url"] = settings.s3_endpoint_url
-    return config
+class FileDigest(NamedTuple):
+    """SHA-256 and size of an uploaded file, computed in a single pass."""
 
-
-_boto3_config = _build_boto3_config()
-_s3_resource = boto3.resource("s3", **_boto3_config)
-_s3_client = boto3.client("s3", **_boto3_config)
-_s3_bucket = _s3_resource.Bucket(settings.s3_bucket)
-
-try:
-    _s3_client.put_bucket_versioning(
-        Bucket=settings.s3_bucket, VersioningConfiguration={"Status": "Enabled"}
-    )
-except Exception:
-    # MinIO does not support versioning in all configurations
-    pass
+    sha256: str
+    size: int
+    # version of the object storage wrote, None if the bucket does not keep versions
+    version_id: Optional[str] = None
 
 
 async def perm_delete(
-    file: str, delete_all: bool, meta_repo: DocumentMetadataRepository, user: TokenData
+    file: str,
+    delete_all: bool,
+    meta_repo: DocumentMetadataRepository,
+    user: TokenData,
 ) -> None:
 
     if delete_all:
@@ -52,199 +107,1915 @@ async def perm_delete(
     else:
         doc = await meta_repo.bin_list(owner=user)
         for docs in doc.get("response"):
-            if docs.DocumentMetadata.name == file:
-                doc_id = docs.DocumentMetadata.id
-                await meta_repo.perm_delete_a_doc(document=doc_id, owner=user)
+            if docs.name == file:
+                await meta_repo.perm_delete_a_doc(document=docs.id, owner=user)
+
+    # the objects are deleted from storage in the background
+    await meta_repo.blob_repo.collect()
 
 
 class DocumentRepository:
 
     def __init__(self):
-        self.s3_client = _s3_resource
-        self.client = _s3_client
-        self.s3_bucket = _s3_bucket
+        self.client = get_storage_client()
 
     @staticmethod
-    async def _calculate_file_hash(file: File) -> str:
+    async def _file_digest(file: File) -> FileDigest:
+        """
+        Hashes the file in a worker thread, reading it once in bounded chunks.
 
-        file.file.seek(0)
-        contents = file.file.read()
-        file.file.seek(0)
+        Content is deduplicated by its hash, so the hash has to be known before deciding
+        whether to write it at all: a new blob is read once here and once more by
+        `_put_object`, content already stored is only read here.
+        """
+
+        def _digest() -> FileDigest:
+            file_hash, size = hashlib.sha256(), 0
+            file.file.seek(0)
+            while chunk := file.file.read(settings.s3_multipart_chunk_size):
+                file_hash.update(chunk)
+                size += len(chunk)
+            file.file.seek(0)
+            return FileDigest(sha256=file_hash.hexdigest(), size=size)
 
-        return hashlib.sha256(contents).hexdigest()
+        return await cpu_executor.run(_digest)
 
-    async def get_s3_file_object_body(self, key: str):
+    async def get_s3_file_object_body(
+        self,
+        key: str,
+        file_hash: Optional[str] = None,
+        size: Optional[int] = None,
+        encoding: Optional[str] = None,
+    ):
         def _get():
             obj = self.client.get_object(Bucket=settings.s3_bucket, Key=key)
             return obj["Body"].read()
 
-        return await asyncio.to_thread(_get)
+        if file_hash and (
+            cached := await storage_executor.run(object_cache.open, key, file_hash)
+        ):
+            with cached:
+                body = await storage_executor.run(cached.read)
+        else:
+            # the size of a compressed object is not known up front
+            if not encoding and size and size > settings.s3_parallel_read_threshold:
+                parts = await self._read_parts(key=key, start=0, end=size - 1)
+                body = b"".join([part async for part in parts])
+            else:
+                body = await storage_executor.run(_get)
+            if file_hash and object_cache.accepts(len(body)):
+                await storage_executor.run(object_cache.put, key, file_hash, body)
+
+        if encoding:
+            return await cpu_executor.run(decode_bytes, body, encoding)
+        return body
 
     async def _delete_object(self, key: str) -> None:
-        await asyncio.to_thread(
+        await storage_executor.run(
             self.client.delete_object, Bucket=settings.s3_bucket, Key=key
         )
 
-    async def _upload_new_file(
-        self, file: File, folder: str, contents, file_type: str, user: TokenData
-    ) -> Dict[str, Any]:
+    async def _put_object(
+        self,
+        file: File,
+        key: str,
+        file_hash: Optional[str] = None,
+        content_encoding: Optional[str] = None,
+    ) -> FileDigest:
+        """
+        Streams the file to storage without holding more than one part in memory.
+
+        Files smaller than a single part are sent with one PUT, larger ones go through
+        an S3 multipart upload which is aborted on failure, so no orphaned parts are
+        left behind in the bucket. Unless the caller already knows it, the SHA-256 of
+        the file is computed on the same pass, in the worker thread sending each part;
+        blobs are hashed beforehand by `_file_digest`, so their files are read twice.
+
+        Args:
+            file: The file to be uploaded.
+            key: The object key to write to.
+            file_hash: The already computed hash of the file, if any.
+            content_encoding: The codec the file is compressed with, if any, which
+                storage sends along with the object.
+
+        Returns:
+            FileDigest: The hash and the number of bytes written.
+        """
+
+        part_size = max(settings.s3_multipart_chunk_size, S3_MIN_PART_SIZE)
+        digest = hashlib.sha256()
+        extra = {"ContentEncoding": content_encoding} if content_encoding else {}
+
+        def _send(send, chunk: bytes, **kwargs):
+            if file_hash is None:
+                digest.update(chunk)
+            return send(Bucket=settings.s3_bucket, Key=key, Body=chunk, **kwargs)
+
+        await file.seek(0)
+        chunk = await file.read(part_size)
+        if len(chunk) < part_size:
+            response = await storage_executor.run(
+                _send, self.client.put_object, chunk, **extra
+            )
+            await file.seek(0)
+            return FileDigest(
+                sha256=file_hash or digest.hexdigest(),
+                size=len(chunk),
+                version_id=response.get("VersionId"),
+            )
+
+        multipart = await storage_executor.run(
+            self.client.create_multipart_upload,
+            Bucket=settings.s3_bucket,
+            Key=key,
+            **extra,
+        )
+        upload_id = multipart["UploadId"]
+        parts, size = [], 0
+        try:
+            while chunk:
+                part_number = len(parts) + 1
+                part = await storage_executor.run(
+                    _send,
+                    self.client.upload_part,
+                    chunk,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                )
+                parts.append({"ETag": part["ETag"], "PartNumber": part_number})
+                size += len(chunk)
+                chunk = await file.read(part_size)
+
+            response = await storage_executor.run(
+                self.client.complete_multipart_upload,
+                Bucket=settings.s3_bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            docflow_logger.error(f"Multipart upload of {key} failed, aborting...")
+            await storage_executor.run(
+                self.client.abort_multipart_upload,
+                Bucket=settings.s3_bucket,
+                Key=key,
+                UploadId=upload_id,
+            )
+            raise
+        finally:
+            await file.seek(0)
+
+        return FileDigest(
+            sha256=file_hash or digest.hexdigest(),
+            size=size,
+            version_id=response.get("VersionId"),
+        )
+
+    async def _object_version(self, key: str) -> Optional[str]:
+        """
+        Returns the version id of the current object at a key, None if storage does not
+        report one.
+        """
+
+        try:
+            obj = await storage_executor.run(
+                self.client.head_object, Bucket=settings.s3_bucket, Key=key
+            )
+        except ClientError as e:
+            docflow_logger.warning(f"Could not get the version of {key}: {e}")
+            return None
+
+        return obj.get("VersionId")
+
+    @staticmethod
+    def _blob_key(file_hash: str, file_type: str) -> str:
+        """
+        Returns a fresh object key for a blob, every incarnation of a blob gets its own.
+        """
 
         from ulid import ULID
 
-        if folder is None:
-            key = f"{user.id}/{str(ULID())}.{SUPPORTED_FILE_TYPES[file_type]}"
-        else:
-            key = f"{user.id}/{folder}/{str(ULID())}.{SUPPORTED_FILE_TYPES[file_type]}"
+        return f"blobs/{file_hash}/{str(ULID())}.{SUPPORTED_FILE_TYPES[file_type]}"
+
+    async def _write_blob(
+        self, file: File, key: str, digest: FileDigest, file_type: str
+    ) -> Tuple[Optional[str], int]:
+        """
+        Writes the object of a new blob, compressed when its type is worth it and
+        compressing makes it smaller.
 
-        await asyncio.to_thread(self.s3_bucket.put_object, Key=key, Body=contents)
+        Returns:
+            Tuple[Optional[str], int]: The codec the object was written with, None if it
+                was stored as is, and its size in storage.
+        """
 
-        return {
-            "response": "file_added",
-            "upload": {
-                "owner_id": user.id,
-                "name": file.filename,
-                "s3_url": await get_s3_url(key=key),
-                "size": len(contents),
-                "file_type": file_type,
-                "file_hash": await self._calculate_file_hash(file=file),
-            },
-        }
+        if encoding := storage_encoding(file_type, digest.size):
+            encoded = await cpu_executor.run(
+                encode_file, file.file, encoding, digest.size
+            )
+            if encoded is not None:
+                try:
+                    written = await self._put_object(
+                        file=UploadFile(file=encoded, filename=file.filename),
+                        key=key,
+                        file_hash=digest.sha256,
+                        content_encoding=encoding,
+                    )
+                finally:
+                    encoded.close()
+                compression_stats.record(digest.size, written.size)
+                return encoding, written.size
+
+        await self._put_object(file=file, key=key, file_hash=digest.sha256)
+        return None, digest.size
+
+    async def _store_blob(
+        self, file: File, digest: FileDigest, file_type: str, blob_repo: BlobRepository
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Stores the file content-addressed, skipping the write if the same content is
+        already in storage.
+
+        Returns:
+            Tuple[str, Optional[str]]: The object key of the blob holding the file, and
+                the codec it is stored with.
+        """
+
+        blob = await blob_repo.acquire(
+            file_hash=digest.sha256,
+            key=self._blob_key(digest.sha256, file_type),
+            size=digest.size,
+        )
+        if not blob.created:
+            docflow_logger.info(
+                f"Content of {file.filename} already stored at {blob.key}"
+            )
+            return blob.key, blob.encoding
+
+        encoding, stored_size = await self._write_blob(
+            file=file, key=blob.key, digest=digest, file_type=file_type
+        )
+        await blob_repo.record_storage(
+            file_hash=digest.sha256, encoding=encoding, stored_size=stored_size
+        )
 
-    async def _upload_new_version(
+        return blob.key, encoding
+
+    async def _upload_new_file(
         self,
-        doc: dict,
         file: File,
-        contents,
+        folder: str,
         file_type: str,
-        new_file_hash: str,
-        is_owner: bool,
+        user: TokenData,
+        blob_repo: BlobRepository,
     ) -> Dict[str, Any]:
 
-        key = await get_key(s3_url=doc["s3_url"])
-
-        await asyncio.to_thread(self.s3_bucket.put_object, Key=key, Body=contents)
+        digest = await self._file_digest(file=file)
+        key, encoding = await self._store_blob(
+            file=file, digest=digest, file_type=file_type, blob_repo=blob_repo
+        )
 
         return {
-            "response": "file_updated",
-            "is_owner": is_owner,
+            "response": "file_added",
             "upload": {
+                "owner_id": user.id,
                 "name": file.filename,
                 "s3_url": await get_s3_url(key=key),
-                "size": len(contents),
+                "size": digest.size,
                 "file_type": file_type,
-                "file_hash": new_file_hash,
+                "file_hash": digest.sha256,
+                "blob_hash": digest.sha256,
+                "encoding": encoding,
+                "folder": folder,
             },
         }
 
     async def upload(
-        self, metadata_repo, user_repo, file: File, folder: str, user: TokenData
-    ) -> Dict[str, Any]:
+        self,
+        metadata_repo,
+        user_repo,
+        files: List[File],
+        folder: Optional[str],
+        user: TokenData,
+    ) -> List[Any]:
         """
-        Uploads a file to the specified folder in the document repository.
+        Uploads the files of one request to the specified folder in the document repository.
+
+        Every file is hashed exactly once, in a worker thread, and content that is already
+        in the blob store is not uploaded again. New content is read a second time to be
+        sent, as its hash decides whether it is written. Hashing and storage run
+        concurrently, at most `settings.upload_concurrency` files at a time, while the
+        metadata is written in one transaction: the new documents with a single
+        multi-row INSERT, then each updated document and its new version in a savepoint
+        of its own, then one commit. A file that fails, or whose name was taken in the
+        meantime, is reported in its slot of the result without aborting the rest of the
+        batch.
 
         Args:
             metadata_repo: The repository for accessing metadata.
             user_repo: The repository for accessing user information.
-            file: The file to be uploaded.
-            folder: The folder in which the file should be uploaded.
+            files: The files to be uploaded.
+            folder: The folder in which the files should be uploaded.
             user: The token data of the user.
 
         Returns:
-            @return: A dictionary containing the response and upload information.
-
-        Raises:
-            HTTP_400: If the file type is not supported.
+            @return: One result per file, in the order of `files`. The metadata of the added
+                or updated document, otherwise a response dictionary, with an "error" key
+                if the file failed.
         """
 
-        file_type = file.content_type
-        if file_type not in SUPPORTED_FILE_TYPES:
-            raise http_400(msg=f"File type {file_type} not supported.")
-
-        contents = await file.read()
-
-        doc = (await metadata_repo.get(document=file.filename, owner=user)).__dict__
-        new_file_hash: str = await self._calculate_file_hash(file=file)
-
-        if "status_code" in doc.keys():
-            # getting document irrespective of user
-            if get_doc := await metadata_repo.get_doc(filename=file.filename):
-                get_doc = get_doc.__dict__
-                # Check if logged-in user has update access
-                logged_in_user = (
-                    await user_repo.get_user(field="username", detail=user.username)
-                ).__dict__
-                if (get_doc["access_to"] is not None) and logged_in_user[
-                    "email"
-                ] in get_doc["access_to"]:
-                    if get_doc["file_hash"] != new_file_hash:
-                        docflow_logger.info(
-                            f"User has update access to file owned by: {get_doc['owner_id']}"
-                        )
-                        return await self._upload_new_version(
-                            doc=get_doc,
+        blob_repo = metadata_repo.blob_repo
+        version_repo = metadata_repo.version_repo
+        limit = asyncio.Semaphore(max(settings.upload_concurrency, 1))
+
+        async def _bounded(coro):
+            async with limit:
+                return await coro
+
+        results: List[Any] = [None] * len(files)
+        plans: Dict[str, Dict[str, Any]] = {}
+        for index, file in enumerate(files):
+            if file.content_type not in SUPPORTED_FILE_TYPES:
+                results[index] = {
+                    "file": file.filename,
+                    "error": f"File type {file.content_type} not supported.",
+                }
+            elif file.filename in plans:
+                results[index] = {
+                    "file": file.filename,
+                    "error": "File is uploaded more than once in this request.",
+                }
+            else:
+                plans[file.filename] = {"index": index, "file": file}
+
+        resolved = await metadata_repo.resolve_uploads(names=list(plans), owner=user)
+        for name, plan in plans.items():
+            plan["kind"], plan["doc"] = resolved.get(name, ("new", None))
+            if plan["kind"] == "owned":
+                docflow_logger.info(
+                    f"File {name} already present, checking for updates..."
+                )
+
+        digests = await asyncio.gather(
+            *(
+                _bounded(self._file_digest(file=plan["file"]))
+                for plan in plans.values()
+            ),
+            return_exceptions=True,
+        )
+
+        # blobs to take references on, by hash
+        blobs: Dict[str, Dict[str, Any]] = {}
+        for name, digest in zip(list(plans), digests):
+            plan = plans[name]
+            if isinstance(digest, Exception):
+                docflow_logger.error(f"Reading {name} failed: {digest}")
+                del plans[name]
+                results[plan["index"]] = {"file": name, "error": "Upload failed."}
+                continue
+            plan["digest"] = digest
+            if plan["kind"] != "new" and plan["doc"]["file_hash"] == digest.sha256:
+                del plans[name]
+                if plan["kind"] == "owned":
+                    results[plan["index"]] = {
+                        "file": name,
+                        "response": "File already present and no changes detected.",
+                        "upload": "Nothing to update...",
+                    }
+                    continue
+                plan = plans[name] = {**plan, "kind": "new", "doc": None}
+
+            if plan["kind"] == "shared":
+                docflow_logger.info(
+                    f"User has update access to file owned by: {plan['doc']['owner_id']}"
+                )
+            if plan["kind"] == "new" or plan["doc"]["blob_hash"] is not None:
+                # the old content may be shared with other documents, so a new version
+                # becomes its own blob and the document drops its reference to the old one
+                blob = blobs.setdefault(
+                    digest.sha256,
+                    {
+                        "key": self._blob_key(digest.sha256, plan["file"].content_type),
+                        "size": digest.size,
+                        "count": 0,
+                        "file": plan["file"],
+                        "digest": digest,
+                    },
+                )
+                blob["count"] += 1
+                plan["blob_hash"] = digest.sha256
+            else:
+                # documents from before the blob store own their key, bucket versioning
+                # keeps the previous content
+                plan["blob_hash"] = None
+                plan["key"] = await get_key(s3_url=plan["doc"]["s3_url"])
+
+        try:
+            acquired = await blob_repo.acquire_many(
+                {
+                    file_hash: (blob["key"], blob["size"], blob["count"])
+                    for file_hash, blob in blobs.items()
+                }
+            )
+            encodings = {
+                file_hash: blob.encoding for file_hash, blob in acquired.items()
+            }
+            for plan in plans.values():
+                if plan["blob_hash"] is not None:
+                    plan["key"] = acquired[plan["blob_hash"]].key
+
+            # the content at the key of a document from before the blob store becomes a
+            # previous version, which has to be addressable once it is overwritten
+            legacy = {
+                plan["doc"]["id"]: plan["key"]
+                for plan in plans.values()
+                if plan["blob_hash"] is None
+            }
+            unversioned = await version_repo.unversioned(legacy)
+            object_versions = await asyncio.gather(
+                *(
+                    _bounded(self._object_version(key=legacy[document_id]))
+                    for document_id in unversioned
+                )
+            )
+            await version_repo.set_object_versions(
+                {
+                    version_id: object_version
+                    for version_id, object_version in zip(
+                        unversioned.values(), object_versions
+                    )
+                    if object_version is not None
+                }
+            )
+
+            # a new blob is written once, however many files of the request share it
+            writes = [
+                (file_hash, blobs[file_hash]["file"], blob.key)
+                for file_hash, blob in acquired.items()
+                if blob.created
+            ] + [
+                (None, plan["file"], plan["key"])
+                for plan in plans.values()
+                if plan["blob_hash"] is None
+            ]
+            outcomes = await asyncio.gather(
+                *(
+                    _bounded(
+                        self._put_object(file=file, key=key)
+                        if file_hash is None
+                        else self._write_blob(
                             file=file,
-                            contents=contents,
-                            file_type=file_type,
-                            new_file_hash=await self._calculate_file_hash(file=file),
-                            is_owner=False,
+                            key=key,
+                            digest=blobs[file_hash]["digest"],
+                            file_type=file.content_type,
+                        )
+                    )
+                    for file_hash, file, key in writes
+                ),
+                return_exceptions=True,
+            )
+            failed_keys = set()
+            for (file_hash, file, key), outcome in zip(writes, outcomes):
+                if file_hash is None:
+                    # a document from before the blob store got new content at its key
+                    await storage_executor.run(object_cache.invalidate, key)
+                if isinstance(outcome, Exception):
+                    docflow_logger.error(f"Upload of {file.filename} failed: {outcome}")
+                    failed_keys.add(key)
+                elif file_hash is None:
+                    plans[file.filename]["digest"] = outcome
+                else:
+                    encodings[file_hash], stored_size = outcome
+                    await blob_repo.record_storage(
+                        file_hash=file_hash,
+                        encoding=encodings[file_hash],
+                        stored_size=stored_size,
+                    )
+            await blob_repo.discard(
+                file_hash
+                for file_hash, _, key in writes
+                if file_hash is not None and key in failed_keys
+            )
+
+            rows, updates = [], []
+            for name, plan in plans.items():
+                if plan["key"] in failed_keys:
+                    results[plan["index"]] = {"file": name, "error": "Upload failed."}
+                    continue
+
+                upload = {
+                    "name": name,
+                    "s3_url": await get_s3_url(key=plan["key"]),
+                    "size": plan["digest"].size,
+                    "file_type": plan["file"].content_type,
+                    "file_hash": plan["digest"].sha256,
+                    "blob_hash": plan["blob_hash"],
+                    # documents owning their key are stored as is
+                    "encoding": encodings.get(plan["blob_hash"]),
+                }
+                if plan["kind"] == "new":
+                    rows.append({**upload, "owner_id": user.id, "folder": folder})
+                else:
+                    updates.append(
+                        (plan, {**upload, "updated_at": datetime.now(timezone.utc)})
+                    )
+
+            try:
+                async with metadata_repo.session.begin_nested():
+                    inserted, conflicts = await metadata_repo.insert_many(rows)
+            except Exception as e:
+                docflow_logger.error(f"Adding {len(rows)} documents failed: {e}")
+                await blob_repo.release(row["blob_hash"] for row in rows)
+                inserted, conflicts = [], []
+                for row in rows:
+                    results[plans[row["name"]]["index"]] = {
+                        "file": row["name"],
+                        "error": "Upload failed.",
+                    }
+            for document in inserted:
+                results[plans[document.name]["index"]] = document
+            for row in conflicts:
+                results[plans[row["name"]]["index"]] = {
+                    "file": row["name"],
+                    "error": f"Document with name: {row['name']} already exists.",
+                }
+
+            # each update in a savepoint of its own, so a failing one is rolled back
+            # alone and the others are still committed
+            for plan, upload in updates:
+                try:
+                    async with metadata_repo.session.begin_nested():
+                        document = await metadata_repo.patch(
+                            document=plan["doc"]["id"],
+                            document_patch=upload,
+                            owner=user,
+                            user_repo=user_repo,
+                            is_owner=plan["kind"] == "owned",
+                        )
+                        await blob_repo.release([plan["doc"]["blob_hash"]])
+                        await version_repo.record(
+                            [
+                                {
+                                    **upload,
+                                    "document_id": plan["doc"]["id"],
+                                    "uploaded_by": user.id,
+                                    "s3_version_id": plan["digest"].version_id,
+                                }
+                            ]
                         )
+                except HTTPException as e:
+                    await blob_repo.release([plan["blob_hash"]])
+                    results[plan["index"]] = {"file": upload["name"], "error": e.detail}
+                except Exception as e:
+                    docflow_logger.error(f"Updating {upload['name']} failed: {e}")
+                    await blob_repo.release([plan["blob_hash"]])
+                    results[plan["index"]] = {
+                        "file": upload["name"],
+                        "error": "Upload failed.",
+                    }
                 else:
-                    return await self._upload_new_file(
-                        file=file,
-                        folder=folder,
-                        contents=contents,
-                        file_type=file_type,
-                        user=user,
+                    results[plan["index"]] = document
+
+            await metadata_repo.session.commit()
+        except Exception:
+            await metadata_repo.session.rollback()
+            raise
+
+        return results
+
+    async def import_archive(
+        self,
+        metadata_repo: DocumentMetadataRepository,
+        archive: File,
+        folder: Optional[str],
+        user: TokenData,
+    ) -> Dict[str, Any]:
+        """
+        Imports every file of a zip or tar archive as its own document.
+
+        Members are read one at a time straight from the uploaded archive, each one
+        spooled (in memory, or in a temporary file once larger than a part) only while
+        it is stored. Directories inside the archive become the folder of the document,
+        and the metadata rows are written in batches of `settings.import_batch_size`.
+        A member larger than `settings.import_member_max_size` fails, and the import
+        stops once the members add up to `settings.import_max_total_size`.
+
+        Args:
+            metadata_repo: The repository for accessing metadata.
+            archive: The uploaded archive.
+            folder: The folder the archive is imported into.
+            user: The token data of the user.
+
+        Returns:
+            @return: The number of imported documents and the members that failed.
+
+        Raises:
+            HTTP_400: If the archive type is not supported.
+        """
+
+        file_type = archive.content_type
+        if file_type != "application/zip" and file_type not in TAR_STREAM_MODES:
+            raise http_400(msg=f"Archive type {file_type} not supported for import.")
+
+        members = archive_members(archive.file, file_type, archive.filename)
+        rows: List[Dict[str, Any]] = []
+        failed: List[Dict[str, str]] = []
+        imported, unpacked = 0, 0
+
+        async def _flush() -> None:
+            nonlocal imported
+            try:
+                inserted, conflicts = await metadata_repo.insert_many(rows)
+                await metadata_repo.session.commit()
+                imported += len(inserted)
+                failed.extend(
+                    {
+                        "member": row["name"],
+                        "error": f"Document with name: {row['name']} already exists.",
+                    }
+                    for row in conflicts
+                )
+            except Exception as e:
+                await metadata_repo.session.rollback()
+                docflow_logger.error(f"Import of {archive.filename} batch failed: {e}")
+                failed.extend(
+                    {"member": row["name"], "error": "Could not save metadata."}
+                    for row in rows
+                )
+            rows.clear()
+            docflow_logger.info(f"Import of {archive.filename}: {imported} documents")
+
+        try:
+            while True:
+                try:
+                    entry = await cpu_executor.run(next, members, None)
+                except (tarfile.TarError, zipfile.BadZipFile, OSError, EOFError) as e:
+                    failed.append({"member": archive.filename, "error": str(e)})
+                    break
+                if entry is None:
+                    break
+
+                path, member = entry
+                if unpacked >= settings.import_max_total_size:
+                    failed.append(
+                        {
+                            "member": path,
+                            "error": f"Archive unpacks to more than "
+                            f"{settings.import_max_total_size} bytes, import stopped.",
+                        }
+                    )
+                    break
+                max_size = min(
+                    settings.import_member_max_size,
+                    settings.import_max_total_size - unpacked,
+                )
+                try:
+                    filename, member_folder = member_path(path, folder)
+                    member_type = mimetypes.guess_type(filename)[0]
+                    if member_type not in SUPPORTED_FILE_TYPES:
+                        raise http_400(msg=f"File type {member_type} not supported.")
+
+                    file = await cpu_executor.run(
+                        spool_member,
+                        member,
+                        filename,
+                        member_type,
+                        max_size,
                     )
-            return await self._upload_new_file(
-                file=file,
-                folder=folder,
-                contents=contents,
-                file_type=file_type,
-                user=user,
+                    unpacked += file.size
+                    try:
+                        # a failed member must not leave its blob reference in the batch
+                        async with metadata_repo.session.begin_nested():
+                            response = await self._upload_new_file(
+                                file=file,
+                                folder=member_folder,
+                                file_type=member_type,
+                                user=user,
+                                blob_repo=metadata_repo.blob_repo,
+                            )
+                    finally:
+                        await file.close()
+                except HTTPException as e:
+                    failed.append({"member": path, "error": e.detail})
+                    continue
+                except MemberTooLarge as e:
+                    # the bytes read until the limit count towards the archive's total
+                    unpacked += max_size
+                    failed.append({"member": path, "error": str(e)})
+                    continue
+                except Exception as e:
+                    docflow_logger.error(f"Import of {path} failed: {e}")
+                    failed.append({"member": path, "error": str(e)})
+                    continue
+
+                rows.append(response["upload"])
+                if len(rows) >= settings.import_batch_size:
+                    await _flush()
+
+            await _flush()
+        finally:
+            members.close()
+
+        return {
+            "response": "archive_imported",
+            "imported": imported,
+            "failed": failed,
+            "no_of_failed": len(failed),
+        }
+
+    async def _object_digest(self, key: str) -> FileDigest:
+        """
+        Hashes an object already in storage, streaming it in a worker thread.
+        """
+
+        def _digest() -> FileDigest:
+            body = self.client.get_object(Bucket=settings.s3_bucket, Key=key)["Body"]
+            file_hash, size = hashlib.sha256(), 0
+            for chunk in body.iter_chunks(settings.s3_multipart_chunk_size):
+                file_hash.update(chunk)
+                size += len(chunk)
+            return FileDigest(sha256=file_hash.hexdigest(), size=size)
+
+        return await storage_executor.run(_digest)
+
+    async def _abort_multipart(self, key: str, upload_id: str) -> None:
+        try:
+            await storage_executor.run(
+                self.client.abort_multipart_upload,
+                Bucket=settings.s3_bucket,
+                Key=key,
+                UploadId=upload_id,
+            )
+        except ClientError as e:
+            docflow_logger.error(f"Could not abort multipart upload of {key}: {e}")
+
+    async def _discard_completed_upload(
+        self, session_repo: UploadSessionRepository, upload: UploadSession
+    ) -> None:
+        """
+        Cleans up after an upload whose object was assembled but could not become a
+        document, e.g. because its name was taken in the meantime. The session cannot be
+        completed again, so it is removed along with the object.
+        """
+
+        await session_repo.session.rollback()
+        await session_repo.remove(upload_id=upload.id)
+        await session_repo.session.commit()
+        await self._delete_object(key=upload.key)
+
+    async def delete_expired_upload_sessions(
+        self, session_repo: UploadSessionRepository
+    ) -> int:
+        """
+        Aborts the multipart uploads of abandoned uploads, and deletes the objects of
+        abandoned single PUT direct uploads.
+
+        Returns:
+            @return: The number of sessions removed, less than a batch once none is left.
+        """
+
+        expired = await session_repo.pop_expired()
+        for upload in expired:
+            if upload.s3_upload_id is not None:
+                await self._abort_multipart(
+                    key=upload.key, upload_id=upload.s3_upload_id
+                )
+            else:
+                await self._delete_object(key=upload.key)
+
+        return len(expired)
+
+    async def open_upload_session(
+        self,
+        session_repo: UploadSessionRepository,
+        upload: UploadSessionCreate,
+        user: TokenData,
+    ) -> UploadSessionRead:
+        """
+        Starts a resumable upload, backed by an S3 multipart upload.
+
+        Args:
+            session_repo: The repository for resumable upload sessions.
+            upload: The name, type and optionally the size of the file.
+            user: The token data of the user.
+
+        Returns:
+            @return: The session, with the chunk size the client has to use, at most
+                `settings.upload_chunk_max_size` bytes.
+
+        Raises:
+            HTTP_400: If the file type is not supported, or the file too large.
+        """
+
+        if upload.file_type not in SUPPORTED_FILE_TYPES:
+            raise http_400(msg=f"File type {upload.file_type} not supported.")
+
+        # chunks are buffered whole, so their size is capped whatever the client asks for
+        max_chunk_size = min(settings.upload_chunk_max_size, S3_MAX_PART_SIZE)
+        chunk_size = max(
+            upload.chunk_size or settings.s3_multipart_chunk_size, S3_MIN_PART_SIZE
+        )
+        if upload.size is not None:
+            if -(-upload.size // S3_MAX_PARTS) > max_chunk_size:
+                raise http_400(
+                    msg=f"Files of a resumable upload are at most {S3_MAX_PARTS * max_chunk_size} bytes."
+                )
+            chunk_size = max(chunk_size, -(-upload.size // S3_MAX_PARTS))
+        chunk_size = min(chunk_size, max_chunk_size)
+
+        from ulid import ULID
+
+        key = (
+            f"uploads/{user.id}/{str(ULID())}.{SUPPORTED_FILE_TYPES[upload.file_type]}"
+        )
+        multipart = await storage_executor.run(
+            self.client.create_multipart_upload, Bucket=settings.s3_bucket, Key=key
+        )
+
+        session = await session_repo.create(
+            owner=user,
+            name=upload.name,
+            file_type=upload.file_type,
+            folder=upload.folder,
+            key=key,
+            s3_upload_id=multipart["UploadId"],
+            chunk_size=chunk_size,
+            size=upload.size,
+        )
+
+        return await session_repo.status(upload=session)
+
+    async def upload_chunk(
+        self,
+        session_repo: UploadSessionRepository,
+        upload_id: UUID,
+        part_number: int,
+        chunk: AsyncIterator[bytes],
+        user: TokenData,
+    ) -> Dict[str, int]:
+        """
+        Stores one chunk of a resumable upload as a part of its multipart upload.
+
+        Chunks can arrive in any order and in parallel, sending a chunk again replaces
+        it. Every chunk except the last one has to be exactly `chunk_size` bytes, which
+        is checked on receipt when the size of the file was announced, and when the
+        session is completed otherwise.
+
+        Args:
+            session_repo: The repository for resumable upload sessions.
+            upload_id: The id of the upload session.
+            part_number: The 1-based position of the chunk in the file.
+            chunk: The request body.
+            user: The token data of the user.
+
+        Returns:
+            @return: The part number and the number of bytes stored.
+
+        Raises:
+            HTTP_400: If the part number is out of range or the chunk has the wrong size.
+            HTTP_404: If the session does not exist or has expired.
+        """
+
+        upload = await session_repo.get(upload_id=upload_id, owner=user)
+        if upload.file_hash is not None:
+            raise http_400(msg=f"Upload {upload_id} is a direct upload.")
+
+        last_part = S3_MAX_PARTS
+        if upload.size is not None:
+            last_part = max(-(-upload.size // upload.chunk_size), 1)
+        if not 1 <= part_number <= last_part:
+            raise http_400(msg=f"Chunk number must be between 1 and {last_part}.")
+
+        body = bytearray()
+        async for data in chunk:
+            body.extend(data)
+            if len(body) > upload.chunk_size:
+                raise http_400(msg=f"Chunks are at most {upload.chunk_size} bytes.")
+        # storage only rejects a short part when the upload is completed
+        if upload.size is not None:
+            expected = upload.chunk_size
+            if part_number == last_part:
+                expected = upload.size - (last_part - 1) * upload.chunk_size
+            if len(body) != expected:
+                raise http_400(msg=f"Chunk {part_number} must be {expected} bytes.")
+
+        part = await storage_executor.run(
+            self.client.upload_part,
+            Bucket=settings.s3_bucket,
+            Key=upload.key,
+            UploadId=upload.s3_upload_id,
+            PartNumber=part_number,
+            Body=bytes(body),
+        )
+        await session_repo.add_part(
+            upload_id=upload.id,
+            part_number=part_number,
+            etag=part["ETag"],
+            size=len(body),
+        )
+
+        return {"part_number": part_number, "size": len(body)}
+
+    async def complete_upload_session(
+        self,
+        session_repo: UploadSessionRepository,
+        metadata_repo: DocumentMetadataRepository,
+        upload_id: UUID,
+        user: TokenData,
+    ) -> DocumentMetadataRead:
+        """
+        Assembles the uploaded chunks into the object and creates the document.
+
+        The assembled object is hashed once from storage. If the same content is
+        already in the blob store, the new object is dropped and the document points at
+        the existing blob.
+
+        Args:
+            session_repo: The repository for resumable upload sessions.
+            metadata_repo: The repository for accessing metadata.
+            upload_id: The id of the upload session.
+            user: The token data of the user.
+
+        Returns:
+            @return: The metadata of the new document.
+
+        Raises:
+            HTTP_400: If chunks are missing or have the wrong size.
+            HTTP_404: If the session does not exist or has expired.
+            HTTP_409: If the user already has a document with the name of the upload.
+        """
+
+        upload = await session_repo.get(upload_id=upload_id, owner=user)
+        if upload.file_hash is not None:
+            raise http_400(msg=f"Upload {upload_id} is a direct upload.")
+        # checked before the parts are assembled, which cannot be undone
+        if await metadata_repo.name_taken(name=upload.name, owner=user):
+            raise http_409(msg=f"Document with name: {upload.name} already exists.")
+        parts = await session_repo.parts(upload_id=upload.id)
+
+        received = {part.part_number for part in parts}
+        expected = len(parts)
+        if upload.size is not None:
+            expected = max(-(-upload.size // upload.chunk_size), 1)
+        if missing := sorted(set(range(1, expected + 1)) - received):
+            raise http_400(msg=f"Missing chunks: {missing}")
+        if upload.size is not None and sum(part.size for part in parts) != upload.size:
+            raise http_400(msg=f"Uploaded chunks do not add up to {upload.size} bytes.")
+        last_part = max(received, default=0)
+        if short := [
+            part.part_number
+            for part in parts
+            if part.part_number != last_part and part.size != upload.chunk_size
+        ]:
+            raise http_400(
+                msg=f"Chunks {sorted(short)} must be resent with {upload.chunk_size} bytes."
+            )
+
+        try:
+            await storage_executor.run(
+                self.client.complete_multipart_upload,
+                Bucket=settings.s3_bucket,
+                Key=upload.key,
+                UploadId=upload.s3_upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"ETag": part.etag, "PartNumber": part.part_number}
+                        for part in parts
+                    ]
+                },
+            )
+        except ClientError as e:
+            raise http_400(msg=f"Could not assemble the upload: {e}") from e
+
+        try:
+            digest = await self._object_digest(key=upload.key)
+            blob = await metadata_repo.blob_repo.acquire(
+                file_hash=digest.sha256, key=upload.key, size=digest.size
+            )
+            if not blob.created:
+                await self._delete_object(key=upload.key)
+
+            await session_repo.remove(upload_id=upload.id)
+
+            return await metadata_repo.upload(
+                document_upload={
+                    "owner_id": user.id,
+                    "name": upload.name,
+                    "s3_url": await get_s3_url(key=blob.key),
+                    "size": digest.size,
+                    "file_type": upload.file_type,
+                    "file_hash": digest.sha256,
+                    "blob_hash": digest.sha256,
+                    "encoding": blob.encoding,
+                    "folder": upload.folder,
+                }
+            )
+        except Exception:
+            await self._discard_completed_upload(
+                session_repo=session_repo, upload=upload
+            )
+            raise
+
+    async def open_direct_upload(
+        self,
+        session_repo: UploadSessionRepository,
+        upload: DirectUploadCreate,
+        user: TokenData,
+    ) -> DirectUploadRead:
+        """
+        Starts an upload the client sends straight to storage with presigned URLs.
+
+        Files up to `settings.presigned_put_max_size` get one presigned PUT carrying the
+        announced SHA-256, which storage checks against the bytes it receives. Larger
+        files get a presigned URL per part of a multipart upload.
+
+        Args:
+            session_repo: The repository for upload sessions.
+            upload: The name, type, size and SHA-256 of the file.
+            user: The token data of the user.
+
+        Returns:
+            @return: The session id and the presigned URL(s) to upload to.
+
+        Raises:
+            HTTP_400: If the file type is not supported.
+        """
+
+        if upload.file_type not in SUPPORTED_FILE_TYPES:
+            raise http_400(msg=f"File type {upload.file_type} not supported.")
+
+        from ulid import ULID
+
+        key = (
+            f"uploads/{user.id}/{str(ULID())}.{SUPPORTED_FILE_TYPES[upload.file_type]}"
+        )
+
+        if upload.size <= settings.presigned_put_max_size:
+            url = await cpu_executor.run(
+                self.client.generate_presigned_url,
+                "put_object",
+                Params={
+                    "Bucket": settings.s3_bucket,
+                    "Key": key,
+                    "ContentLength": upload.size,
+                    "ChecksumSHA256": base64.b64encode(
+                        bytes.fromhex(upload.sha256)
+                    ).decode(),
+                },
+                ExpiresIn=settings.presigned_upload_expire_sec,
+            )
+            session = await session_repo.create(
+                owner=user,
+                name=upload.name,
+                file_type=upload.file_type,
+                folder=upload.folder,
+                key=key,
+                s3_upload_id=None,
+                chunk_size=upload.size,
+                size=upload.size,
+                file_hash=upload.sha256,
+            )
+            return DirectUploadRead(
+                id=session.id, expires_at=session.expires_at, url=url
+            )
+
+        chunk_size = max(
+            settings.s3_multipart_chunk_size,
+            S3_MIN_PART_SIZE,
+            -(-upload.size // S3_MAX_PARTS),
+        )
+        multipart = await storage_executor.run(
+            self.client.create_multipart_upload, Bucket=settings.s3_bucket, Key=key
+        )
+
+        def _presign_parts() -> List[PresignedPart]:
+            return [
+                PresignedPart(
+                    part_number=part_number,
+                    url=self.client.generate_presigned_url(
+                        "upload_part",
+                        Params={
+                            "Bucket": settings.s3_bucket,
+                            "Key": key,
+                            "UploadId": multipart["UploadId"],
+                            "PartNumber": part_number,
+                        },
+                        ExpiresIn=settings.presigned_upload_expire_sec,
+                    ),
+                )
+                for part_number in range(1, -(-upload.size // chunk_size) + 1)
+            ]
+
+        parts = await cpu_executor.run(_presign_parts)
+        session = await session_repo.create(
+            owner=user,
+            name=upload.name,
+            file_type=upload.file_type,
+            folder=upload.folder,
+            key=key,
+            s3_upload_id=multipart["UploadId"],
+            chunk_size=chunk_size,
+            size=upload.size,
+            file_hash=upload.sha256,
+        )
+
+        return DirectUploadRead(
+            id=session.id,
+            expires_at=session.expires_at,
+            chunk_size=chunk_size,
+            parts=parts,
+        )
+
+    async def complete_direct_upload(
+        self,
+        session_repo: UploadSessionRepository,
+        metadata_repo: DocumentMetadataRepository,
+        upload_id: UUID,
+        completion: DirectUploadComplete,
+        user: TokenData,
+    ) -> DocumentMetadataRead:
+        """
+        Verifies an object uploaded with presigned URLs and creates the document.
+
+        A single PUT object is checked with a HEAD request only: its size has to match the
+        announced one, and so does the SHA-256 checksum storage verified on upload. The
+        checksum of a multipart object only covers its parts, so the assembled object is
+        read once and hashed instead. Storage that reports no checksum for a single PUT
+        gets the same treatment, so a client can never claim the content of somebody
+        else's blob, or a wrong hash, by announcing it.
+
+        Args:
+            session_repo: The repository for upload sessions.
+            metadata_repo: The repository for accessing metadata.
+            upload_id: The id of the upload session.
+            completion: The ETags of the uploaded parts, for multipart uploads.
+            user: The token data of the user.
+
+        Returns:
+            @return: The metadata of the new document.
+
+        Raises:
+            HTTP_400: If the object is missing or does not match what was announced.
+            HTTP_404: If the session does not exist or has expired.
+            HTTP_409: If the user already has a document with the same name.
+        """
+
+        upload = await session_repo.get(upload_id=upload_id, owner=user)
+        if upload.file_hash is None:
+            raise http_400(msg=f"Upload {upload_id} is not a direct upload.")
+        if await metadata_repo.name_taken(name=upload.name, owner=user):
+            raise http_409(msg=f"Document with name: {upload.name} already exists.")
+
+        if upload.s3_upload_id is not None:
+            expected = -(-upload.size // upload.chunk_size)
+            parts = sorted(completion.parts, key=lambda part: part.part_number)
+            if [part.part_number for part in parts] != list(range(1, expected + 1)):
+                raise http_400(msg=f"Expected the ETags of parts 1 to {expected}.")
+            try:
+                await storage_executor.run(
+                    self.client.complete_multipart_upload,
+                    Bucket=settings.s3_bucket,
+                    Key=upload.key,
+                    UploadId=upload.s3_upload_id,
+                    MultipartUpload={
+                        "Parts": [
+                            {"ETag": part.etag, "PartNumber": part.part_number}
+                            for part in parts
+                        ]
+                    },
+                )
+            except ClientError as e:
+                raise http_400(msg=f"Could not assemble the upload: {e}") from e
+
+        try:
+            head = await storage_executor.run(
+                self.client.head_object,
+                Bucket=settings.s3_bucket,
+                Key=upload.key,
+                ChecksumMode="ENABLED",
+            )
+        except ClientError as e:
+            raise http_400(msg="The file has not been uploaded yet.") from e
+
+        checksum = head.get("ChecksumSHA256")
+        expected_checksum = base64.b64encode(bytes.fromhex(upload.file_hash)).decode()
+        try:
+            if head["ContentLength"] == upload.size and checksum != expected_checksum:
+                # multipart checksums are composite, `<checksum of the part checksums>-N`
+                digest = await self._object_digest(key=upload.key)
+                if digest.size == upload.size and digest.sha256 == upload.file_hash:
+                    checksum = expected_checksum
+            if head["ContentLength"] != upload.size or checksum != expected_checksum:
+                raise http_400(msg="The uploaded file does not match its size or hash.")
+
+            blob = await metadata_repo.blob_repo.acquire(
+                file_hash=upload.file_hash, key=upload.key, size=upload.size
+            )
+            if not blob.created:
+                await self._delete_object(key=upload.key)
+
+            await session_repo.remove(upload_id=upload.id)
+
+            return await metadata_repo.upload(
+                document_upload={
+                    "owner_id": user.id,
+                    "name": upload.name,
+                    "s3_url": await get_s3_url(key=blob.key),
+                    "size": upload.size,
+                    "file_type": upload.file_type,
+                    "file_hash": upload.file_hash,
+                    "blob_hash": upload.file_hash,
+                    "encoding": blob.encoding,
+                    "folder": upload.folder,
+                }
+            )
+        except Exception:
+            await self._discard_completed_upload(
+                session_repo=session_repo, upload=upload
+            )
+            raise
+
+    async def cancel_upload_session(
+        self, session_repo: UploadSessionRepository, upload_id: UUID, user: TokenData
+    ) -> None:
+
+        upload = await session_repo.get(upload_id=upload_id, owner=user)
+        await session_repo.remove(upload_id=upload.id)
+        await session_repo.session.commit()
+        if upload.s3_upload_id is not None:
+            await self._abort_multipart(key=upload.key, upload_id=upload.s3_upload_id)
+        else:
+            await self._delete_object(key=upload.key)
+
+    async def _stream_object(
+        self, key: str, **kwargs
+    ) -> Tuple[Dict[str, Any], AsyncIterator[bytes]]:
+        """
+        Opens an object for reading. Its body is only pulled from storage while the
+        returned iterator is consumed, `settings.s3_download_chunk_size` bytes at a time.
+
+        Args:
+            key: The object key to read.
+            kwargs: Extra arguments of the GetObject call.
+
+        Returns:
+            @return: The GetObject response and an iterator over the body.
+
+        Raises:
+            HTTP_404: If the object does not exist.
+        """
+
+        try:
+            obj = await storage_executor.run(
+                self.client.get_object, Bucket=settings.s3_bucket, Key=key, **kwargs
+            )
+        except ClientError as e:
+            raise http_404(msg=f"File not found: {e}") from e
+        body = obj["Body"]
+
+        async def _chunks() -> AsyncIterator[bytes]:
+            try:
+                while chunk := await storage_executor.run(
+                    body.read, settings.s3_download_chunk_size
+                ):
+                    yield chunk
+            finally:
+                body.close()
+
+        return obj, _chunks()
+
+    async def _read_parts(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """
+        Reads the inclusive byte range of a large object with concurrent ranged GETs.
+
+        The range is split in parts of `settings.s3_parallel_read_part_size` bytes, of
+        which up to `settings.s3_parallel_read_concurrency` are fetched at the same time.
+        Parts are yielded in order as soon as they and the ones before them arrived, so
+        at most that many parts are held in memory. The first part is awaited before
+        returning, so a missing object fails before anything is sent.
+
+        Args:
+            key: The object key to read.
+            start: The first byte to read.
+            end: The last byte to read.
+
+        Returns:
+            @return: An iterator over the parts.
+
+        Raises:
+            HTTP_404: If the object does not exist.
+        """
+
+        part_size = settings.s3_parallel_read_part_size
+        bounds = iter(
+            (offset, min(offset + part_size, end + 1) - 1)
+            for offset in range(start, end + 1, part_size)
+        )
+
+        def _get(first: int, last: int) -> bytes:
+            obj = self.client.get_object(
+                Bucket=settings.s3_bucket, Key=key, Range=f"bytes={first}-{last}"
+            )
+            with obj["Body"] as body:
+                return body.read()
+
+        pending: Deque[asyncio.Future] = deque()
+
+        def _schedule() -> None:
+            if part := next(bounds, None):
+                pending.append(asyncio.ensure_future(storage_executor.run(_get, *part)))
+
+        def _cancel() -> None:
+            # parts not started yet give their executor slot back
+            while pending:
+                pending.popleft().cancel()
+
+        for _ in range(max(settings.s3_parallel_read_concurrency, 1)):
+            _schedule()
+
+        try:
+            first = await pending.popleft()
+        except ClientError as e:
+            _cancel()
+            raise http_404(msg=f"File not found: {e}") from e
+        except BaseException:
+            _cancel()
+            raise
+        _schedule()
+
+        async def _parts() -> AsyncIterator[bytes]:
+            try:
+                yield first
+                while pending:
+                    part = await pending.popleft()
+                    _schedule()
+                    yield part
+            finally:
+                # any way out, including the client going away mid-download
+                _cancel()
+
+        return _parts()
+
+    async def _object_response(
+        self,
+        document: Dict[str, Any],
+        key: str,
+        media_type: str,
+        disposition: str,
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+    ) -> Response:
+        """
+        Builds the response streaming an object, honouring `If-None-Match`, `Range`,
+        `If-Range` and `Accept-Encoding`.
+
+        The ETag is the stored hash of the document, so a client that already has the
+        current version gets 304 Not Modified from the metadata alone. A single range
+        becomes one ranged GetObject answered with 206 Partial Content, several ranges a
+        `multipart/byteranges` body fetching one range after the other. The range is
+        ignored, and the whole object sent, if `If-Range` does not match the current
+        version of the document. A document compressed at rest is sent as stored, with
+        `Content-Encoding`, to clients accepting its codec, and decompressed on the way
+        otherwise. Ranges always address the uncompressed content.
+
+        Args:
+            document: The metadata of the document.
+            key: The object key holding the document.
+            media_type: The content type of the document.
+            disposition: "attachment" or "inline".
+            range_header: The `Range` header of the request, if any.
+            if_range: The `If-Range` header of the request, if any.
+            if_none_match: The `If-None-Match` header of the request, if any.
+            accept_encoding: The `Accept-Encoding` header of the request, if any.
+
+        Returns:
+            @return: The streaming response, or 304 Not Modified.
+
+        Raises:
+            HTTP_404: If the file is missing from storage.
+            HTTP_416: If none of the requested ranges overlaps the file.
+        """
+
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Cache-Control": (
+                f"private, max-age={settings.document_cache_max_age}, must-revalidate"
+            ),
+        }
+        file_hash, encoding = document.get("file_hash"), document.get("encoding")
+        passthrough = (
+            bool(encoding)
+            and not range_header
+            and accepts_encoding(accept_encoding, encoding)
+        )
+        if encoding:
+            headers["Vary"] = "Accept-Encoding"
+        if etag := get_etag(file_hash, encoding if passthrough else None):
+            headers["ETag"] = etag
+        if modified := document.get("updated_at") or document.get("created_at"):
+            headers["Last-Modified"] = format_datetime(
+                modified.astimezone(timezone.utc), usegmt=True
+            )
+
+        if if_none_match and etag_matches(if_none_match, headers.get("ETag")):
+            # the client has the current version, storage is not contacted at all
+            return Response(status_code=304, headers=headers)
+
+        headers["Content-Disposition"] = get_content_disposition(
+            document["name"], disposition=disposition
+        )
+        size, ranges = document.get("size"), None
+        if range_header and size is not None:
+            # only strong validators can be used in If-Range
+            validators = (headers.get("ETag"), headers.get("Last-Modified"))
+            if if_range is None or (if_range and if_range in validators):
+                ranges = parse_range(range_header, size)
+
+        if passthrough:
+            length, body = await self._read_object(key=key, file_hash=file_hash)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(body, media_type=media_type, headers=headers)
+
+        if not ranges:
+            length, body = await self._read_content(
+                key=key, file_hash=file_hash, encoding=encoding, size=size
+            )
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(body, media_type=media_type, headers=headers)
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            length, body = await self._read_content(
+                key=key,
+                file_hash=file_hash,
+                encoding=encoding,
+                size=size,
+                byte_range=(start, end),
+            )
+            headers["Content-Length"] = str(length)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return StreamingResponse(
+                body, status_code=206, media_type=media_type, headers=headers
             )
 
-        docflow_logger.info(
-            f"File {file.filename} already present, checking for updates..."
+        boundary = uuid4().hex
+        prefixes = [
+            (
+                ("\r\n" if index else "")
+                + f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                + f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode()
+            for index, (start, end) in enumerate(ranges)
+        ]
+        closing = f"\r\n--{boundary}--\r\n".encode()
+        headers["Content-Length"] = str(
+            sum(len(prefix) for prefix in prefixes)
+            + sum(end - start + 1 for start, end in ranges)
+            + len(closing)
         )
 
-        if doc["file_hash"] != new_file_hash:
-            docflow_logger.info("File has been updated, uploading new version...")
-            return await self._upload_new_version(
-                doc=doc,
-                file=file,
-                contents=contents,
-                file_type=file_type,
-                new_file_hash=new_file_hash,
-                is_owner=True,
+        async def _parts() -> AsyncIterator[bytes]:
+            for prefix, (start, end) in zip(prefixes, ranges):
+                yield prefix
+                _, body = await self._read_content(
+                    key=key,
+                    file_hash=file_hash,
+                    encoding=encoding,
+                    size=size,
+                    byte_range=(start, end),
+                )
+                async for chunk in body:
+                    yield chunk
+            yield closing
+
+        return StreamingResponse(
+            _parts(),
+            status_code=206,
+            media_type=f"multipart/byteranges; boundary={boundary}",
+            headers=headers,
+        )
+
+    async def _read_object(
+        self,
+        key: str,
+        file_hash: Optional[str] = None,
+        byte_range: Optional[Tuple[int, int]] = None,
+        size: Optional[int] = None,
+    ) -> Tuple[int, AsyncIterator[bytes]]:
+        """
+        Reads an object, or the inclusive byte range of it, from the local object cache
+        when it holds the current version, from storage otherwise. Whole objects read
+        from storage are added to the cache on their way to the client. When the size of
+        the object is known, reads above `settings.s3_parallel_read_threshold` bytes are
+        split in concurrent ranged GETs.
+
+        Returns:
+            @return: The number of bytes and an iterator over them.
+        """
+
+        if file_hash and (
+            cached := await storage_executor.run(object_cache.open, key, file_hash)
+        ):
+            size = os.fstat(cached.fileno()).st_size
+            start, end = byte_range or (0, size - 1)
+            length = max(min(end, size - 1) - start + 1, 0)
+            return length, read_chunks(cached, start, length)
+
+        if size is not None:
+            start, end = byte_range or (0, size - 1)
+            end = min(end, size - 1)
+            if end - start + 1 > settings.s3_parallel_read_threshold:
+                body = await self._read_parts(key=key, start=start, end=end)
+                if file_hash and not byte_range and object_cache.accepts(size):
+                    body = object_cache.fill(key, file_hash, body)
+                return end - start + 1, body
+
+        if byte_range:
+            obj, body = await self._stream_object(
+                key=key, Range=f"bytes={byte_range[0]}-{byte_range[1]}"
+            )
+            return obj["ContentLength"], body
+
+        obj, body = await self._stream_object(key=key)
+        if file_hash and object_cache.accepts(obj["ContentLength"]):
+            body = object_cache.fill(key, file_hash, body)
+
+        return obj["ContentLength"], body
+
+    async def _read_content(
+        self,
+        key: str,
+        file_hash: Optional[str],
+        encoding: Optional[str],
+        size: Optional[int],
+        byte_range: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[int, AsyncIterator[bytes]]:
+        """
+        Reads the content of a document, or the inclusive byte range of it, decompressing
+        it if it is compressed at rest, see `_read_object`.
+
+        Returns:
+            @return: The number of bytes and an iterator over them.
+        """
+
+        if not encoding:
+            return await self._read_object(
+                key=key, file_hash=file_hash, byte_range=byte_range, size=size
             )
 
+        # the whole object is read, so that it can be cached as stored
+        _, body = await self._read_object(key=key, file_hash=file_hash)
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1
+
+        return length, decode(body, encoding, start=start, length=length)
+
+    async def download(
+        self,
+        document: Dict[str, Any],
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+    ) -> Response:
+        """
+        Streams a document from storage to the client, nothing is written locally.
+
+        Args:
+            document: The metadata of the document.
+            range_header: The `Range` header of the request, if any.
+            if_range: The `If-Range` header of the request, if any.
+            if_none_match: The `If-None-Match` header of the request, if any.
+            accept_encoding: The `Accept-Encoding` header of the request, if any.
+
+        Returns:
+            @return: The response sending the document, or the requested ranges of it,
+                as an attachment. 304 Not Modified if the client has the current version.
+
+        Raises:
+            HTTP_404: If the file is missing from storage.
+            HTTP_416: If none of the requested ranges overlaps the file.
+        """
+
+        return await self._object_response(
+            document=document,
+            key=await get_key(s3_url=document["s3_url"]),
+            media_type=document.get("file_type") or "application/octet-stream",
+            disposition="attachment",
+            range_header=range_header,
+            if_range=if_range,
+            if_none_match=if_none_match,
+            accept_encoding=accept_encoding,
+        )
+
+    @staticmethod
+    def _version_document(
+        document: Dict[str, Any], version: DocumentVersion
+    ) -> Dict[str, Any]:
+        """
+        Returns the metadata of a document as it was at the given version.
+        """
+
         return {
-            "response": "File already present and no changes detected.",
-            "upload": "Nothing to update...",
+            **document,
+            **{column: getattr(version, column) for column in VERSION_COLUMNS},
+            "updated_at": version.created_at,
         }
 
-    async def download(self, s3_url: str, name: str) -> Dict[str, str]:
+    async def download_version(
+        self,
+        document: Dict[str, Any],
+        version: DocumentVersion,
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+    ) -> Response:
+        """
+        Streams a version of a document to the client, see `download`.
+
+        Versions stored as a blob, and the current content of any document, are sent
+        like the document itself. A previous version of a document from before the blob
+        store is read from the version of the object at its key, as a whole.
+
+        Args:
+            document: The metadata of the document.
+            version: The version to send.
+            range_header: The `Range` header of the request, if any.
+            if_range: The `If-Range` header of the request, if any.
+            if_none_match: The `If-None-Match` header of the request, if any.
+            accept_encoding: The `Accept-Encoding` header of the request, if any.
+
+        Returns:
+            @return: The response sending the version as an attachment, or 304 Not
+                Modified if the client has it.
+
+        Raises:
+            HTTP_404: If the version is no longer in storage.
+        """
+
+        versioned = self._version_document(document=document, version=version)
+        key = await get_key(s3_url=version.s3_url)
+        current = (
+            version.s3_url == document["s3_url"]
+            and version.file_hash == document["file_hash"]
+        )
+        if version.blob_hash is not None or current:
+            return await self._object_response(
+                document=versioned,
+                key=key,
+                media_type=version.file_type or "application/octet-stream",
+                disposition="attachment",
+                range_header=range_header,
+                if_range=if_range,
+                if_none_match=if_none_match,
+                accept_encoding=accept_encoding,
+            )
+        if version.s3_version_id is None:
+            raise http_404(
+                msg=f"Version {version.number} of {document['name']} is no longer stored"
+            )
+
+        headers = {}
+        if etag := get_etag(version.file_hash):
+            headers["ETag"] = etag
+            if if_none_match and etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=headers)
+        obj, body = await self._stream_object(key=key, VersionId=version.s3_version_id)
+        headers["Content-Disposition"] = get_content_disposition(
+            document["name"], disposition="attachment"
+        )
+        headers["Content-Length"] = str(obj["ContentLength"])
+
+        return StreamingResponse(
+            body,
+            media_type=version.file_type or "application/octet-stream",
+            headers=headers,
+        )
+
+    async def restore_version(
+        self,
+        metadata_repo: DocumentMetadataRepository,
+        document: Dict[str, Any],
+        version: DocumentVersion,
+        user: TokenData,
+    ) -> DocumentMetadataRead:
+        """
+        Makes a previous version the current content of a document, as a new version, so
+        the history is kept as is.
+
+        A version stored as a blob is restored without touching storage, the document
+        takes a reference on the blob again. A version of a document from before the
+        blob store is copied over the current object at its key.
+
+        Args:
+            metadata_repo: The repository for accessing metadata.
+            document: The metadata of the document.
+            version: The version to restore.
+            user: The token data of the user.
+
+        Returns:
+            @return: The metadata of the document with the restored content.
+
+        Raises:
+            HTTP_404: If the version is no longer in storage.
+            HTTP_409: If the version is the current content of the document.
+        """
+
+        if (
+            version.s3_url == document["s3_url"]
+            and version.file_hash == document["file_hash"]
+        ):
+            raise http_409(
+                msg=f"Version {version.number} is the current content of {document['name']}"
+            )
+
+        restored = self._version_document(document=document, version=version)
+        object_version = None
+        if version.blob_hash is None:
+            if version.s3_version_id is None:
+                raise http_404(
+                    msg=f"Version {version.number} of {document['name']} is no longer stored"
+                )
+            key = await get_key(s3_url=version.s3_url)
+            object_version = await self._copy_version(
+                key=key, version_id=version.s3_version_id, size=version.size
+            )
+            await storage_executor.run(object_cache.invalidate, key)
+
+        return await metadata_repo.restore_version(
+            document=document,
+            version=restored,
+            s3_version_id=object_version,
+            user=user,
+        )
+
+    async def _copy_version(
+        self, key: str, version_id: str, size: Optional[int]
+    ) -> Optional[str]:
+        """
+        Copies a version of the object at a key over its current version.
+
+        Returns:
+            @return: The version id of the new current object, if storage reports one.
 
-        key = get_key(s3_url=s3_url)
+        Raises:
+            HTTP_404: If the version is missing from storage.
+        """
 
+        source = {"Bucket": settings.s3_bucket, "Key": key, "VersionId": version_id}
         try:
-            await asyncio.to_thread(
-                self.s3_client.meta.client.download_file,
-                settings.s3_bucket,
-                await key,
-                r"/app/downloads/docflow_" + f"{name}",
+            if size is not None and size <= S3_MAX_COPY_SIZE:
+                response = await storage_executor.run(
+                    self.client.copy_object,
+                    Bucket=settings.s3_bucket,
+                    Key=key,
+                    CopySource=source,
+                )
+                return response.get("VersionId")
+            # larger objects are copied in parts
+            await storage_executor.run(
+                self.client.copy, source, settings.s3_bucket, key
             )
         except ClientError as e:
-            raise http_404(msg=f"File not found: {e}") from e
+            raise http_404(msg=f"Version not found in storage: {e}") from e
 
-        return {"message": f"successfully downloaded {name} in downloads folder."}
+        return await self._object_version(key=key)
 
-    async def preview(self, document: Dict[str, Any]) -> FileResponse:
+    async def download_archive(
+        self, documents: List[Dict[str, Any]], name: str
+    ) -> StreamingResponse:
+        """
+        Streams many documents to the client as one zip archive, written on the fly.
 
-        key = await get_key(s3_url=document["s3_url"])
+        The next `settings.zip_download_concurrency` documents are fetched while the
+        current one is written, each reading at most `ZIP_PREFETCH_CHUNKS` chunks ahead,
+        so memory stays flat whatever the size of the archive. Documents that cannot be
+        read are left out and listed in an `errors.txt` entry.
+
+        Args:
+            documents: The metadata of the documents, in archive order.
+            name: The name of the archive, without extension.
+
+        Returns:
+            @return: The response streaming the archive as an attachment.
+        """
+
+        window = max(settings.zip_download_concurrency, 1)
+        queues: Dict[int, asyncio.Queue] = {}
+        tasks: Dict[int, asyncio.Task] = {}
 
-        file = await self.get_s3_file_object_body(key)
+        async def _fetch(document: Dict[str, Any], queue: asyncio.Queue) -> None:
+            try:
+                _, body = await self._read_object(
+                    key=await get_key(s3_url=document["s3_url"]),
+                    file_hash=document.get("file_hash"),
+                )
+                if encoding := document.get("encoding"):
+                    body = decode(body, encoding)
+                async for chunk in body:
+                    await queue.put(chunk)
+            except Exception as e:
+                await queue.put(e)
+            else:
+                await queue.put(None)
+
+        def _start(index: int) -> None:
+            # a sliding window, a fetch only starts once it is among the next ones
+            if index < len(documents):
+                queues[index] = asyncio.Queue(maxsize=ZIP_PREFETCH_CHUNKS)
+                tasks[index] = asyncio.create_task(
+                    _fetch(documents[index], queues[index])
+                )
+
+        async def _archive() -> AsyncIterator[bytes]:
+            sink, seen, failed = ZipSink(), set(), []
+            archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+            try:
+                for index in range(window):
+                    _start(index)
+
+                for index, document in enumerate(documents):
+                    item = await queues[index].get()
+                    if isinstance(item, Exception):
+                        docflow_logger.error(f"Zip of {document['name']}: {item}")
+                        failed.append(document["name"])
+                    else:
+                        info = entry_info(document, seen)
+                        entry = archive.open(
+                            info, mode="w", force_zip64=not info.file_size
+                        )
+                        while item is not None:
+                            if isinstance(item, Exception):
+                                raise item
+                            await cpu_executor.run(entry.write, item)
+                            if data := sink.drain():
+                                yield data
+                            item = await queues[index].get()
+                        await cpu_executor.run(entry.close)
+                        yield sink.drain()
+
+                    del queues[index], tasks[index]
+                    _start(index + window)
+
+                if failed:
+                    archive.writestr(
+                        "errors.txt", "Could not be read:\n" + "\n".join(failed)
+                    )
+                archive.close()
+                yield sink.drain()
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+
+        return StreamingResponse(
+            _archive(),
+            media_type="application/zip",
+            headers={"Content-Disposition": get_content_disposition(f"{name}.zip")},
+        )
+
+    async def preview(
+        self,
+        document: Dict[str, Any],
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        size: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+    ) -> Response:
+        """
+        Streams a document from storage to the client to be shown inline, without
+        buffering it in memory or on disk. Videos and audio can be seeked through
+        range requests.
+
+        Args:
+            document: The metadata of the document.
+            range_header: The `Range` header of the request, if any.
+            if_range: The `If-Range` header of the request, if any.
+            if_none_match: The `If-None-Match` header of the request, if any.
+            size: The rendition to send instead of the original, one of
+                `RENDITION_SIZES`.
+            accept_encoding: The `Accept-Encoding` header of the request, if any.
+
+        Returns:
+            @return: The response sending the document, or the requested ranges of it.
+                304 Not Modified if the client has the current version.
+
+        Raises:
+            ValueError: If the file type is not supported for preview.
+            HTTP_404: If the file is missing from storage.
+            HTTP_416: If none of the requested ranges overlaps the file.
+        """
+
+        if size is not None:
+            return await self._rendition_response(
+                document=document, size=size, if_none_match=if_none_match
+            )
+
+        key = await get_key(s3_url=document["s3_url"])
 
         _, extension = os.path.splitext(key)
         ext = extension.lower()
@@ -258,11 +2029,147 @@ class DocumentRepository:
             media_type = "application/xml"
         elif ext == ".txt":
             media_type = "text/plain"
+        elif (document.get("file_type") or "").startswith(("video/", "audio/")):
+            media_type = document["file_type"]
         else:
             raise ValueError("Unsupported file type.")
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as temp:
-            temp.write(file)
-            temp_path = temp.name
+        return await self._object_response(
+            document=document,
+            key=key,
+            media_type=media_type,
+            disposition="inline",
+            range_header=range_header,
+            if_range=if_range,
+            if_none_match=if_none_match,
+            accept_encoding=accept_encoding,
+        )
+
+    async def _render(
+        self, document: Dict[str, Any], size: str, force: bool = False
+    ) -> bool:
+        """
+        Renders one rendition of a document in the process pool and stores it under the
+        key derived from the content of the document.
+
+        Args:
+            document: The metadata of the document.
+            size: The rendition to render, one of `RENDITION_SIZES`.
+            force: Whether to render it again if it already exists.
+
+        Returns:
+            @return: Whether the rendition was written.
+        """
+
+        file_hash, file_type = document.get("file_hash"), document.get("file_type")
+        if not file_hash or file_type not in RENDITION_SOURCE_TYPES:
+            return False
+        if (document.get("size") or 0) > settings.rendition_max_source_bytes:
+            return False
+
+        key = rendition_key(file_hash, size)
+        if not force:
+            try:
+                await storage_executor.run(
+                    self.client.head_object, Bucket=settings.s3_bucket, Key=key
+                )
+                return False
+            except ClientError:
+                pass
+
+        try:
+            data = await self.get_s3_file_object_body(
+                key=await get_key(s3_url=document["s3_url"]),
+                file_hash=file_hash,
+                size=document.get("size"),
+                encoding=document.get("encoding"),
+            )
+            rendition = await render_in_pool(data, file_type, size)
+            if rendition is None:
+                return False
+            await storage_executor.run(
+                self.client.put_object,
+                Bucket=settings.s3_bucket,
+                Key=key,
+                Body=rendition,
+                ContentType="image/png",
+            )
+        except Exception as e:
+            docflow_logger.error(f"Could not render {size} of {document['name']}: {e}")
+            return False
+
+        await storage_executor.run(object_cache.invalidate, key)
+        return True
+
+    async def generate_renditions(
+        self, documents: List[Dict[str, Any]], force: bool = False
+    ) -> int:
+        """
+        Renders the missing renditions of the given documents, e.g. after an upload.
+        Documents sharing their content share their renditions, which are rendered once.
+
+        Args:
+            documents: The metadata of the documents.
+            force: Whether to render renditions that already exist again.
+
+        Returns:
+            @return: The number of renditions written.
+        """
+
+        written = 0
+        unique = {
+            doc.get("file_hash"): doc for doc in documents if doc.get("file_hash")
+        }
+        for document in unique.values():
+            for size in RENDITION_SIZES:
+                written += await self._render(document=document, size=size, force=force)
+
+        return written
+
+    async def _rendition_response(
+        self,
+        document: Dict[str, Any],
+        size: str,
+        if_none_match: Optional[str] = None,
+    ) -> Response:
+        """
+        Sends a rendition of a document, rendering it first for documents uploaded before
+        renditions existed.
+
+        Raises:
+            ValueError: If the document has no such rendition.
+        """
+
+        if size not in RENDITION_SIZES:
+            raise ValueError(f"Unknown rendition {size}.")
+        if not document.get("file_hash"):
+            raise ValueError("Unsupported file type.")
+
+        stem, _ = os.path.splitext(document["name"])
+        rendition = {
+            **document,
+            "name": f"{stem}-{size}.png",
+            "file_hash": f"{document['file_hash']}-{size}",
+            "size": None,
+            "encoding": None,
+        }
+        key = rendition_key(document["file_hash"], size)
+
+        try:
+            return await self._object_response(
+                document=rendition,
+                key=key,
+                media_type="image/png",
+                disposition="inline",
+                if_none_match=if_none_match,
+            )
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+
+        if not await self._render(document=document, size=size, force=True):
+            raise ValueError("Unsupported file type.")
 
-        return TempFileResponse(temp_path, media_type=media_type)
+        return await self._object_response(
+            document=rendition, key=key, media_type="image/png", disposition="inline"
+        )
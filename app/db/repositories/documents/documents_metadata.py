@@ -1,16 +1,25 @@
+from collections import Counter
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 from uuid import UUID
 
 from fastapi import HTTPException
-from sqlalchemy import select, update, insert, delete
+from sqlalchemy import select, update, insert, delete, or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.engine import Row
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
+from app.api.dependencies.repositories import get_key
 from app.core.exceptions import http_409, http_404
 from app.db.repositories.auth.auth import AuthRepository
+from app.db.repositories.documents.blobs import BlobRepository
+from app.db.repositories.documents.document_versions import (
+    VERSION_COLUMNS,
+    DocumentVersionRepository,
+)
+from app.db.repositories.documents.storage_deletions import StorageDeletionRepository
 from app.db.tables.documents.documents_metadata import DocumentMetadata, doc_user_access
 from app.db.tables.base_class import StatusEnum
 from app.schemas.auth.bands import TokenData
@@ -26,6 +35,9 @@ class DocumentMetadataRepository:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
         self.doc_cls = aliased(DocumentMetadata, name="doc_cls")
+        self.blob_repo = BlobRepository(session)
+        self.deletion_repo = StorageDeletionRepository(session)
+        self.version_repo = DocumentVersionRepository(session)
 
     async def _get_instance(self, document: Union[str, UUID], owner: TokenData):
 
@@ -112,17 +124,43 @@ class DocumentMetadataRepository:
             doc_user_access.delete().where(doc_user_access.c.doc_id == document.id)
         )
 
+    async def _purge(self, stmt) -> None:
+        """
+        Runs a DELETE of documents, then drops their blob references and queues the
+        objects of legacy documents, which own their key, for deletion from storage.
+        The version history of the documents goes first, with its blob references.
+        """
+
+        await self.version_repo.purge(
+            select(DocumentMetadata.id).where(stmt.whereclause)
+        )
+        stmt = stmt.returning(DocumentMetadata.blob_hash, DocumentMetadata.s3_url)
+        rows = (await self.session.execute(stmt)).all()
+        await self.blob_repo.release(row.blob_hash for row in rows)
+        legacy = [await get_key(row.s3_url) for row in rows if not row.blob_hash]
+        await self.deletion_repo.enqueue({key: None for key in legacy if key})
+
+    @staticmethod
+    def _first_version(document: Dict[str, Any]) -> Dict[str, Any]:
+
+        return {
+            "document_id": document["id"],
+            "uploaded_by": document["owner_id"],
+            **{column: document.get(column) for column in VERSION_COLUMNS},
+        }
+
     async def _auto_delete(self, bin_items: List) -> bool:
 
         now = datetime.now(timezone.utc)
         deleted_any = False
         for doc in bin_items:
             if doc.deleted_at is not None and doc.deleted_at <= now:
-                stmt = delete(DocumentMetadata).where(DocumentMetadata.id == doc.id)
-                await self.session.execute(stmt)
+                await self._purge(
+                    delete(DocumentMetadata).where(DocumentMetadata.id == doc.id)
+                )
                 deleted_any = True
         if deleted_any:
-            await self.session.commit()
+            await self.blob_repo.collect()
         return deleted_any
 
     async def get_doc(self, filename: str) -> Dict[str, Any]:
@@ -140,12 +178,202 @@ class DocumentMetadataRepository:
         stmt = (
             select(DocumentMetadata)
             .where(DocumentMetadata.name == filename)
-            .where(self.doc_cls.status != StatusEnum.deleted)
+            .where(DocumentMetadata.status != StatusEnum.deleted)
         )
         result = await self.session.execute(stmt)
 
         return result.scalar_one_or_none()
 
+    async def name_taken(self, name: str, owner: TokenData) -> bool:
+        """
+        Tells whether the user has a document with the given name outside of the bin.
+        """
+
+        stmt = (
+            select(DocumentMetadata.id)
+            .where(DocumentMetadata.owner_id == owner.id)
+            .where(DocumentMetadata.name == name)
+            .where(DocumentMetadata.status != StatusEnum.deleted)
+        )
+
+        return (await self.session.execute(stmt)).first() is not None
+
+    async def resolve_uploads(
+        self, names: List[str], owner: TokenData
+    ) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """
+        Finds, with a single query, the documents an upload of the given files would
+        update.
+
+        A document of the user wins over one shared with them, documents of other users
+        only count if the user has update access to them through `doc_user_access`.
+
+        Args:
+            names (List[str]): The names of the uploaded files.
+            owner (TokenData): The uploading user.
+
+        Returns:
+            Dict[str, Tuple[str, Dict[str, Any]]]: "owned" or "shared" and the current
+                metadata of the document, including its `file_hash`, by name. Names of
+                new files are left out.
+        """
+
+        if not names:
+            return {}
+
+        stmt = (
+            select(DocumentMetadata)
+            .outerjoin(
+                doc_user_access,
+                (doc_user_access.c.doc_id == DocumentMetadata.id)
+                & (doc_user_access.c.user_id == owner.id),
+            )
+            .where(DocumentMetadata.name.in_(names))
+            .where(DocumentMetadata.status != StatusEnum.deleted)
+            .where(
+                (DocumentMetadata.owner_id == owner.id)
+                | doc_user_access.c.user_id.is_not(None)
+            )
+            .order_by(
+                DocumentMetadata.owner_id != owner.id, DocumentMetadata.created_at
+            )
+        )
+
+        resolved = {}
+        for doc in (await self.session.scalars(stmt)).all():
+            if doc.name not in resolved:
+                kind = "owned" if doc.owner_id == owner.id else "shared"
+                d = {k: v for k, v in doc.__dict__.items() if k != "_sa_instance_state"}
+                resolved[doc.name] = (kind, d)
+
+        return resolved
+
+    async def by_file_type(
+        self,
+        file_types: Iterable[str],
+        after: Optional[UUID] = None,
+        limit: int = 500,
+    ) -> List[Dict[str, Any]]:
+        """
+        Pages through the documents of the given types, across all users, ordered by id.
+
+        Args:
+            file_types (Iterable[str]): The content types to list.
+            after (Optional[UUID]): The id of the last document of the previous page.
+            limit (int): The size of a page.
+
+        Returns:
+            List[Dict[str, Any]]: The metadata of the documents of the page.
+        """
+
+        stmt = (
+            select(DocumentMetadata)
+            .where(DocumentMetadata.file_type.in_(list(file_types)))
+            .where(DocumentMetadata.status != StatusEnum.deleted)
+            .order_by(DocumentMetadata.id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(DocumentMetadata.id > after)
+
+        return [
+            {k: v for k, v in doc.__dict__.items() if k != "_sa_instance_state"}
+            for doc in (await self.session.scalars(stmt)).all()
+        ]
+
+    async def legacy_page(
+        self,
+        base_url: str,
+        after: Optional[str] = None,
+        limit: int = 1000,
+        prefix: str = "",
+        exclude: Tuple[str, ...] = (),
+    ) -> List[Row]:
+        """
+        Pages through the documents stored under their own key rather than as a blob,
+        across all users and including the bin, in the order storage lists their keys.
+
+        Args:
+            base_url (str): The URL of the bucket, every listed URL starts with it.
+            after (Optional[str]): The URL of the last document of the previous page.
+            limit (int): The size of a page.
+            prefix (str): The prefix of the object keys of the documents.
+            exclude (Tuple[str, ...]): Prefixes of object keys to leave out.
+
+        Returns:
+            List[Row]: The id, owner, name and URL of the documents of the page.
+        """
+
+        url = DocumentMetadata.s3_url.collate("C")
+        stmt = (
+            select(
+                DocumentMetadata.id,
+                DocumentMetadata.owner_id,
+                DocumentMetadata.name,
+                DocumentMetadata.s3_url,
+            )
+            .where(DocumentMetadata.blob_hash.is_(None))
+            .where(url.startswith(base_url + prefix, autoescape=True))
+            .order_by(url)
+            .limit(limit)
+        )
+        for excluded in exclude:
+            stmt = stmt.where(~url.startswith(base_url + excluded, autoescape=True))
+        if after is not None:
+            stmt = stmt.where(url > after)
+
+        return list((await self.session.execute(stmt)).all())
+
+    async def get_many(
+        self,
+        documents: List[Union[str, UUID]],
+        folder: Optional[str],
+        owner: TokenData,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets the documents of the user with the given ids or names, and those in the given
+        folder or its subfolders, with a single query.
+
+        Args:
+            documents (List[Union[str, UUID]]): The ids or names of the documents.
+            folder (Optional[str]): The folder whose documents to include.
+            owner (TokenData): The user.
+            limit (int): The most documents returned.
+
+        Returns:
+            List[Dict[str, Any]]: The metadata of the documents, ordered by folder and name.
+        """
+
+        ids, names = [], []
+        for document in documents:
+            try:
+                ids.append(UUID(str(document)))
+            except ValueError:
+                names.append(document)
+
+        selected = [DocumentMetadata.id.in_(ids), DocumentMetadata.name.in_(names)]
+        if folder:
+            folder = folder.strip("/")
+            selected += [
+                DocumentMetadata.folder == folder,
+                DocumentMetadata.folder.startswith(f"{folder}/", autoescape=True),
+            ]
+
+        stmt = (
+            select(DocumentMetadata)
+            .where(DocumentMetadata.owner_id == owner.id)
+            .where(DocumentMetadata.status != StatusEnum.deleted)
+            .where(or_(*selected))
+            .order_by(DocumentMetadata.folder, DocumentMetadata.name)
+            .limit(limit)
+        )
+
+        return [
+            {k: v for k, v in doc.__dict__.items() if k != "_sa_instance_state"}
+            for doc in (await self.session.scalars(stmt)).all()
+        ]
+
     async def upload(
         self, document_upload: DocumentMetadataCreate
     ) -> DocumentMetadataRead:
@@ -157,6 +385,8 @@ class DocumentMetadataRepository:
 
         try:
             self.session.add(db_document)
+            await self.session.flush()
+            await self.version_repo.record([self._first_version(db_document.__dict__)])
             await self.session.commit()
             await self.session.refresh(db_document)
         except IntegrityError as e:
@@ -166,6 +396,99 @@ class DocumentMetadataRepository:
 
         return DocumentMetadataRead(**db_document.__dict__)
 
+    async def insert_many(
+        self, documents: List[Dict[str, Any]]
+    ) -> Tuple[List[DocumentMetadataRead], List[Dict[str, Any]]]:
+        """
+        Inserts the metadata of many documents with a single multi-row INSERT.
+
+        Rows whose name is already taken by a document of the same owner, or by an
+        earlier row of the batch, are skipped instead of failing the statement, and the
+        blob references taken for them are released. Each inserted document gets its
+        first version.
+
+        Args:
+            documents (List[Dict[str, Any]]): The column values of each document.
+
+        Returns:
+            Tuple[List[DocumentMetadataRead], List[Dict[str, Any]]]: The inserted
+                documents, and the rows that were skipped because of a name conflict.
+        """
+
+        if not documents:
+            return [], []
+
+        stmt = (
+            pg_insert(DocumentMetadata)
+            .values(documents)
+            .on_conflict_do_nothing(
+                index_elements=[DocumentMetadata.owner_id, DocumentMetadata.name],
+                # spelled like the index predicate, a bound parameter would not match it
+                index_where=text("status != 'deleted'"),
+            )
+            .returning(DocumentMetadata)
+        )
+        inserted = (await self.session.scalars(stmt)).all()
+
+        remaining = Counter((doc.owner_id, doc.name) for doc in inserted)
+        conflicts = []
+        for row in documents:
+            if remaining[(row["owner_id"], row["name"])] > 0:
+                remaining[(row["owner_id"], row["name"])] -= 1
+            else:
+                conflicts.append(row)
+        await self.blob_repo.release(row.get("blob_hash") for row in conflicts)
+        await self.version_repo.record(
+            [self._first_version(doc.__dict__) for doc in inserted]
+        )
+
+        return [DocumentMetadataRead(**doc.__dict__) for doc in inserted], conflicts
+
+    async def restore_version(
+        self,
+        document: Dict[str, Any],
+        version: Dict[str, Any],
+        s3_version_id: Optional[str],
+        user: TokenData,
+    ) -> DocumentMetadataRead:
+        """
+        Points a document at the content of a previous version, recorded as a new
+        version, and commits.
+
+        Args:
+            document (Dict[str, Any]): The current metadata of the document.
+            version (Dict[str, Any]): The version columns of the restored version.
+            s3_version_id (Optional[str]): The object version written by restoring a
+                document owning its key, None otherwise.
+            user (TokenData): The restoring user.
+
+        Returns:
+            @return: The metadata of the document with the restored content.
+        """
+
+        changes = {column: version[column] for column in VERSION_COLUMNS}
+        changes["updated_at"] = datetime.now(timezone.utc)
+        try:
+            await self.blob_repo.retain([changes["blob_hash"]])
+            await self.blob_repo.release([document.get("blob_hash")])
+            await self._execute_update(db_document=document, changes=changes)
+            await self.version_repo.record(
+                [
+                    {
+                        **changes,
+                        "document_id": document["id"],
+                        "uploaded_by": user.id,
+                        "s3_version_id": s3_version_id,
+                    }
+                ]
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        return DocumentMetadataRead(**{**document, **changes})
+
     async def doc_list(
         self, owner: TokenData, limit: int = 10, offset: int = 0
     ) -> Dict[str, Union[List[DocumentMetadataRead], Any]]:
@@ -223,7 +546,11 @@ class DocumentMetadataRepository:
         else:
             # This condition will be activated when, the new version of file is added by a privileged member
             # here privileged member is one who have access to update the document.
-            db_document = await self.get_doc(filename=document)
+            # The document was resolved through doc_user_access and is looked up by its id,
+            # other users may have documents with the same name.
+            db_document = await self.session.get(DocumentMetadata, document)
+            if db_document is None or db_document.status == StatusEnum.deleted:
+                raise http_404(msg=f"No file with {document}")
             changes = await self._extract_changes(document_patch)
 
             if changes:
@@ -301,7 +628,7 @@ class DocumentMetadataRepository:
             .where(DocumentMetadata.status == StatusEnum.deleted)
         )
 
-        await self.session.execute(stmt)
+        await self._purge(stmt)
 
     async def empty_bin(self, owner: TokenData):
 
@@ -311,7 +638,7 @@ class DocumentMetadataRepository:
             .where(DocumentMetadata.status == StatusEnum.deleted)
         )
 
-        await self.session.execute(stmt)
+        await self._purge(stmt)
 
     async def archive(self, file: str, user: TokenData):
 
@@ -0,0 +1,235 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.executors import storage_executor
+from app.logs.logger import docflow_logger
+
+
+class ObjectCache:
+    """
+    Size-bounded LRU cache of whole storage objects on local disk.
+
+    Entries are keyed by object key and content hash, so a new version written under
+    the same key is never served from an old entry. Files are written under a temporary
+    name and renamed into place once complete, so readers never see a partial file, and
+    an evicted file stays readable by whoever already opened it. Every process keeps its
+    own directory, as the index of the entries lives in memory, and holds a lock on
+    `<pid>.lock` next to it while alive; the directories whose lock is free belonged to
+    processes that exited and are removed when the cache is first used.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.root = directory
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # file name -> (object key, size), least recently used first
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._ready = False
+        self._owner: Optional[BinaryIO] = None
+
+    @staticmethod
+    def _name(key: str, file_hash: str) -> str:
+        return hashlib.sha256(f"{key}\n{file_hash}".encode()).hexdigest()
+
+    def _prepare(self) -> None:
+        if not self._ready:
+            os.makedirs(self.root, exist_ok=True)
+            self._owner = open(f"{self.directory}.lock", "a+b")
+            fcntl.flock(self._owner, fcntl.LOCK_EX)
+            # leftovers of an earlier process with the same pid are not in the index
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+            self._sweep()
+            self._ready = True
+
+    def _sweep(self) -> None:
+        """
+        Removes the directories of processes that exited. Lock files are left in place,
+        a process about to lock one must not end up holding a removed file.
+        """
+
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not name.isdigit() or path == self.directory:
+                continue
+            with open(f"{path}.lock", "a+b") as owner:
+                try:
+                    fcntl.flock(owner, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                docflow_logger.info(f"Removed object cache of exited process {name}")
+
+    def _drop(self, name: str) -> None:
+        _, size = self._entries.pop(name)
+        self._size -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def accepts(self, size: int) -> bool:
+        # a single large object must not flush everything else out of the cache
+        return 0 < size <= self.max_bytes // 4
+
+    def open(self, key: str, file_hash: str) -> Optional[BinaryIO]:
+        """
+        Opens the cached copy of an object.
+
+        Returns:
+            Optional[BinaryIO]: The open file, None if the object is not cached.
+        """
+
+        if self.max_bytes <= 0:
+            return None
+
+        name = self._name(key, file_hash)
+        with self._lock:
+            if name in self._entries:
+                try:
+                    file = open(os.path.join(self.directory, name), "rb")
+                except FileNotFoundError:
+                    self._drop(name)
+                else:
+                    self._entries.move_to_end(name)
+                    self.hits += 1
+                    return file
+            self.misses += 1
+
+        return None
+
+    def begin(self) -> Optional[BinaryIO]:
+        """
+        Opens a temporary file to fill with an object, None if it cannot be created.
+        """
+
+        try:
+            with self._lock:
+                self._prepare()
+            return tempfile.NamedTemporaryFile(
+                dir=self.directory, prefix=".", delete=False
+            )
+        except OSError as e:
+            docflow_logger.error(f"Object cache unavailable: {e}")
+            return None
+
+    def commit(self, key: str, file_hash: str, temp: BinaryIO) -> None:
+        """
+        Moves a filled temporary file into place and evicts the least recently used
+        entries until the cache fits its budget again.
+        """
+
+        name = self._name(key, file_hash)
+        try:
+            temp.close()
+            size = os.path.getsize(temp.name)
+            with self._lock:
+                if name in self._entries:
+                    self._drop(name)
+                os.replace(temp.name, os.path.join(self.directory, name))
+                self._entries[name] = (key, size)
+                self._size += size
+                while self._size > self.max_bytes and len(self._entries) > 1:
+                    self._drop(next(iter(self._entries)))
+                    self.evictions += 1
+        except OSError as e:
+            docflow_logger.error(f"Could not cache {key}: {e}")
+            self.abort(temp)
+
+    @staticmethod
+    def abort(temp: BinaryIO) -> None:
+        temp.close()
+        try:
+            os.remove(temp.name)
+        except FileNotFoundError:
+            pass
+
+    def put(self, key: str, file_hash: str, data: bytes) -> None:
+        if temp := self.begin():
+            try:
+                temp.write(data)
+            except OSError:
+                self.abort(temp)
+            else:
+                self.commit(key, file_hash, temp)
+
+    def invalidate(self, key: str) -> None:
+        """
+        Removes every cached version of the object with the given key, to be run in the
+        storage executor as it deletes files.
+        """
+
+        with self._lock:
+            for name in [n for n, (k, _) in self._entries.items() if k == key]:
+                self._drop(name)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+    async def fill(
+        self, key: str, file_hash: str, body: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """
+        Passes the chunks of an object through, keeping a copy that is added to the cache
+        once the whole object went by. Failing to cache never fails the read.
+        """
+
+        temp = await storage_executor.run(self.begin)
+        try:
+            async for chunk in body:
+                if temp is not None:
+                    try:
+                        await storage_executor.run(temp.write, chunk)
+                    except OSError:
+                        self.abort(temp)
+                        temp = None
+                yield chunk
+            if temp is not None:
+                await storage_executor.run(self.commit, key, file_hash, temp)
+                temp = None
+        finally:
+            if temp is not None:
+                self.abort(temp)
+
+
+async def read_chunks(file: BinaryIO, start: int, length: int) -> AsyncIterator[bytes]:
+    """
+    Reads `length` bytes of an open file from `start`, in download sized chunks.
+    """
+
+    try:
+        await storage_executor.run(file.seek, start)
+        while length > 0 and (
+            chunk := await storage_executor.run(
+                file.read, min(settings.s3_download_chunk_size, length)
+            )
+        ):
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+object_cache = ObjectCache(
+    directory=settings.object_cache_dir, max_bytes=settings.object_cache_max_bytes
+)
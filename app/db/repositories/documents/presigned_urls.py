@@ -0,0 +1,165 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.core.executors import cpu_executor
+
+
+class PresignedUrl(NamedTuple):
+    """A presigned URL and the time it stops working."""
+
+    url: str
+    expires_at: datetime
+
+
+class PresignedUrlCache:
+    """
+    Cache of presigned URLs by bucket, object key and operation.
+
+    A URL is handed out again as long as it stays valid for at least `min_validity`
+    seconds, so the links of a listing are signed once per `expires_in` window instead
+    of on every request. Signing happens locally, without calling storage, so a whole
+    batch of misses is signed in a single hop to a worker thread.
+    """
+
+    def __init__(self, expires_in: int, min_validity: int, max_entries: int) -> None:
+        self.expires_in = expires_in
+        self.min_validity = min_validity
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (bucket, key, operation) -> url, least recently used first
+        self._entries: "OrderedDict[Tuple[str, str, str], PresignedUrl]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(
+        self, entry: Tuple[str, str, str], now: datetime
+    ) -> Optional[PresignedUrl]:
+        presigned = self._entries.get(entry)
+        if presigned is None:
+            return None
+        if presigned.expires_at - now < timedelta(seconds=self.min_validity):
+            del self._entries[entry]
+            return None
+        self._entries.move_to_end(entry)
+        return presigned
+
+    def _store(self, entry: Tuple[str, str, str], presigned: PresignedUrl) -> None:
+        self._entries[entry] = presigned
+        self._entries.move_to_end(entry)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def cached(
+        self, bucket: str, keys: Iterable[str], operation: str
+    ) -> Tuple[Dict[str, PresignedUrl], List[str]]:
+        """
+        Splits object keys into the ones with a cached URL and the ones to sign.
+
+        Returns:
+            Tuple[Dict[str, PresignedUrl], List[str]]: The cached URLs by key, and the keys
+                without one.
+        """
+
+        now = datetime.now(timezone.utc)
+        found, missing = {}, []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if presigned := self._lookup((bucket, key, operation), now):
+                    found[key] = presigned
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        return found, missing
+
+    def sign(
+        self, client: Any, bucket: str, keys: Iterable[str], operation: str
+    ) -> Dict[str, PresignedUrl]:
+        """
+        Signs URLs for object keys and caches them.
+
+        Args:
+            client: The boto3 S3 client to sign with.
+            bucket (str): The bucket of the objects.
+            keys (Iterable[str]): The object keys.
+            operation (str): The client method the URLs are for, e.g. `get_object`.
+
+        Returns:
+            Dict[str, PresignedUrl]: The URLs by object key.
+        """
+
+        signed = {}
+        for key in keys:
+            # taken before signing, so the URL lives at least as long as recorded
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.expires_in)
+            url = client.generate_presigned_url(
+                operation,
+                Params={"Bucket": bucket, "Key": key},
+                ExpiresIn=self.expires_in,
+            )
+            signed[key] = PresignedUrl(url=url, expires_at=expires_at)
+
+        with self._lock:
+            for key, presigned in signed.items():
+                self._store((bucket, key, operation), presigned)
+
+        return signed
+
+    async def get_many(
+        self,
+        client: Any,
+        bucket: str,
+        keys: Iterable[str],
+        operation: str = "get_object",
+    ) -> Dict[str, PresignedUrl]:
+        """
+        Returns a URL per object key, signing the missing ones in one worker thread.
+        """
+
+        found, missing = self.cached(bucket=bucket, keys=keys, operation=operation)
+        if missing:
+            found.update(
+                await cpu_executor.run(self.sign, client, bucket, missing, operation)
+            )
+
+        return found
+
+    async def get(
+        self, client: Any, bucket: str, key: str, operation: str = "get_object"
+    ) -> PresignedUrl:
+        urls = await self.get_many(
+            client=client, bucket=bucket, keys=[key], operation=operation
+        )
+
+        return urls[key]
+
+    def invalidate(self, bucket: str, key: str) -> None:
+        """
+        Forgets the URLs of an object, e.g. after it was deleted.
+        """
+
+        with self._lock:
+            for entry in [e for e in self._entries if e[:2] == (bucket, key)]:
+                del self._entries[entry]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+presigned_urls = PresignedUrlCache(
+    expires_in=settings.presigned_url_expire_sec,
+    min_validity=settings.presigned_url_min_validity_sec,
+    max_entries=settings.presigned_url_cache_max_entries,
+)
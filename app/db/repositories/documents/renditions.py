@@ -0,0 +1,91 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.api.dependencies.constants import RENDITION_SIZES
+from app.core.config import settings
+
+# image types Pillow can downscale, PDFs are rendered too when PyMuPDF is installed
+RENDITION_SOURCE_TYPES = {
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/bmp",
+    "image/tiff",
+    "application/pdf",
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def rendition_key(file_hash: str, size: str) -> str:
+    # renditions follow the content, documents sharing it share their renditions too
+    return f"renditions/{file_hash}/{size}.png"
+
+
+def render(data: bytes, file_type: str, size: str) -> Optional[bytes]:
+    """
+    Renders a downscaled PNG of an image, or of the first page of a PDF.
+
+    Runs in a worker process of the rendition pool.
+
+    Args:
+        data (bytes): The content of the document.
+        file_type (str): The content type of the document.
+        size (str): The name of the rendition, one of `RENDITION_SIZES`.
+
+    Returns:
+        Optional[bytes]: The PNG, None if the document cannot be rendered.
+    """
+
+    from PIL import Image, ImageOps
+
+    max_px = RENDITION_SIZES[size]
+    if file_type == "application/pdf":
+        try:
+            import fitz
+        except ImportError:
+            return None
+        with fitz.open(stream=data, filetype="pdf") as pdf:
+            if pdf.page_count == 0:
+                return None
+            page = pdf[0]
+            zoom = max_px / max(page.rect.width, page.rect.height)
+            data = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_px, max_px))
+        if image.mode not in ("RGB", "RGBA"):
+            alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if alpha else "RGB")
+        out = io.BytesIO()
+        image.save(out, format="PNG", optimize=True)
+
+    return out.getvalue()
+
+
+async def render_in_pool(data: bytes, file_type: str, size: str) -> Optional[bytes]:
+    """
+    Renders a rendition in the process pool, off the event loop.
+    """
+
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.rendition_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    return await asyncio.get_running_loop().run_in_executor(
+        _pool, render, data, file_type, size
+    )
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
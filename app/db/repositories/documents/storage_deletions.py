@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.tables.documents.blobs import Blob
+from app.db.tables.documents.storage_deletions import StorageDeletion
+
+
+class StorageDeletionRepository:
+    """
+    Repository for the durable queue of objects to delete from storage.
+
+    Deletions are queued in the transaction removing the rows that referenced the
+    objects, so an object is never forgotten, and drained later by the storage
+    collector without holding up the request.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def enqueue(self, keys: Dict[str, Optional[str]]) -> None:
+        """
+        Queues objects for deletion, in the current transaction.
+
+        Args:
+            keys (Dict[str, Optional[str]]): The hash of the content each object derives
+                from, None for objects standing on their own, by object key.
+        """
+
+        if keys:
+            await self.session.execute(
+                insert(StorageDeletion).values(
+                    [
+                        {"key": key, "file_hash": file_hash}
+                        for key, file_hash in keys.items()
+                    ]
+                )
+            )
+
+    async def enqueue_versions(self, versions: Iterable[Tuple[str, str]]) -> None:
+        """
+        Queues single versions of objects for deletion, in the current transaction.
+
+        Args:
+            versions (Iterable[Tuple[str, str]]): The object key and version id of each
+                version.
+        """
+
+        if versions := list(versions):
+            await self.session.execute(
+                insert(StorageDeletion).values(
+                    [
+                        {"key": key, "version_id": version_id}
+                        for key, version_id in versions
+                    ]
+                )
+            )
+
+    async def claim(self, limit: int) -> List[Row]:
+        """
+        Takes the next due deletions and commits.
+
+        Claimed entries are hidden from other workers for `settings.storage_gc_lease_sec`
+        seconds, so a worker dying half way only delays them.
+
+        Args:
+            limit (int): The largest number of entries to claim.
+
+        Returns:
+            List[Row]: The id, key, version, file hash and attempts of the claimed
+                entries.
+        """
+
+        now = datetime.now(timezone.utc)
+        due = (
+            select(StorageDeletion.id)
+            .where(StorageDeletion.not_before <= now)
+            .order_by(StorageDeletion.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(StorageDeletion)
+            .where(StorageDeletion.id.in_(due))
+            .values(
+                attempts=StorageDeletion.attempts + 1,
+                not_before=now + timedelta(seconds=settings.storage_gc_lease_sec),
+            )
+            .returning(
+                StorageDeletion.id,
+                StorageDeletion.key,
+                StorageDeletion.version_id,
+                StorageDeletion.file_hash,
+                StorageDeletion.attempts,
+            )
+        )
+        rows = list((await self.session.execute(stmt)).all())
+        await self.session.commit()
+
+        return sorted(rows, key=lambda row: row.id)
+
+    async def live_hashes(self, file_hashes: Iterable[str]) -> Set[str]:
+        """
+        Returns the given hashes a blob exists for again, their derived objects are in
+        use and must be kept.
+        """
+
+        if not (file_hashes := {h for h in file_hashes if h}):
+            return set()
+        stmt = select(Blob.file_hash).where(Blob.file_hash.in_(file_hashes))
+
+        return set((await self.session.execute(stmt)).scalars().all())
+
+    async def complete(self, ids: Iterable[int]) -> None:
+        """
+        Removes finished entries from the queue and commits.
+        """
+
+        if ids := list(ids):
+            await self.session.execute(
+                delete(StorageDeletion).where(StorageDeletion.id.in_(ids))
+            )
+        await self.session.commit()
+
+    async def retry(self, failed: Iterable[Tuple[Row, str]]) -> None:
+        """
+        Schedules failed entries again after an exponential backoff and commits.
+
+        Args:
+            failed (Iterable[Tuple[Row, str]]): The claimed entries, and why they failed.
+        """
+
+        now = datetime.now(timezone.utc)
+        for entry, error in failed:
+            delay = min(
+                settings.storage_gc_retry_sec * 2 ** (entry.attempts - 1),
+                settings.storage_gc_retry_max_sec,
+            )
+            await self.session.execute(
+                update(StorageDeletion)
+                .where(StorageDeletion.id == entry.id)
+                .values(not_before=now + timedelta(seconds=delay), last_error=error)
+            )
+        await self.session.commit()
+
+    async def backlog(self) -> Tuple[int, Optional[datetime]]:
+        """
+        Returns the number of queued entries and when the oldest one was queued.
+        """
+
+        stmt = select(
+            func.count(StorageDeletion.id), func.min(StorageDeletion.created_at)
+        )
+        count, oldest = (await self.session.execute(stmt)).one()
+
+        return count, oldest
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+from sqlalchemy.engine import Row
+
+from app.api.dependencies.constants import S3_DELETE_MAX_KEYS
+from app.core.config import settings
+from app.core.executors import gc_executor
+from app.db.models import async_session
+from app.db.repositories.documents.object_cache import object_cache
+from app.db.repositories.documents.presigned_urls import presigned_urls
+from app.db.repositories.documents.storage_deletions import StorageDeletionRepository
+from app.db.storage import get_storage_client
+from app.logs.logger import s3_logger
+
+
+class StorageCollector:
+    """
+    Background task deleting the objects queued in `storage_deletions` from storage.
+
+    Each batch of queued keys is expanded into every version of the objects, so nothing
+    is left behind in a versioned bucket, and deleted with `DeleteObjects` requests of up
+    to 1000 versions. Entries naming a version, e.g. of a pruned document version, only
+    delete that one. Keys that fail are retried later, the others leave the queue. The
+    task sleeps while the queue is empty, until the interval passes or a permanent
+    delete wakes it up.
+    """
+
+    def __init__(self, batch_size: int, interval: int) -> None:
+        self.batch_size = max(batch_size, 1)
+        self.interval = interval
+        self.batches = 0
+        self.requests = 0
+        self.deleted_keys = 0
+        self.deleted_versions = 0
+        self.skipped_keys = 0
+        self.failed_keys = 0
+        self.pending: Optional[int] = None
+        self.oldest_age: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def wake(self) -> None:
+        """
+        Starts the next batch now, e.g. after deletions were queued.
+        """
+
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                drained = await self.run_once()
+            except Exception as e:
+                s3_logger.error(f"Storage collection failed: {e}")
+                drained = True
+            if drained:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def run_once(self) -> bool:
+        """
+        Deletes one batch of queued objects.
+
+        Returns:
+            bool: Whether the queue held no more than a batch, so the caller may wait for
+                new deletions.
+        """
+
+        async with async_session() as session:
+            repository = StorageDeletionRepository(session)
+            entries = await repository.claim(limit=self.batch_size)
+            if entries:
+                live = await repository.live_hashes(e.file_hash for e in entries)
+                skipped = [e for e in entries if e.file_hash in live]
+                removable = [e for e in entries if e.file_hash not in live]
+                errors = await self._delete(removable)
+
+                await repository.complete(
+                    [e.id for e in skipped]
+                    + [e.id for e in removable if e.key not in errors]
+                )
+                await repository.retry(
+                    (e, errors[e.key]) for e in removable if e.key in errors
+                )
+                for key in {e.key for e in removable} - errors.keys():
+                    await gc_executor.run(object_cache.invalidate, key)
+                    presigned_urls.invalidate(bucket=settings.s3_bucket, key=key)
+
+                with self._lock:
+                    self.batches += 1
+                    self.deleted_keys += len(removable) - len(errors)
+                    self.skipped_keys += len(skipped)
+                    self.failed_keys += len(errors)
+                if errors:
+                    s3_logger.warning(
+                        f"{len(errors)} of {len(removable)} objects not deleted, retrying "
+                        f"later: {next(iter(errors.values()))}"
+                    )
+
+            pending, oldest = await repository.backlog()
+            with self._lock:
+                self.pending = pending
+                self.oldest_age = (
+                    round(time.time() - oldest.timestamp(), 3) if oldest else 0.0
+                )
+
+        return len(entries) < self.batch_size
+
+    @staticmethod
+    def _versions(client: Any, key: str) -> List[Dict[str, str]]:
+        """
+        Lists every version and delete marker of an object, runs in a worker thread.
+        """
+
+        objects = []
+        paginator = client.get_paginator("list_object_versions")
+        try:
+            for page in paginator.paginate(Bucket=settings.s3_bucket, Prefix=key):
+                for version in page.get("Versions", []) + page.get("DeleteMarkers", []):
+                    # the prefix also matches longer keys
+                    if version["Key"] == key:
+                        objects.append({"Key": key, "VersionId": version["VersionId"]})
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NotImplemented":
+                raise
+            # storage without versions, the key is all there is to delete
+            objects.append({"Key": key})
+
+        return objects
+
+    async def _delete(self, entries: List[Row]) -> Dict[str, str]:
+        """
+        Deletes the objects of the given entries with all of their versions.
+
+        Returns:
+            Dict[str, str]: Why each key that could not be deleted failed, by key.
+        """
+
+        client = get_storage_client()
+        errors: Dict[str, str] = {}
+
+        async def _list(entry: Row) -> List[Dict[str, str]]:
+            if entry.version_id is not None:
+                return [{"Key": entry.key, "VersionId": entry.version_id}]
+            return await gc_executor.run(self._versions, client, entry.key)
+
+        listed = await asyncio.gather(
+            *(_list(e) for e in entries), return_exceptions=True
+        )
+        objects = []
+        for entry, versions in zip(entries, listed):
+            if isinstance(versions, Exception):
+                errors[entry.key] = str(versions)
+            else:
+                objects.extend(versions)
+
+        async def _delete_chunk(chunk: List[Dict[str, str]]) -> None:
+            try:
+                response = await gc_executor.run(
+                    client.delete_objects,
+                    Bucket=settings.s3_bucket,
+                    Delete={"Objects": chunk, "Quiet": True},
+                )
+            except ClientError as e:
+                errors.update({obj["Key"]: str(e) for obj in chunk})
+                return
+            # quiet mode only reports the objects that failed
+            # a version pruned already is gone, as it should be
+            failed = [
+                error
+                for error in response.get("Errors", [])
+                if error.get("Code") != "NoSuchVersion"
+            ]
+            for error in failed:
+                errors[error["Key"]] = f"{error.get('Code')}: {error.get('Message')}"
+            with self._lock:
+                self.requests += 1
+                self.deleted_versions += len(chunk) - len(failed)
+
+        await asyncio.gather(
+            *(
+                _delete_chunk(objects[i : i + S3_DELETE_MAX_KEYS])
+                for i in range(0, len(objects), S3_DELETE_MAX_KEYS)
+            )
+        )
+        if errors:
+            self.last_error = next(iter(errors.values()))
+
+        return errors
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._task is not None,
+                "pending": self.pending,
+                "oldest_age_sec": self.oldest_age,
+                "batches": self.batches,
+                "delete_requests": self.requests,
+                "deleted_keys": self.deleted_keys,
+                "deleted_versions": self.deleted_versions,
+                "skipped_keys": self.skipped_keys,
+                "failed_keys": self.failed_keys,
+                "last_error": self.last_error,
+            }
+
+
+storage_gc = StorageCollector(
+    batch_size=settings.storage_gc_batch_size,
+    interval=settings.storage_gc_interval_sec,
+)
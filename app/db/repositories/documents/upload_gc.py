@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.db.models import async_session
+from app.db.repositories.documents.documents import DocumentRepository
+from app.db.repositories.documents.upload_sessions import UploadSessionRepository
+from app.logs.logger import docflow_logger
+
+
+class UploadSessionCollector:
+    """
+    Background task removing abandoned upload sessions every `interval` seconds,
+    aborting their multipart uploads and deleting the objects of their single PUTs.
+
+    Sessions are claimed with `SKIP LOCKED`, so every API worker can run one.
+    """
+
+    def __init__(self, interval: int) -> None:
+        self.interval = interval
+        self.runs = 0
+        self.removed = 0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                docflow_logger.error(f"Removing expired upload sessions failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """
+        Removes every expired session, a batch at a time.
+
+        Returns:
+            int: The number of sessions removed.
+        """
+
+        repository, removed = DocumentRepository(), 0
+        async with async_session() as session:
+            session_repo = UploadSessionRepository(session)
+            while batch := await repository.delete_expired_upload_sessions(
+                session_repo=session_repo
+            ):
+                removed += batch
+        if removed:
+            docflow_logger.info(f"{removed} expired upload sessions removed")
+
+        with self._lock:
+            self.runs += 1
+            self.removed += removed
+
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._task is not None,
+                "runs": self.runs,
+                "removed": self.removed,
+                "last_error": self.last_error,
+            }
+
+
+upload_gc = UploadSessionCollector(interval=settings.upload_session_gc_interval_sec)
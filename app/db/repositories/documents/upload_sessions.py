@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import http_404
+from app.db.tables.documents.upload_sessions import UploadSession, UploadSessionPart
+from app.schemas.auth.bands import TokenData
+from app.schemas.documents.upload_sessions import UploadSessionRead
+
+
+class UploadSessionRepository:
+    """
+    Repository for the state of resumable uploads, shared by every API worker.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def create(
+        self,
+        owner: TokenData,
+        name: str,
+        file_type: str,
+        folder: Optional[str],
+        key: str,
+        s3_upload_id: Optional[str],
+        chunk_size: int,
+        size: Optional[int],
+        file_hash: Optional[str] = None,
+    ) -> UploadSession:
+
+        upload = UploadSession(
+            owner_id=owner.id,
+            name=name,
+            file_type=file_type,
+            folder=folder,
+            key=key,
+            s3_upload_id=s3_upload_id,
+            chunk_size=chunk_size,
+            size=size,
+            file_hash=file_hash,
+            expires_at=datetime.now(timezone.utc)
+            + timedelta(minutes=settings.upload_session_expire_min),
+        )
+        self.session.add(upload)
+        await self.session.commit()
+        await self.session.refresh(upload)
+
+        return upload
+
+    async def get(self, upload_id: UUID, owner: TokenData) -> UploadSession:
+
+        stmt = (
+            select(UploadSession)
+            .where(UploadSession.id == upload_id)
+            .where(UploadSession.owner_id == owner.id)
+            .where(UploadSession.expires_at > datetime.now(timezone.utc))
+        )
+        if upload := (await self.session.execute(stmt)).scalar_one_or_none():
+            return upload
+        raise http_404(msg=f"No upload session with id: {upload_id}")
+
+    async def parts(self, upload_id: UUID) -> List[UploadSessionPart]:
+
+        stmt = (
+            select(UploadSessionPart)
+            .where(UploadSessionPart.session_id == upload_id)
+            .order_by(UploadSessionPart.part_number)
+        )
+
+        return list((await self.session.execute(stmt)).scalars().all())
+
+    async def add_part(
+        self, upload_id: UUID, part_number: int, etag: str, size: int
+    ) -> None:
+        """
+        Records a stored chunk, a chunk sent again replaces the previous one.
+        """
+
+        stmt = (
+            insert(UploadSessionPart)
+            .values(session_id=upload_id, part_number=part_number, etag=etag, size=size)
+            .on_conflict_do_update(
+                index_elements=[
+                    UploadSessionPart.session_id,
+                    UploadSessionPart.part_number,
+                ],
+                set_={"etag": etag, "size": size},
+            )
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def status(self, upload: UploadSession) -> UploadSessionRead:
+
+        parts = await self.parts(upload_id=upload.id)
+
+        return UploadSessionRead(
+            **{k: v for k, v in upload.__dict__.items() if k != "_sa_instance_state"},
+            received_chunks=[part.part_number for part in parts],
+            received_bytes=sum(part.size for part in parts),
+        )
+
+    async def remove(self, upload_id: UUID) -> None:
+
+        await self.session.execute(
+            delete(UploadSession).where(UploadSession.id == upload_id)
+        )
+
+    async def pop_expired(self, limit: int = 100) -> List[UploadSession]:
+        """
+        Removes up to `limit` abandoned sessions and commits.
+
+        Returns:
+            List[UploadSession]: The removed sessions, whose multipart uploads still have
+                to be aborted.
+        """
+
+        expired = (
+            select(UploadSession.id)
+            .where(UploadSession.expires_at <= datetime.now(timezone.utc))
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            delete(UploadSession)
+            .where(UploadSession.id.in_(expired.scalar_subquery()))
+            .returning(UploadSession)
+        )
+        removed = list((await self.session.execute(stmt)).scalars().all())
+        await self.session.commit()
+
+        return removed
+
+    async def keys(self, after: Optional[str] = None, limit: int = 1000) -> List[str]:
+        """
+        Pages through the object keys of all sessions, in the order storage lists them.
+
+        Args:
+            after (Optional[str]): The last key of the previous page.
+            limit (int): The size of a page.
+
+        Returns:
+            List[str]: The keys of the page.
+        """
+
+        key = UploadSession.key.collate("C")
+        stmt = select(UploadSession.key).order_by(key).limit(limit)
+        if after is not None:
+            stmt = stmt.where(key > after)
+
+        return list((await self.session.execute(stmt)).scalars().all())
@@ -0,0 +1,61 @@
+import io
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, List, Set
+
+from app.api.dependencies.constants import ZIP_DEFLATE_TYPES
+
+
+class ZipSink(io.RawIOBase):
+    """
+    Unseekable file collecting what `zipfile` writes, so the archive can be sent while it
+    is being written. As it cannot seek back to patch the header of an entry, `zipfile`
+    writes sizes and CRCs in a data descriptor after each entry instead.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        """
+        Returns, and forgets, everything written since the last call.
+        """
+
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def entry_info(document: Dict[str, Any], seen: Set[str]) -> zipfile.ZipInfo:
+    """
+    Builds the zip entry of a document: named after its folder and name, unique within
+    the archive, and deflated only if its type is worth it.
+    """
+
+    path = f"{document.get('folder') or ''}/{document['name']}"
+    name = "/".join(part for part in path.split("/") if part not in ("", ".", ".."))
+    stem, dot, extension = name.rpartition(".")
+    arcname, copy = name, 1
+    while arcname in seen:
+        copy += 1
+        arcname = f"{stem} ({copy}).{extension}" if dot else f"{name} ({copy})"
+    seen.add(arcname)
+
+    modified = (
+        document.get("updated_at") or document.get("created_at") or datetime.now()
+    )
+    info = zipfile.ZipInfo(arcname, date_time=modified.timetuple()[:6])
+    info.external_attr = 0o644 << 16
+    info.file_size = document.get("size") or 0
+    if document.get("file_type") in ZIP_DEFLATE_TYPES:
+        info.compress_type = zipfile.ZIP_DEFLATED
+
+    return info
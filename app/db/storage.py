@@ -0,0 +1,100 @@
+import threading
+from typing import Any, Dict, Optional
+
+import boto3
+from botocore.config import Config
+
+from app.core.config import settings
+from app.logs.logger import s3_logger
+
+_client: Optional[Any] = None
+_lock = threading.Lock()
+
+
+def get_storage_client():
+    """
+    Returns the S3 client shared by every repository of this process, created on first
+    use.
+
+    boto3 clients are thread safe, and building one is expensive, so one client and its
+    connection pool serve all requests and worker threads. Connections are kept alive
+    between requests. When more than `settings.s3_max_pool_connections` requests run
+    at the same time, the extra connections are closed after use instead of being
+    pooled.
+    """
+
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                boto3_config = {
+                    "aws_access_key_id": settings.aws_access_key_id,
+                    "aws_secret_access_key": settings.aws_secret_key,
+                    "region_name": settings.aws_region,
+                }
+                if settings.s3_endpoint_url:
+                    boto3_config["endpoint_url"] = settings.s3_endpoint_url
+
+                # a session of its own, the default one of boto3 is not thread safe
+                _client = boto3.session.Session().client(
+                    "s3",
+                    config=Config(
+                        max_pool_connections=settings.s3_max_pool_connections,
+                        connect_timeout=settings.s3_connect_timeout,
+                        read_timeout=settings.s3_read_timeout,
+                        tcp_keepalive=settings.s3_tcp_keepalive,
+                    ),
+                    **boto3_config,
+                )
+                s3_logger.info(
+                    f"Storage client created, {settings.s3_max_pool_connections} "
+                    "pooled connections"
+                )
+
+    return _client
+
+
+def close_storage_client() -> None:
+    """
+    Closes the pooled connections of the shared client, the next use creates a new one.
+    """
+
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def storage_pool_stats() -> Dict[str, Any]:
+    """
+    Returns the state of the connection pools of the shared client.
+    """
+
+    stats = {"max_pool_connections": settings.s3_max_pool_connections, "pools": 0}
+    if _client is None:
+        return stats
+
+    # botocore keeps one urllib3 pool per host, it does not expose them publicly, so
+    # the pool figures are left out whenever its internals look different
+    endpoint = getattr(_client, "_endpoint", None)
+    http_session = getattr(endpoint, "http_session", None)
+    manager = getattr(http_session, "_manager", None)
+    if manager is None:
+        return stats
+
+    try:
+        pools = [manager.pools[key] for key in list(manager.pools.keys())]
+        pool_stats = dict(
+            pools=len(pools),
+            # connections taken out of a pool and not returned yet
+            in_use=sum(pool.pool.maxsize - pool.pool.qsize() for pool in pools),
+            opened=sum(pool.num_connections for pool in pools),
+            requests=sum(pool.num_requests for pool in pools),
+        )
+    except (AttributeError, KeyError, TypeError) as e:
+        s3_logger.debug(f"Connection pool stats unavailable: {e}")
+        return stats
+
+    stats.update(pool_stats)
+    return stats
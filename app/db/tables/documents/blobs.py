@@ -0,0 +1,28 @@
+from typing import Optional
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, text
+
+from app.db.models import Base
+
+
+class Blob(Base):
+    """
+    Content-addressed object in storage, shared by every document with the same hash.
+    """
+
+    __tablename__ = "blobs"
+
+    file_hash: str = Column(String(64), primary_key=True, nullable=False)
+    key: str = Column(String, unique=True, nullable=False)
+    size: int = Column(BigInteger)
+    # codec the object is compressed with in storage, None when stored as is
+    encoding: Optional[str] = Column(String, nullable=True)
+    stored_size: Optional[int] = Column(BigInteger, nullable=True)
+    ref_count: int = Column(Integer, nullable=False, default=1)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+
+
+# blobs in the order storage lists their keys, for the storage reconciliation job
+Index("ix_blobs_key_c", Blob.key.collate("C"))
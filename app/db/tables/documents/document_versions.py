@@ -0,0 +1,61 @@
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    UniqueConstraint,
+    text,
+)
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.models import Base
+
+
+class DocumentVersion(Base):
+    """
+    Content a document had at some point, its latest version is its current content.
+
+    A version of a document stored as a blob holds a reference on the blob, so the
+    content stays in storage until the version is pruned. Documents from before the blob
+    store keep their versions as versions of the object at their own key.
+    """
+
+    __tablename__ = "document_versions"
+    __table_args__ = (
+        UniqueConstraint(
+            "document_id", "number", name="uq_document_versions_document_id_number"
+        ),
+    )
+
+    id: UUID = Column(
+        UUID(as_uuid=True), default=uuid4, primary_key=True, index=True, nullable=False
+    )
+    # versions are removed with their document, which releases their blob references
+    document_id: UUID = Column(
+        UUID(as_uuid=True),
+        ForeignKey("document_metadata.id"),
+        nullable=False,
+        index=True,
+    )
+    # 1 for the first upload, counting up with every new version of the document
+    number: int = Column(Integer, nullable=False)
+    blob_hash: Optional[str] = Column(
+        String(64), ForeignKey("blobs.file_hash"), nullable=True, index=True
+    )
+    s3_url: str = Column(String, nullable=False)
+    # version of the object at the key of a document from before the blob store, None
+    # when storage did not report one
+    s3_version_id: Optional[str] = Column(String, nullable=True)
+    file_hash: Optional[str] = Column(String)
+    size: Optional[int] = Column(BigInteger)
+    file_type: Optional[str] = Column(String)
+    encoding: Optional[str] = Column(String, nullable=True)
+    uploaded_by: Optional[str] = Column(String, ForeignKey("users.id"), nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=text("NOW()")
+    )
@@ -5,12 +5,13 @@ from typing import List, Optional
 from sqlalchemy import (
     Column,
     String,
-    Integer,
+    BigInteger,
     ARRAY,
     text,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Table,
     UniqueConstraint,
 )
@@ -36,20 +37,42 @@ doc_user_access = Table(
 
 class DocumentMetadata(Base):
     __tablename__ = "document_metadata"
+    # a name identifies a document of its owner until it is deleted
+    __table_args__ = (
+        Index(
+            "uq_document_metadata_owner_id_name",
+            "owner_id",
+            "name",
+            unique=True,
+            postgresql_where=text("status != 'deleted'"),
+        ),
+    )
 
     id: UUID = Column(
         UUID(as_uuid=True), default=uuid4, primary_key=True, index=True, nullable=False
     )
     owner_id: Mapped[str] = Column(String, ForeignKey("users.id"), nullable=False)
     name: str = Column(String)
-    s3_url: str = Column(String, unique=True)
+    s3_url: str = Column(String)
+    # content-addressed object backing this document, None for documents stored under
+    # their own key before the blob store existed
+    blob_hash: Optional[str] = Column(
+        String(64), ForeignKey("blobs.file_hash"), nullable=True, index=True
+    )
+    folder: Optional[str] = Column(String, nullable=True)
+    # codec the content is compressed with in storage, `size` is always uncompressed
+    encoding: Optional[str] = Column(String, nullable=True)
     created_at = Column(
         DateTime(timezone=True),
         default=datetime.now(timezone.utc),
         nullable=False,
         server_default=text("NOW()"),
     )
-    size: Optional[int] = Column(Integer)
+    # when the content last changed, a new version moves it forward
+    updated_at = Column(
+        DateTime(timezone=True), nullable=True, server_default=text("NOW()")
+    )
+    size: Optional[int] = Column(BigInteger)
     file_type: Optional[str] = Column(String)
     tags: Optional[List[str]] = Column(ARRAY(String))
     categories: Optional[List[str]] = Column(ARRAY(String))
@@ -62,3 +85,12 @@ class DocumentMetadata(Base):
         "User", secondary=doc_user_access, passive_deletes=True
     )
     owner = relationship("User", back_populates="owner_of")
+
+
+# documents stored under their own key, in the order storage lists the keys, for the
+# storage reconciliation job
+Index(
+    "ix_document_metadata_legacy_s3_url",
+    DocumentMetadata.s3_url.collate("C"),
+    postgresql_where=DocumentMetadata.blob_hash.is_(None),
+)
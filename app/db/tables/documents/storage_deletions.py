@@ -0,0 +1,33 @@
+from typing import Optional
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, text
+
+from app.db.models import Base
+
+
+class StorageDeletion(Base):
+    """
+    Object waiting to be deleted from storage, with all of its versions, after the
+    documents using it were permanently deleted.
+    """
+
+    __tablename__ = "storage_deletions"
+
+    id: int = Column(BigInteger, primary_key=True, autoincrement=True)
+    key: str = Column(String, nullable=False)
+    # a single version of the object to delete, None for all of them
+    version_id: Optional[str] = Column(String, nullable=True)
+    # content the object derives from, e.g. a rendition, kept if a blob has it again
+    file_hash: Optional[str] = Column(String(64), nullable=True)
+    attempts: int = Column(Integer, nullable=False, default=0)
+    last_error: Optional[str] = Column(String, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+    # claimed entries are hidden until then, failed ones wait for their retry
+    not_before = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=text("NOW()"),
+        index=True,
+    )
@@ -0,0 +1,59 @@
+from uuid import uuid4
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    text,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped
+
+from app.db.models import Base
+
+
+class UploadSession(Base):
+    """
+    Resumable upload in progress, backed by an S3 multipart upload.
+    """
+
+    __tablename__ = "upload_sessions"
+
+    id: UUID = Column(
+        UUID(as_uuid=True), default=uuid4, primary_key=True, index=True, nullable=False
+    )
+    owner_id: Mapped[str] = Column(String, ForeignKey("users.id"), nullable=False)
+    name: str = Column(String, nullable=False)
+    file_type: str = Column(String, nullable=False)
+    folder: str = Column(String, nullable=True)
+    key: str = Column(String, unique=True, nullable=False)
+    # None for direct uploads sent with a single presigned PUT
+    s3_upload_id: str = Column(String, nullable=True)
+    # SHA-256 announced by the client of a direct upload
+    file_hash: str = Column(String(64), nullable=True)
+    chunk_size: int = Column(BigInteger, nullable=False)
+    size: int = Column(BigInteger, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class UploadSessionPart(Base):
+    """
+    Chunk of a resumable upload already stored as a multipart upload part.
+    """
+
+    __tablename__ = "upload_session_parts"
+
+    session_id: UUID = Column(
+        UUID(as_uuid=True),
+        ForeignKey("upload_sessions.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    part_number: int = Column(Integer, primary_key=True)
+    etag: str = Column(String, nullable=False)
+    size: int = Column(BigInteger, nullable=False)
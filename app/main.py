@@ -1,28 +1,46 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, status
+from fastapi.responses import FileResponse, JSONResponse
 
 from app.api.router import router
 from app.core.config import settings
+from app.core.executors import executor_stats, shutdown_executors
+from app.core.startup import StartupChecks
 from app.db.models import check_tables
+from app.db.repositories.documents.codecs import compression_stats
+from app.db.repositories.documents.object_cache import object_cache
+from app.db.repositories.documents.presigned_urls import presigned_urls
+from app.db.repositories.documents.renditions import shutdown_pool
+from app.db.repositories.documents.storage_gc import storage_gc
+from app.db.repositories.documents.upload_gc import upload_gc
+from app.db.storage import close_storage_client, storage_pool_stats
 from app.logs.logger import docflow_logger
 from app.scripts.init_bucket import create_bucket_if_not_exists
 
+# the schema and the bucket are checked in the background, see `/ready`
+startup_checks = StartupChecks(
+    checks={"database": check_tables, "storage": create_bucket_if_not_exists},
+    timeout=settings.startup_check_timeout_sec,
+    retry_interval=settings.startup_check_retry_sec,
+)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     docflow_logger.info("Starting DocFlow...")
 
-    try:
-        docflow_logger.info("Initializing Tables and Storage buckets...")
-        await check_tables()
-        await create_bucket_if_not_exists()
-        docflow_logger.info("Tables and Storage buckets successfully created.")
-    except Exception as e:
-        docflow_logger.error(f"Error during startup: {e}")
-        raise
+    startup_checks.start()
+    if settings.storage_gc_enabled:
+        storage_gc.start()
+    upload_gc.start()
     yield
+    await startup_checks.stop()
+    await storage_gc.stop()
+    await upload_gc.stop()
+    shutdown_pool()
+    close_storage_client()
+    shutdown_executors()
 
 
 app = FastAPI(
@@ -57,5 +75,32 @@ async def root():
 
 @app.get("/health", tags=["Default"])
 async def health_check():
-    """Health check endpoint"""
+    """Liveness: the process serves requests, whatever the state of its dependencies"""
     return {"status": "healthy", "service": "DocFlow API", "version": settings.version}
+
+
+@app.get("/ready", tags=["Default"])
+async def readiness_check():
+    """Readiness: the schema and the bucket were checked, 503 until they are"""
+    return JSONResponse(
+        content=startup_checks.status(),
+        status_code=(
+            status.HTTP_200_OK
+            if startup_checks.ready
+            else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
+
+
+@app.get("/metrics", tags=["Default"])
+async def metrics():
+    """Counters of the caches and pools of this process"""
+    return {
+        "object_cache": object_cache.stats(),
+        "presigned_urls": presigned_urls.stats(),
+        "compression": compression_stats.stats(),
+        "storage": storage_pool_stats(),
+        "executors": executor_stats(),
+        "storage_gc": storage_gc.stats(),
+        "upload_gc": upload_gc.stats(),
+    }
@@ -21,6 +21,10 @@ class DocumentMetadataBase(BaseModel):
     status: StatusEnum
     file_hash: Optional[str]
     access_to: Optional[List[str]]
+    blob_hash: Optional[str] = None
+    folder: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    encoding: Optional[str] = None
 
 
 class DocumentMetadataPatch(BaseModel):
@@ -30,6 +34,12 @@ class DocumentMetadataPatch(BaseModel):
     access_to: Optional[List[str]] = None
 
 
+class DocumentArchiveRequest(BaseModel):
+    documents: List[str] = []
+    folder: Optional[str] = None
+    name: str = "docflow"
+
+
 # Document Sharing
 class DocumentSharingBase(BaseModel):
     url_id: str
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class DocumentVersionRead(BaseModel):
+    id: UUID
+    document_id: UUID
+    number: int
+    file_hash: Optional[str]
+    size: Optional[int]
+    file_type: Optional[str]
+    uploaded_by: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class DocumentVersionList(BaseModel):
+    response: List[DocumentVersionRead]
+    # pass as `before` for the next page, None on the last one
+    next_before: Optional[int] = None
@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class UploadSessionCreate(BaseModel):
+    name: str = Field(..., description="Name of the document once uploaded")
+    file_type: str = Field(..., description="Content type of the file")
+    folder: Optional[str] = None
+    size: Optional[int] = Field(default=None, ge=0, description="Total size in bytes")
+    chunk_size: Optional[int] = Field(
+        default=None, gt=0, description="Bytes per chunk, capped by the server"
+    )
+
+
+class UploadSessionRead(BaseModel):
+    id: UUID
+    name: str
+    file_type: str
+    folder: Optional[str]
+    chunk_size: int
+    size: Optional[int]
+    expires_at: datetime
+    received_chunks: List[int] = []
+    received_bytes: int = 0
+
+    class Config:
+        from_attributes = True
+
+
+class DirectUploadCreate(BaseModel):
+    name: str = Field(..., description="Name of the document once uploaded")
+    file_type: str = Field(..., description="Content type of the file")
+    folder: Optional[str] = None
+    size: int = Field(..., ge=0, description="Total size in bytes")
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$", description="Hex SHA-256")
+
+
+class PresignedPart(BaseModel):
+    part_number: int
+    url: str
+
+
+class DirectUploadRead(BaseModel):
+    id: UUID
+    expires_at: datetime
+    url: Optional[str] = None  # single PUT
+    chunk_size: Optional[int] = None
+    parts: List[PresignedPart] = []  # multipart upload
+
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class DirectUploadComplete(BaseModel):
+    parts: List[UploadedPart] = []
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+
+async def _measure(ready_timeout: float) -> Dict[str, float]:
+    """
+    Starts the app once in this process and times each phase, in milliseconds.
+    """
+
+    started = time.perf_counter()
+    from app.main import app, startup_checks
+
+    imported = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        serving = time.perf_counter()
+        ready = await startup_checks.wait(timeout=ready_timeout)
+        checked = time.perf_counter()
+    stopped = time.perf_counter()
+
+    return {
+        "import_ms": (imported - started) * 1000,
+        # time until the app accepts requests, what the event loop waits for
+        "startup_ms": (serving - imported) * 1000,
+        "ready_ms": (checked - imported) * 1000,
+        "ready": float(ready),
+        "shutdown_ms": (stopped - checked) * 1000,
+    }
+
+
+def benchmark_startup(runs: int = 5, ready_timeout: float = 30) -> Dict[str, Dict]:
+    """
+    Starts the app `runs` times, each in a fresh interpreter so imports are cold, and
+    reports the time spent importing it, until it serves requests, until it is ready
+    and shutting it down.
+
+    Args:
+        runs (int): The number of cold starts.
+        ready_timeout (float): The longest time to wait for the startup checks to pass,
+            in seconds.
+
+    Returns:
+        Dict[str, Dict]: The minimum, median and maximum of each phase.
+    """
+
+    samples: List[Dict[str, float]] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "app.scripts.benchmark_startup",
+                "--child",
+                "--ready-timeout",
+                str(ready_timeout),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        phase: {
+            "min": round(min(values), 3),
+            "median": round(statistics.median(values), 3),
+            "max": round(max(values), 3),
+        }
+        for phase in samples[0]
+        for values in [[sample[phase] for sample in samples]]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the startup of the app.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready-timeout", type=float, default=30)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_measure(ready_timeout=args.ready_timeout))))
+    else:
+        print(
+            json.dumps(
+                benchmark_startup(runs=args.runs, ready_timeout=args.ready_timeout),
+                indent=2,
+            )
+        )
@@ -1,29 +1,33 @@
-import asyncio
-
-import boto3
 from botocore.exceptions import ClientError
 
 from app.core.config import settings
+from app.core.executors import storage_executor
+from app.db.storage import get_storage_client
 from app.logs.logger import s3_logger
 
 
-async def create_bucket_if_not_exists():
-    """Create S3/MinIO bucket if it doesn't exist"""
+def _enable_versioning(client) -> None:
+    # documents stored under their own key rely on versioning to keep old versions
     try:
-        boto3_config = {
-            "aws_access_key_id": settings.aws_access_key_id,
-            "aws_secret_access_key": settings.aws_secret_key,
-            "region_name": settings.aws_region,
-        }
+        client.put_bucket_versioning(
+            Bucket=settings.s3_bucket,
+            VersioningConfiguration={"Status": "Enabled"},
+        )
+        s3_logger.info(f"✅ Enabled versioning for bucket '{settings.s3_bucket}'")
+    except Exception as ve:
+        # MinIO does not support versioning in all configurations
+        s3_logger.warning(f"⚠️  Could not enable versioning: {ve}")
 
-        if settings.s3_endpoint_url:
-            boto3_config["endpoint_url"] = settings.s3_endpoint_url
 
-        client = boto3.client("s3", **boto3_config)
+def _create_buckets() -> None:
+    """Create S3/MinIO bucket if it doesn't exist, runs in a worker thread"""
+    try:
+        client = get_storage_client()
 
         try:
             client.head_bucket(Bucket=settings.s3_bucket)
             s3_logger.info(f"✅ Bucket '{settings.s3_bucket}' already exists")
+            _enable_versioning(client)
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
             if error_code == "404":
@@ -43,18 +47,13 @@ async def create_bucket_if_not_exists():
 
                     s3_logger.info(f"✅ Created bucket '{settings.s3_bucket}'")
 
-                    await asyncio.sleep(1)  # waiting for bucket to get created
+                    # waiting for bucket to get created
+                    client.get_waiter("bucket_exists").wait(
+                        Bucket=settings.s3_bucket,
+                        WaiterConfig={"Delay": 1, "MaxAttempts": 10},
+                    )
 
-                    try:
-                        client.put_bucket_versioning(
-                            Bucket=settings.s3_bucket,
-                            VersioningConfiguration={"Status": "Enabled"},
-                        )
-                        s3_logger.info(
-                            f"✅ Enabled versioning for bucket '{settings.s3_bucket}'"
-                        )
-                    except Exception as ve:
-                        s3_logger.warning(f"⚠️  Could not enable versioning: {ve}")
+                    _enable_versioning(client)
 
                 except ClientError as ce:
                     s3_logger.warning(
@@ -99,3 +98,9 @@ async def create_bucket_if_not_exists():
 
     except Exception as e:
         s3_logger.warning(f"❌ Error during bucket initialization: {e}")
+        raise
+
+
+async def create_bucket_if_not_exists():
+    """Create S3/MinIO bucket if it doesn't exist, without blocking the event loop"""
+    await storage_executor.run(_create_buckets)
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+
+from app.core.config import settings
+from app.db.models import async_session
+from app.db.repositories.documents.document_versions import DocumentVersionRepository
+from app.logs.logger import docflow_logger
+
+
+async def prune_versions(
+    keep: int = settings.document_versions_keep,
+    max_age_days: int = settings.document_version_max_age_days,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Removes the document versions past the retention policy, one batch per transaction
+    so the version history is never locked for long. The latest version of a document
+    is always kept.
+
+    Args:
+        keep (int): The number of latest versions kept per document, 0 for no limit.
+        max_age_days (int): Older versions are removed, 0 for no limit.
+        batch_size (int): The number of versions removed per transaction.
+
+    Returns:
+        int: The number of versions removed.
+    """
+
+    pruned = 0
+    async with async_session() as session:
+        repository = DocumentVersionRepository(session)
+        while True:
+            removed = await repository.prune(
+                keep=keep, max_age_days=max_age_days, limit=batch_size
+            )
+            pruned += removed
+            if removed < batch_size:
+                break
+            docflow_logger.info(f"{pruned} document versions pruned so far")
+
+    docflow_logger.info(f"{pruned} document versions pruned")
+    return pruned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune old document versions.")
+    parser.add_argument("--keep", type=int, default=settings.document_versions_keep)
+    parser.add_argument(
+        "--max-age-days", type=int, default=settings.document_version_max_age_days
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(
+        prune_versions(
+            keep=args.keep, max_age_days=args.max_age_days, batch_size=args.batch_size
+        )
+    )
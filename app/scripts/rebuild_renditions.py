@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+
+from app.db.models import async_session
+from app.db.repositories.documents.documents import DocumentRepository
+from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
+from app.db.repositories.documents.renditions import (
+    RENDITION_SOURCE_TYPES,
+    shutdown_pool,
+)
+from app.logs.logger import docflow_logger
+
+
+async def rebuild_renditions(force: bool = False, batch_size: int = 500) -> int:
+    """
+    Renders the renditions of every document, e.g. for documents uploaded before
+    renditions existed or after a rendition size changed.
+
+    Args:
+        force (bool): Whether to render renditions that already exist again.
+        batch_size (int): The number of documents read per query.
+
+    Returns:
+        int: The number of renditions written.
+    """
+
+    repository = DocumentRepository()
+    written, after = 0, None
+    try:
+        async with async_session() as session:
+            metadata_repo = DocumentMetadataRepository(session)
+            while documents := await metadata_repo.by_file_type(
+                RENDITION_SOURCE_TYPES, after=after, limit=batch_size
+            ):
+                written += await repository.generate_renditions(documents, force=force)
+                after = documents[-1]["id"]
+                docflow_logger.info(f"Renditions rebuilt up to document {after}")
+    finally:
+        shutdown_pool()
+
+    docflow_logger.info(f"{written} renditions written")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild document renditions.")
+    parser.add_argument(
+        "--force", action="store_true", help="render existing renditions again"
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    asyncio.run(rebuild_renditions(force=args.force, batch_size=args.batch_size))
@@ -0,0 +1,444 @@
+import argparse
+import asyncio
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies.repositories import get_s3_url
+from app.core.config import settings
+from app.core.executors import storage_executor
+from app.db.models import async_session
+from app.db.repositories.documents.blobs import BlobRepository
+from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
+from app.db.repositories.documents.storage_deletions import StorageDeletionRepository
+from app.db.repositories.documents.upload_sessions import UploadSessionRepository
+from app.db.storage import get_storage_client
+from app.logs.logger import s3_logger
+
+# prefixes of objects the application names itself, every other top level prefix
+# belongs to a user and holds documents stored before the blob store existed
+BLOB_PREFIX = "blobs/"
+RENDITION_PREFIX = "renditions/"
+UPLOAD_PREFIX = "uploads/"
+RESERVED_PREFIXES = (BLOB_PREFIX, RENDITION_PREFIX, UPLOAD_PREFIX)
+
+
+class StoredRef(NamedTuple):
+    """An object key a row points at, and whether the row is dangling without it."""
+
+    key: str
+    # the table of the row, "blob", "document" or "upload"
+    source: str
+    id: str
+    required: bool = True
+
+
+class StorageReconciliation:
+    """
+    Compares the objects in the bucket with the rows pointing at them.
+
+    Every pass lists a part of the bucket with `ListObjectsV2` and merge-joins the
+    pages, sorted by key, with keyset-paginated queries returning the rows in the same
+    order, so memory stays constant whatever the size of the bucket:
+
+    - `blobs`: objects under `blobs/`,
+    - `renditions`: objects under `renditions/` against the hashes of the blob store,
+    - `uploads`: objects under `uploads/`, which also back the blobs and documents of
+      finished resumable and direct uploads,
+    - `legacy`: objects under each user prefix.
+
+    Except for renditions, the objects of a pass are compared with every row that can
+    point into its part of the bucket: the keys of blobs, the URLs of documents stored
+    under their own key and the keys of upload sessions, merged in key order.
+
+    Orphans are objects no row points at, they are only counted when older than
+    `min_age`, as objects are written before the row pointing at them is committed.
+    Dangling rows point at a missing object, only blobs and documents are reported, as
+    a blob without renditions or a session without an object is expected.
+    The position of each pass is saved to a checkpoint file after every batch, so an
+    interrupted run resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        checkpoint: str,
+        report: Optional[str] = None,
+        fix: bool = False,
+        min_age: timedelta = timedelta(hours=24),
+        batch_size: int = 1000,
+    ) -> None:
+        self.session = session
+        self.client = get_storage_client()
+        self.checkpoint = checkpoint
+        self.report = report
+        self.fix = fix
+        self.batch_size = batch_size
+        self.cutoff = datetime.now(timezone.utc) - min_age
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                self.state = json.load(f)
+
+    async def _list(
+        self, prefix: str, start_after: Optional[str] = None, delimiter: str = ""
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields the pages of a listing, keys come in UTF-8 binary order.
+        """
+
+        params = {"Bucket": settings.s3_bucket, "Prefix": prefix}
+        if start_after:
+            params["StartAfter"] = start_after
+        if delimiter:
+            params["Delimiter"] = delimiter
+        while True:
+            page = await storage_executor.run(self.client.list_objects_v2, **params)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            params["ContinuationToken"] = page["NextContinuationToken"]
+
+    async def _objects(
+        self, prefix: str, start_after: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async for page in self._list(prefix=prefix, start_after=start_after):
+            for obj in page.get("Contents", []):
+                yield obj
+
+    async def _user_objects(
+        self, start_after: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields the objects outside of the reserved prefixes, one user prefix at a time.
+        """
+
+        async for page in self._list(prefix="", start_after=start_after, delimiter="/"):
+            entries = [(obj["Key"], obj) for obj in page.get("Contents", [])] + [
+                (p["Prefix"], None) for p in page.get("CommonPrefixes", [])
+            ]
+            for name, obj in sorted(entries, key=lambda entry: entry[0]):
+                if obj is not None:
+                    yield obj
+                elif name not in RESERVED_PREFIXES:
+                    after = start_after if (start_after or "") > name else None
+                    async for user_obj in self._objects(name, start_after=after):
+                        yield user_obj
+
+    @staticmethod
+    async def _rows(
+        fetch: Callable, after: Optional[str], cursor: Callable[[Any], str]
+    ) -> AsyncIterator[Any]:
+        while rows := await fetch(after):
+            for row in rows:
+                yield row
+            after = cursor(rows[-1])
+
+    @staticmethod
+    async def _merge(*streams: AsyncIterator[StoredRef]) -> AsyncIterator[StoredRef]:
+        """
+        Merges streams of references sorted by key into one.
+        """
+
+        heads: List[List[Any]] = []
+        for stream in streams:
+            if (ref := await anext(stream, None)) is not None:
+                heads.append([ref, stream])
+        while heads:
+            head = min(heads, key=lambda h: h[0].key)
+            yield head[0]
+            head[0] = await anext(head[1], None)
+            if head[0] is None:
+                heads.remove(head)
+
+    def _save(self, name: str, progress: Dict[str, Any]) -> None:
+        self.state[name] = progress
+        temp = f"{self.checkpoint}.tmp"
+        with open(temp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temp, self.checkpoint)
+
+    def _record(self, name: str, kind: str, details: Dict[str, Any]) -> None:
+        if self.report:
+            with open(self.report, "a") as f:
+                f.write(
+                    json.dumps({"pass": name, "kind": kind, **details}, default=str)
+                )
+                f.write("\n")
+
+    async def _reconcile(
+        self,
+        name: str,
+        objects: Callable[[Optional[str]], AsyncIterator[Dict[str, Any]]],
+        refs: Callable[[Optional[str]], AsyncIterator[StoredRef]],
+        object_key: Callable[[str], str],
+        one_to_one: bool,
+        derived_hash: Callable[[str], Optional[str]] = lambda key: None,
+    ) -> Dict[str, int]:
+        """
+        Merge-joins one part of the bucket with the rows pointing into it.
+
+        Args:
+            name (str): The name of the pass, in the checkpoint and the report.
+            objects: Lists the objects, after the given key.
+            refs: Lists the references of the rows, after the given key, in key order.
+            object_key: The value of an object key the references are compared with.
+            one_to_one (bool): Whether a reference points at one object, rather than
+                being shared by any number of objects.
+            derived_hash: The content an orphan derives from, see `StorageDeletion`.
+
+        Returns:
+            Dict[str, int]: The counters of the pass.
+        """
+
+        progress = self.state.get(name, {})
+        if progress.get("done"):
+            return progress["counts"]
+        objects_after = progress.get("objects_after")
+        rows_after = progress.get("rows_after")
+        counts = Counter(progress.get("counts", {}))
+        orphans: Dict[str, Optional[str]] = {}
+
+        async def _flush(done: bool = False) -> None:
+            if self.fix and orphans:
+                await StorageDeletionRepository(self.session).enqueue(orphans)
+                await self.session.commit()
+                counts["queued"] += len(orphans)
+                orphans.clear()
+            self._save(
+                name,
+                {
+                    "done": done,
+                    "objects_after": objects_after,
+                    "rows_after": rows_after,
+                    "counts": dict(counts),
+                },
+            )
+
+        rows = refs(rows_after)
+        row = await anext(rows, None)
+
+        async def _consume(dangling: bool) -> None:
+            nonlocal row, rows_after
+            counts["rows"] += 1
+            if dangling:
+                counts["dangling"] += 1
+                self._record(name, "dangling", row._asdict())
+            rows_after = row.key
+            row = await anext(rows, None)
+
+        async for obj in objects(objects_after):
+            key = object_key(obj["Key"])
+            while row is not None and row.key < key:
+                await _consume(dangling=row.required)
+
+            counts["objects"] += 1
+            if row is not None and row.key == key:
+                counts["matched"] += 1
+                # e.g. an upload session and the blob it became point at the same key
+                while one_to_one and row is not None and row.key == key:
+                    await _consume(dangling=False)
+            elif obj["LastModified"] > self.cutoff:
+                counts["recent"] += 1
+            else:
+                counts["orphans"] += 1
+                counts["orphan_bytes"] += obj["Size"]
+                self._record(
+                    name,
+                    "orphan",
+                    {
+                        "key": obj["Key"],
+                        "size": obj["Size"],
+                        "last_modified": obj["LastModified"],
+                    },
+                )
+                orphans[obj["Key"]] = derived_hash(obj["Key"])
+
+            objects_after = obj["Key"]
+            if counts["objects"] % self.batch_size == 0:
+                await _flush()
+                s3_logger.info(f"Reconciliation {name}: {dict(counts)}")
+
+        while row is not None:
+            await _consume(dangling=row.required)
+        await _flush(done=True)
+
+        return dict(counts)
+
+    async def run(self) -> Dict[str, Dict[str, int]]:
+        """
+        Runs the passes not finished yet.
+
+        Returns:
+            Dict[str, Dict[str, int]]: The counters of each pass.
+        """
+
+        blob_repo = BlobRepository(self.session)
+        upload_repo = UploadSessionRepository(self.session)
+        metadata_repo = DocumentMetadataRepository(self.session)
+        base_url = await get_s3_url(key="")
+        limit = self.batch_size
+
+        async def _blobs(
+            after: Optional[str], prefix: str = "", exclude=()
+        ) -> AsyncIterator[StoredRef]:
+            async for row in self._rows(
+                lambda a: blob_repo.keys(
+                    prefix=prefix, exclude=exclude, after=a, limit=limit
+                ),
+                after,
+                cursor=lambda row: row.key,
+            ):
+                yield StoredRef(key=row.key, source="blob", id=row.file_hash)
+
+        async def _documents(
+            after: Optional[str], prefix: str = "", exclude=()
+        ) -> AsyncIterator[StoredRef]:
+            async for row in self._rows(
+                lambda a: metadata_repo.legacy_page(
+                    base_url=base_url,
+                    after=a,
+                    limit=limit,
+                    prefix=prefix,
+                    exclude=exclude,
+                ),
+                base_url + after if after is not None else None,
+                cursor=lambda row: row.s3_url,
+            ):
+                key = row.s3_url[len(base_url) :]
+                yield StoredRef(key=key, source="document", id=str(row.id))
+
+        async def _sessions(after: Optional[str]) -> AsyncIterator[StoredRef]:
+            async for key in self._rows(
+                lambda a: upload_repo.keys(after=a, limit=limit), after, lambda k: k
+            ):
+                yield StoredRef(key=key, source="upload", id=key, required=False)
+
+        async def _hashes(after: Optional[str]) -> AsyncIterator[StoredRef]:
+            async for row in self._rows(
+                lambda a: blob_repo.page(after=a, limit=limit),
+                after,
+                cursor=lambda row: row.file_hash,
+            ):
+                yield StoredRef(
+                    key=row.file_hash, source="blob", id=row.file_hash, required=False
+                )
+
+        def _rendition_hash(key: str) -> str:
+            return key[len(RENDITION_PREFIX) :].split("/", 1)[0]
+
+        results = {
+            "blobs": await self._reconcile(
+                "blobs",
+                objects=lambda after: self._objects(BLOB_PREFIX, start_after=after),
+                refs=lambda after: self._merge(
+                    _blobs(after, prefix=BLOB_PREFIX),
+                    _documents(after, prefix=BLOB_PREFIX),
+                ),
+                object_key=lambda key: key,
+                one_to_one=True,
+            ),
+            "renditions": await self._reconcile(
+                "renditions",
+                objects=lambda after: self._objects(
+                    RENDITION_PREFIX, start_after=after
+                ),
+                refs=_hashes,
+                object_key=_rendition_hash,
+                one_to_one=False,
+                derived_hash=_rendition_hash,
+            ),
+            "uploads": await self._reconcile(
+                "uploads",
+                objects=lambda after: self._objects(UPLOAD_PREFIX, start_after=after),
+                refs=lambda after: self._merge(
+                    _blobs(after, prefix=UPLOAD_PREFIX),
+                    _documents(after, prefix=UPLOAD_PREFIX),
+                    _sessions(after),
+                ),
+                object_key=lambda key: key,
+                one_to_one=True,
+            ),
+            "legacy": await self._reconcile(
+                "legacy",
+                objects=self._user_objects,
+                refs=lambda after: self._merge(
+                    _blobs(after, exclude=RESERVED_PREFIXES),
+                    _documents(after, exclude=RESERVED_PREFIXES),
+                ),
+                object_key=lambda key: key,
+                one_to_one=True,
+            ),
+        }
+        for name, counts in results.items():
+            s3_logger.info(f"Reconciliation {name} finished: {counts}")
+
+        return results
+
+
+async def reconcile_storage(
+    checkpoint: str,
+    report: Optional[str] = None,
+    fix: bool = False,
+    min_age_hours: int = 24,
+    batch_size: int = 1000,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Finds the objects of the bucket nothing points at, and the rows pointing at missing
+    objects, see `StorageReconciliation`.
+
+    Args:
+        checkpoint (str): The file the progress is saved to and resumed from, remove it
+            to start over.
+        report (Optional[str]): A file every orphan and dangling row is appended to, as
+            JSON lines.
+        fix (bool): Whether to queue orphans for deletion by the storage collector.
+            Dangling rows are only reported, their content cannot be recovered.
+        min_age_hours (int): The age below which objects are never orphans.
+        batch_size (int): The number of rows read per query, and of objects between
+            checkpoints.
+
+    Returns:
+        Dict[str, Dict[str, int]]: The counters of each pass.
+    """
+
+    async with async_session() as session:
+        reconciliation = StorageReconciliation(
+            session=session,
+            checkpoint=checkpoint,
+            report=report,
+            fix=fix,
+            min_age=timedelta(hours=min_age_hours),
+            batch_size=batch_size,
+        )
+        return await reconciliation.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reconcile the storage bucket with the database."
+    )
+    parser.add_argument("--checkpoint", default="reconcile_storage.checkpoint.json")
+    parser.add_argument(
+        "--report", help="append orphans and dangling rows as JSON lines"
+    )
+    parser.add_argument(
+        "--fix", action="store_true", help="queue orphans for deletion from storage"
+    )
+    parser.add_argument("--min-age-hours", type=int, default=24)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(
+        reconcile_storage(
+            checkpoint=args.checkpoint,
+            report=args.report,
+            fix=args.fix,
+            min_age_hours=args.min_age_hours,
+            batch_size=args.batch_size,
+        )
+    )
@@ -8,10 +8,14 @@ from alembic import context
 from app.db.models import Base
 
 from app.core.config import settings
+from app.db.tables.documents.blobs import Blob
 from app.db.tables.documents.documents_metadata import DocumentMetadata
+from app.db.tables.documents.document_versions import DocumentVersion
 from app.db.tables.auth.auth import User
 from app.db.tables.documents.document_sharing import DocumentSharing
 from app.db.tables.documents.notify import Notify
+from app.db.tables.documents.storage_deletions import StorageDeletion
+from app.db.tables.documents.upload_sessions import UploadSession, UploadSessionPart
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
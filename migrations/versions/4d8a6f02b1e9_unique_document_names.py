@@ -0,0 +1,60 @@
+"""Unique document names
+
+Revision ID: 4d8a6f02b1e9
+Revises: c37a9d15e8f2
+Create Date: 2026-10-18 14:05:27.481356
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "4d8a6f02b1e9"
+down_revision: Union[str, None] = "c37a9d15e8f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # names were not unique before, the oldest document keeps its name and the later
+    # ones get a ` (n)` suffix before their extension, e.g. `report (1).pdf`
+    op.execute(r"""
+        UPDATE document_metadata SET name = regexp_replace(
+            duplicates.name, '(\.[^.]*)?$', ' (' || (duplicates.n - 1) || ')\1'
+        )
+        FROM (
+            SELECT id, name, ROW_NUMBER() OVER (
+                PARTITION BY owner_id, name ORDER BY created_at, id
+            ) AS n
+            FROM document_metadata
+            WHERE status != 'deleted' AND name IS NOT NULL
+        ) AS duplicates
+        WHERE document_metadata.id = duplicates.id AND duplicates.n > 1
+        """)
+    # a new name can still collide with a document already named that way
+    collisions = op.get_bind().execute(sa.text("""
+        SELECT owner_id, name FROM document_metadata
+        WHERE status != 'deleted' AND name IS NOT NULL
+        GROUP BY owner_id, name HAVING COUNT(*) > 1
+        """)).all()
+    if collisions:
+        raise RuntimeError(
+            "Documents still share a name after renaming duplicates, rename them and "
+            "run the migration again: "
+            + ", ".join(f"{row.owner_id}/{row.name}" for row in collisions)
+        )
+
+    op.create_index(
+        "uq_document_metadata_owner_id_name",
+        "document_metadata",
+        ["owner_id", "name"],
+        unique=True,
+        postgresql_where=sa.text("status != 'deleted'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_document_metadata_owner_id_name", table_name="document_metadata")
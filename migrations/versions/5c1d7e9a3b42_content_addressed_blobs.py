@@ -0,0 +1,73 @@
+"""Content addressed blobs
+
+Revision ID: 5c1d7e9a3b42
+Revises: 2a02384ab925
+Create Date: 2026-10-18 09:12:40.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1d7e9a3b42"
+down_revision: Union[str, None] = "2a02384ab925"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("file_hash", sa.String(length=64), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("file_hash"),
+        sa.UniqueConstraint("key"),
+    )
+    op.add_column(
+        "document_metadata",
+        sa.Column("blob_hash", sa.String(length=64), nullable=True),
+    )
+    op.add_column("document_metadata", sa.Column("folder", sa.String(), nullable=True))
+    op.create_foreign_key(
+        "document_metadata_blob_hash_fkey",
+        "document_metadata",
+        "blobs",
+        ["blob_hash"],
+        ["file_hash"],
+    )
+    op.create_index(
+        op.f("ix_document_metadata_blob_hash"),
+        "document_metadata",
+        ["blob_hash"],
+        unique=False,
+    )
+    # documents sharing a blob share its url
+    op.drop_constraint(
+        "document_metadata_s3_url_key", "document_metadata", type_="unique"
+    )
+
+
+def downgrade() -> None:
+    op.create_unique_constraint(
+        "document_metadata_s3_url_key", "document_metadata", ["s3_url"]
+    )
+    op.drop_index(
+        op.f("ix_document_metadata_blob_hash"), table_name="document_metadata"
+    )
+    op.drop_constraint(
+        "document_metadata_blob_hash_fkey", "document_metadata", type_="foreignkey"
+    )
+    op.drop_column("document_metadata", "folder")
+    op.drop_column("document_metadata", "blob_hash")
+    op.drop_table("blobs")
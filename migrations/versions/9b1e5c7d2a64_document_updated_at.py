@@ -0,0 +1,35 @@
+"""Document updated_at
+
+Revision ID: 9b1e5c7d2a64
+Revises: 4d8a6f02b1e9
+Create Date: 2026-10-18 15:22:09.604118
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9b1e5c7d2a64"
+down_revision: Union[str, None] = "4d8a6f02b1e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "document_metadata",
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=True,
+        ),
+    )
+    op.execute("UPDATE document_metadata SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    op.drop_column("document_metadata", "updated_at")
@@ -0,0 +1,32 @@
+"""Legacy s3_url index
+
+Revision ID: a4d9e2b7c361
+Revises: f2a7c9e4d815
+Create Date: 2026-10-18 19:03:44.827193
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d9e2b7c361"
+down_revision: Union[str, None] = "f2a7c9e4d815"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_document_metadata_legacy_s3_url",
+        "document_metadata",
+        [sa.text('(s3_url COLLATE "C")')],
+        unique=False,
+        postgresql_where=sa.text("blob_hash IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_document_metadata_legacy_s3_url", table_name="document_metadata")
@@ -0,0 +1,109 @@
+"""Document versions
+
+Revision ID: b8e3d5f1a927
+Revises: a4d9e2b7c361
+Create Date: 2026-10-18 20:41:15.602938
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e3d5f1a927"
+down_revision: Union[str, None] = "a4d9e2b7c361"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "document_versions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("document_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("number", sa.Integer(), nullable=False),
+        sa.Column("blob_hash", sa.String(length=64), nullable=True),
+        sa.Column("s3_url", sa.String(), nullable=False),
+        sa.Column("s3_version_id", sa.String(), nullable=True),
+        sa.Column("file_hash", sa.String(), nullable=True),
+        sa.Column("size", sa.BigInteger(), nullable=True),
+        sa.Column("file_type", sa.String(), nullable=True),
+        sa.Column("encoding", sa.String(), nullable=True),
+        sa.Column("uploaded_by", sa.String(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["blob_hash"], ["blobs.file_hash"]),
+        sa.ForeignKeyConstraint(["document_id"], ["document_metadata.id"]),
+        sa.ForeignKeyConstraint(["uploaded_by"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "document_id", "number", name="uq_document_versions_document_id_number"
+        ),
+    )
+    op.create_index(
+        op.f("ix_document_versions_id"), "document_versions", ["id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_document_versions_document_id"),
+        "document_versions",
+        ["document_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_document_versions_blob_hash"),
+        "document_versions",
+        ["blob_hash"],
+        unique=False,
+    )
+    op.add_column(
+        "storage_deletions", sa.Column("version_id", sa.String(), nullable=True)
+    )
+
+    # the current content of every document is its first version, holding a
+    # reference on its blob like the document does
+    op.execute("""
+        INSERT INTO document_versions (
+            id, document_id, number, blob_hash, s3_url, file_hash, size, file_type,
+            encoding, uploaded_by, created_at
+        )
+        SELECT
+            gen_random_uuid(), id, 1, blob_hash, s3_url, file_hash, size, file_type,
+            encoding, owner_id, COALESCE(updated_at, created_at)
+        FROM document_metadata
+        WHERE s3_url IS NOT NULL
+        """)
+    op.execute("""
+        UPDATE blobs SET ref_count = blobs.ref_count + versions.count
+        FROM (
+            SELECT blob_hash, COUNT(*) AS count FROM document_versions
+            WHERE blob_hash IS NOT NULL GROUP BY blob_hash
+        ) AS versions
+        WHERE blobs.file_hash = versions.blob_hash
+        """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        UPDATE blobs SET ref_count = blobs.ref_count - versions.count
+        FROM (
+            SELECT blob_hash, COUNT(*) AS count FROM document_versions
+            WHERE blob_hash IS NOT NULL GROUP BY blob_hash
+        ) AS versions
+        WHERE blobs.file_hash = versions.blob_hash
+        """)
+    op.drop_column("storage_deletions", "version_id")
+    op.drop_index(
+        op.f("ix_document_versions_blob_hash"), table_name="document_versions"
+    )
+    op.drop_index(
+        op.f("ix_document_versions_document_id"), table_name="document_versions"
+    )
+    op.drop_index(op.f("ix_document_versions_id"), table_name="document_versions")
+    op.drop_table("document_versions")
@@ -0,0 +1,34 @@
+"""Direct uploads
+
+Revision ID: c37a9d15e8f2
+Revises: 8e4b2f61c0d7
+Create Date: 2026-10-18 12:40:53.117830
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c37a9d15e8f2"
+down_revision: Union[str, None] = "8e4b2f61c0d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "upload_sessions", "s3_upload_id", existing_type=sa.String(), nullable=True
+    )
+    op.add_column(
+        "upload_sessions", sa.Column("file_hash", sa.String(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("upload_sessions", "file_hash")
+    op.alter_column(
+        "upload_sessions", "s3_upload_id", existing_type=sa.String(), nullable=False
+    )
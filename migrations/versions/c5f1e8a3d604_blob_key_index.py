@@ -0,0 +1,31 @@
+"""Blob key index
+
+Revision ID: c5f1e8a3d604
+Revises: b8e3d5f1a927
+Create Date: 2026-10-19 09:26:51.174382
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c5f1e8a3d604"
+down_revision: Union[str, None] = "b8e3d5f1a927"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_blobs_key_c",
+        "blobs",
+        [sa.text('(key COLLATE "C")')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_blobs_key_c", table_name="blobs")
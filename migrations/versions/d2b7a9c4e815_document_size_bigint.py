@@ -0,0 +1,38 @@
+"""Document size bigint
+
+Revision ID: d2b7a9c4e815
+Revises: c5f1e8a3d604
+Create Date: 2026-10-19 11:02:38.519207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d2b7a9c4e815"
+down_revision: Union[str, None] = "c5f1e8a3d604"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "document_metadata",
+        "size",
+        existing_type=sa.Integer(),
+        type_=sa.BigInteger(),
+        existing_nullable=True,
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "document_metadata",
+        "size",
+        existing_type=sa.BigInteger(),
+        type_=sa.Integer(),
+        existing_nullable=True,
+    )
@@ -0,0 +1,32 @@
+"""Storage encoding
+
+Revision ID: e6f3a8c41b27
+Revises: 9b1e5c7d2a64
+Create Date: 2026-10-18 17:40:51.218734
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e6f3a8c41b27"
+down_revision: Union[str, None] = "9b1e5c7d2a64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("blobs", sa.Column("encoding", sa.String(), nullable=True))
+    op.add_column("blobs", sa.Column("stored_size", sa.BigInteger(), nullable=True))
+    op.add_column(
+        "document_metadata", sa.Column("encoding", sa.String(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("document_metadata", "encoding")
+    op.drop_column("blobs", "stored_size")
+    op.drop_column("blobs", "encoding")